@@ -44,6 +44,11 @@ static PyObject* compress(PyObject* self, PyObject* args)
   source = buffer.buf;
   len_source = buffer.len;
 
+  // The search below only touches the locked buffer and local arrays, so
+  // let other threads run while compressing.  ScriptManager compresses
+  // many scripts at once on a thread pool.
+  Py_BEGIN_ALLOW_THREADS
+
   for(i=0;i<2;i++){
     // i=0: use 0x07FF for the range, 0xF800 for the max copy length
     // i=1: use 0x0FFF for the range, 0xF000 for the max copy length
@@ -191,6 +196,8 @@ static PyObject* compress(PyObject* self, PyObject* args)
   else{
     ret_choice = 1;
   }
+
+  Py_END_ALLOW_THREADS
   
   result = Py_BuildValue("y#",
 			 &compressed_data[ret_choice][0],
@@ -201,8 +208,205 @@ static PyObject* compress(PyObject* self, PyObject* args)
 
 
 
+// Port of ctdecompress.decompress.  Returns a bytearray so that callers can
+// edit the decompressed event in place.
+static PyObject* decompress(PyObject* self, PyObject* args)
+{
+  const unsigned char* rom;
+  Py_ssize_t len_rom = 0;
+  Py_ssize_t start = 0;
+  Py_ssize_t src_pos = 0;
+  Py_ssize_t end_pos = 0;
+  int out_pos = 0;
+  int main_len = 0;
+  int header = 0;
+  int copy_size = 0;
+  int copy_off = 0;
+  bool smallwidth = false;
+  // Zeroed like the Python port's buffer, so that a copy with offset 0 reads
+  // zeros rather than whatever was on the stack.
+  unsigned char out_buffer[0x10000] = {0};
+  PyObject* result;
+  Py_buffer buffer;
+
+  if (!PyArg_ParseTuple(args, "y*n", &buffer, &start))
+    return NULL;
+
+  rom = buffer.buf;
+  len_rom = buffer.len;
+
+  if (start < 0 || start + 2 >= len_rom){
+    PyBuffer_Release(&buffer);
+    PyErr_SetString(PyExc_ValueError, "Packet start out of range.");
+    return NULL;
+  }
+
+  // First two bytes are little endian size of compressed packet
+  main_len = rom[start] | (rom[start+1] << 8);
+
+  src_pos = start + 2;
+  end_pos = src_pos + main_len;
+
+  if (end_pos >= len_rom){
+    PyBuffer_Release(&buffer);
+    PyErr_SetString(PyExc_ValueError, "Packet exceeds buffer.");
+    return NULL;
+  }
+
+  smallwidth = (rom[end_pos] & 0xC0) != 0;
+
+  while (true){
+    // First check if we've passed the main body
+    if (src_pos == end_pos){
+      if ((rom[src_pos] & 0x3F) == 0){
+	// No addendum
+	break;
+      }
+
+      // Addendum, new end in next two bytes
+      if (src_pos + 2 >= len_rom){
+	PyBuffer_Release(&buffer);
+	PyErr_SetString(PyExc_ValueError, "Packet exceeds buffer.");
+	return NULL;
+      }
+      end_pos = start + (rom[src_pos+1] | (rom[src_pos+2] << 8));
+      src_pos += 3;  // Get to the byte after the new end byte
+
+      if (end_pos >= len_rom || end_pos <= src_pos){
+	PyBuffer_Release(&buffer);
+	PyErr_SetString(PyExc_ValueError, "Bad addendum length.");
+	return NULL;
+      }
+    }
+
+    if (src_pos >= len_rom){
+      PyBuffer_Release(&buffer);
+      PyErr_SetString(PyExc_ValueError, "Packet exceeds buffer.");
+      return NULL;
+    }
+
+    header = rom[src_pos];
+    src_pos += 1;
+
+    for(int bit=0; bit<8; bit++){
+      if (src_pos == end_pos){
+	// ran out of data mid packet (in addendum)
+	break;
+      }
+      else if ((header & (1 << bit)) == 0){
+	// Uncompressed, copy next byte
+	if (out_pos >= 0x10000 || src_pos >= len_rom){
+	  PyBuffer_Release(&buffer);
+	  PyErr_SetString(PyExc_ValueError, "Decompressed data too large.");
+	  return NULL;
+	}
+	out_buffer[out_pos] = rom[src_pos];
+	out_pos += 1;
+	src_pos += 1;
+      }
+      else{
+	// Compressed, determine copy size and offset
+	if (src_pos + 1 >= len_rom){
+	  PyBuffer_Release(&buffer);
+	  PyErr_SetString(PyExc_ValueError, "Truncated copy command.");
+	  return NULL;
+	}
+
+	copy_size = rom[src_pos+1];
+	copy_off = rom[src_pos] | (rom[src_pos+1] << 8);
+
+	if (smallwidth){
+	  copy_size >>= 3;
+	  copy_off &= 0x07FF;
+	}
+	else{
+	  copy_size >>= 4;
+	  copy_off &= 0x0FFF;
+	}
+
+	copy_size += 3;
+
+	if (copy_off > out_pos || out_pos + copy_size > 0x10000){
+	  PyBuffer_Release(&buffer);
+	  PyErr_SetString(PyExc_ValueError, "Copy out of range.");
+	  return NULL;
+	}
+
+	// The copy may overlap itself, so go byte by byte.
+	for(int j=0; j<copy_size; j++){
+	  out_buffer[out_pos+j] = out_buffer[out_pos-copy_off+j];
+	}
+
+	out_pos += copy_size;
+	src_pos += 2;
+      }
+    }
+  }
+
+  result = PyByteArray_FromStringAndSize((const char*) out_buffer, out_pos);
+  PyBuffer_Release(&buffer);
+  return result;
+}
+
+
+// Port of ctdecompress.get_compressed_length
+static PyObject* get_compressed_length(PyObject* self, PyObject* args)
+{
+  const unsigned char* rom;
+  Py_ssize_t len_rom = 0;
+  Py_ssize_t addr = 0;
+  Py_ssize_t add_byte_addr = 0;
+  long compr_len = 0;
+  Py_buffer buffer;
+
+  if (!PyArg_ParseTuple(args, "y*n", &buffer, &addr))
+    return NULL;
+
+  rom = buffer.buf;
+  len_rom = buffer.len;
+
+  if (addr < 0 || addr + 1 >= len_rom){
+    PyBuffer_Release(&buffer);
+    PyErr_SetString(PyExc_ValueError, "Packet start out of range.");
+    return NULL;
+  }
+
+  // len main body + main body + addendum byte
+  compr_len = 2 + (rom[addr] | (rom[addr+1] << 8)) + 1;
+  add_byte_addr = addr + compr_len - 1;
+
+  while (true){
+    if (add_byte_addr >= len_rom){
+      PyBuffer_Release(&buffer);
+      PyErr_SetString(PyExc_ValueError, "Packet exceeds buffer.");
+      return NULL;
+    }
+
+    if ((rom[add_byte_addr] & 0x3F) == 0){
+      break;
+    }
+
+    if (add_byte_addr + 2 >= len_rom){
+      PyBuffer_Release(&buffer);
+      PyErr_SetString(PyExc_ValueError, "Packet exceeds buffer.");
+      return NULL;
+    }
+
+    compr_len = rom[add_byte_addr+1] | (rom[add_byte_addr+2] << 8);
+    add_byte_addr = addr + compr_len;
+  }
+
+  PyBuffer_Release(&buffer);
+  return PyLong_FromLong(compr_len + 1);
+}
+
+
 static PyMethodDef CompressMethods[] = {
     {"compress", compress, METH_VARARGS, "compress an event."},
+    {"decompress", decompress, METH_VARARGS,
+     "decompress the packet at a given offset."},
+    {"get_compressed_length", get_compressed_length, METH_VARARGS,
+     "get the length of the packet at a given offset."},
     {NULL, NULL, 0, NULL}
 };
 
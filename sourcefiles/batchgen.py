@@ -0,0 +1,214 @@
+'''
+Generate many seeds at once across a pool of worker processes.
+
+Each worker builds one Randomizer from the base rom when it starts and
+reuses it for every job it receives, so the cached patched rom and base
+config snapshots (patchcache, configcache) stay warm for the life of the
+worker.  The worker also keeps one journaled out rom and rolls it back
+between seeds rather than copying the patched rom for every seed.  Results
+are yielded in completion order.
+
+Example:
+    jobs = [SeedJob(rset.Settings.get_race_presets(), seed)
+            for seed in ('SeedA', 'SeedB', 'SeedC')]
+    for result in generate_seeds(rom, jobs, './out', max_workers=4):
+        print(result.out_path, result.flag_string, result.timings)
+'''
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+from dataclasses import dataclass, field
+import hashlib
+import os
+import time
+import traceback
+from typing import Iterable, Iterator, Optional
+
+import logicwriters
+import randomizer
+import randosettings as rset
+import romdiff
+
+
+@dataclass
+class SeedJob:
+    settings: rset.Settings
+    seed: str
+
+
+@dataclass
+class SeedResult:
+    seed: str
+    flag_string: Optional[str] = None
+    out_path: Optional[str] = None
+    rom_hash: Optional[str] = None  # md5 of the generated rom
+    timings: dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+# The randomizer each worker process keeps between jobs.
+_worker_rando: Optional[randomizer.Randomizer] = None
+
+
+def _init_worker(rom: bytes, warm_settings: Optional[rset.Settings],
+                 rando_kwargs: dict):
+    global _worker_rando
+    _worker_rando = randomizer.Randomizer(rom, is_vanilla=False,
+                                          reuse_out_rom=True, **rando_kwargs)
+
+    # Build the patched base rom and the base config now instead of during
+    # the first job.  Jobs with a different mode or difficulty than
+    # warm_settings build their own base config once per worker.
+    randomizer.Randomizer.get_patched_base_ctrom(rom)
+    if warm_settings is not None:
+        randomizer.Randomizer.get_base_config_from_settings(rom,
+                                                            warm_settings)
+
+
+def get_out_name(rom_name: str, flag_string: str, seed: str,
+                 patch_format: Optional[str] = None) -> str:
+    '''
+    Output file name in the same form as the command line randomizer.  When
+    patch_format is given, the rom's extension is replaced by the patch's.
+    '''
+    base_name, ext = os.path.splitext(os.path.basename(rom_name))
+    if patch_format is not None:
+        ext = '.' + patch_format
+
+    return f'{base_name}.{flag_string}.{seed}{ext}'
+
+
+def get_spoiler_name(rom_name: str, flag_string: str, seed: str,
+                     ext: str) -> str:
+    '''Spoiler log file name in the same form as the gui uses.'''
+    base_name = os.path.splitext(os.path.basename(rom_name))[0]
+    return f'{base_name}.{flag_string}.{seed}.spoilers{ext}'
+
+
+def run_job(rando: randomizer.Randomizer, job: SeedJob,
+            out_dir: str, rom_name: str,
+            patch_format: Optional[str] = None,
+            write_spoilers: bool = False) -> SeedResult:
+    '''
+    Generate a single seed with the given Randomizer and write it out.  If
+    patch_format ('ips' or 'bps') is given, write a patch against the
+    Randomizer's base rom instead of the full rom.
+    '''
+    result = SeedResult(seed=job.seed)
+    timings = result.timings
+    start = time.perf_counter()
+
+    try:
+        settings = copy.deepcopy(job.settings)
+        settings.seed = job.seed
+
+        rando.settings = settings
+        rando.set_random_config()
+        timings['config'] = time.perf_counter() - start
+
+        out_rom = rando.get_generated_rom()
+        timings['generate'] = time.perf_counter() - start - timings['config']
+
+        # Use the randomizer's settings because mystery replaces them.
+        result.flag_string = rando.settings.get_flag_string()
+        result.rom_hash = hashlib.md5(out_rom).hexdigest()
+
+        write_start = time.perf_counter()
+        out_name = get_out_name(rom_name, result.flag_string, job.seed,
+                                patch_format)
+        result.out_path = os.path.join(out_dir, out_name)
+
+        if patch_format is None:
+            out_data = out_rom
+        else:
+            base_rom = rando.base_ctrom.rom_data.getvalue()
+            # A reused out rom knows which parts of it the seed wrote, so
+            # the rest of the rom need not be compared.
+            out_data = romdiff.make_patch(base_rom, out_rom, patch_format,
+                                          rando.get_changed_extents())
+
+            # Never archive a patch which doesn't reproduce the seed.
+            if not romdiff.verify_patch(base_rom, out_rom, out_data):
+                raise romdiff.PatchFormatException(
+                    f'{patch_format} patch does not reproduce the rom.'
+                )
+
+        with open(result.out_path, 'wb') as outfile:
+            outfile.write(out_data)
+
+        if write_spoilers:
+            spoiler_args = (rom_name, result.flag_string, job.seed)
+            rando.write_spoiler_log(os.path.join(
+                out_dir, get_spoiler_name(*spoiler_args, '.txt')
+            ))
+            rando.write_json_spoiler_log(os.path.join(
+                out_dir, get_spoiler_name(*spoiler_args, '.json')
+            ))
+
+        timings['write'] = time.perf_counter() - write_start
+    except Exception:
+        result.error = traceback.format_exc()
+
+    timings['total'] = time.perf_counter() - start
+    return result
+
+
+def _run_worker_job(job: SeedJob, *args) -> SeedResult:
+    return run_job(_worker_rando, job, *args)
+
+
+def generate_seeds(rom: bytes, jobs: Iterable[SeedJob],
+                   out_dir: str, rom_name: str = 'ct.sfc',
+                   max_workers: Optional[int] = None,
+                   patch_format: Optional[str] = None,
+                   write_spoilers: bool = False,
+                   chronosanity_max_nodes: Optional[int] =
+                   logicwriters.DEFAULT_MAX_NODES,
+                   chronosanity_max_restarts: int =
+                   logicwriters.DEFAULT_MAX_RESTARTS) -> Iterator[SeedResult]:
+    '''
+    Generate every job's seed from rom and write the results to out_dir.
+    Results are yielded as soon as each seed finishes.  A job which fails
+    yields a SeedResult with error set instead of stopping the batch.  A
+    seed whose key item search runs out of restarts fails with
+    logicwriters.KeyItemFillException, and can be rolled again.
+
+    rom_name only determines the output file names.  When max_workers is
+    1, the seeds are generated in this process without a pool.  See run_job
+    for patch_format and logicwriters.commitKeyItems for the Chronosanity
+    search budget.
+    '''
+    rom = bytes(rom)
+    jobs = list(jobs)
+    os.makedirs(out_dir, exist_ok=True)
+    job_args = (out_dir, rom_name, patch_format, write_spoilers)
+    rando_kwargs = {
+        'chronosanity_max_nodes': chronosanity_max_nodes,
+        'chronosanity_max_restarts': chronosanity_max_restarts
+    }
+
+    if max_workers == 1:
+        rando = randomizer.Randomizer(rom, is_vanilla=False,
+                                      reuse_out_rom=True, **rando_kwargs)
+        for job in jobs:
+            yield run_job(rando, job, *job_args)
+        return
+
+    warm_settings = jobs[0].settings if jobs else None
+
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker,
+                             initargs=(rom, warm_settings,
+                                       rando_kwargs)) as executor:
+        futures = [
+            executor.submit(_run_worker_job, job, *job_args)
+            for job in jobs
+        ]
+
+        for future in as_completed(futures):
+            yield future.result()
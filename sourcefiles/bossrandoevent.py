@@ -12,15 +12,16 @@ import bossscaler
 import bossspot
 from ctenums import LocID, BossID, EnemyID, CharID, Element, StatusEffect,\
     RecruitID
-from ctevent import Event, free_event, get_loc_event_ptr
+from ctevent import Event, free_event
 from ctrom import CTRom
 import enemyrewards
-from eventcommand import EventCommand as EC, get_command, FuncSync
-from eventfunction import EventFunction as EF
+from eventcommand import EventCommand as EC, CommandView, get_command, \
+    FuncSync
+from eventfunction import EventFunction as EF, FunctionTemplate
 # from eventscript import get_location_script, get_loc_event_ptr
 from freespace import FreeSpace as FS
-from mapmangler import LocExits, duplicate_heckran_map, duplicate_map, \
-    duplicate_location_data
+from mapmangler import LocExits, LocationTable, duplicate_heckran_map, \
+    duplicate_map, duplicate_location_data
 
 import randosettings as rset
 import randoconfig as cfg
@@ -260,13 +261,14 @@ def set_zenan_bridge_boss(ctrom: CTRom, boss: BossScheme):
         first_id, first_slot = boss.ids[0], boss.slots[0]
 
         while pos < script.get_function_end(0xB, 0):
-            cmd = get_command(script.data, pos)
+            cmd = CommandView(script.data, pos)
 
             # print(cmd)
             if cmd.command in EC.fwd_jump_commands:
-                pos += (cmd.args[-1] - 1)
+                pos += (cmd.get_arg(-1) - 1)
             elif cmd.command == 0x83:
                 found_boss = True
+                cmd = get_command(script.data, pos)
                 cmd.args[0] = first_id
                 cmd.args[1] = first_slot
                 script.data[pos:pos+len(cmd)] = cmd.to_bytearray()
@@ -658,8 +660,9 @@ def set_sun_palace_boss(ctrom: CTRom, boss: BossScheme):
     pos += 3
     cmd = EC.set_object_coordinates(0x100, 0x1FF, False)
 
-    script.delete_commands(pos, 1)
-    script.insert_commands(cmd.to_bytearray(), pos)
+    with script.edit_batch() as batch:
+        batch.delete_commands(pos, 1)
+        batch.insert_commands(cmd.to_bytearray(), pos)
 
     boss_objs = [0xB, 0xC, 0xD, 0xE, 0xF]
     num_used = min(len(boss.ids), len(boss_objs))
@@ -875,22 +878,25 @@ def set_mt_woe_boss(ctrom: CTRom, boss: BossScheme):
     loc_id = LocID.MT_WOE_SUMMIT
     script = ctrom.script_manager.get_script(loc_id)
 
+    batch = script.edit_batch()
+
     # Copy blank tiles over GG's body
     pos = script.get_object_start(0)
     copytiles = EC.copy_tiles(2, 1, 0xD, 9, 0x2, 0x11,
                               copy_l1=True, copy_l2=True, copy_l3=True,
                               copy_props=True, wait_vblank=False)
-    script.insert_commands(copytiles.to_bytearray(), pos)
+    batch.insert_commands(copytiles.to_bytearray(), pos)
 
     # Copy on return from menu too.
     copytiles_vblank = copytiles.copy()
     copytiles_vblank.command = 0xE4
     pos = script.get_function_start(0, 1)
-    script.insert_commands(copytiles_vblank.to_bytearray(), pos)
+    batch.insert_commands(copytiles_vblank.to_bytearray(), pos)
 
     # delete the loading of melchior
     pos = script.get_function_start(8, 0)
-    script.delete_commands(pos, 1)
+    batch.delete_commands(pos, 1)
+    batch.apply()
 
     boss_objs = [0x0A, 0x0B, 0x0C]
 
@@ -1006,8 +1012,9 @@ def set_arris_dome_boss(ctrom: CTRom, boss: BossScheme):
                                unk_0x20=True,
                                wait_vblank=False)
 
+    batch = script.edit_batch()
     pos = script.get_function_start(0, 1)
-    script.insert_commands(copy_tiles.to_bytearray(), pos)
+    batch.insert_commands(copy_tiles.to_bytearray(), pos)
 
     # copy the vblank waiting version to obj0 func 1 for post-menu
     copy_tiles_vblank = EC.copy_tiles(3, 0x11, 0xC, 0x1C,
@@ -1020,7 +1027,8 @@ def set_arris_dome_boss(ctrom: CTRom, boss: BossScheme):
                                       wait_vblank=True)
 
     pos = script.get_function_start(0, 0)
-    script.insert_commands(copy_tiles_vblank.to_bytearray(), pos)
+    batch.insert_commands(copy_tiles_vblank.to_bytearray(), pos)
+    batch.apply()
 
     first_x, first_y = 0x80, 0xB8
     # first_x, first_y = 0x80, 0xC8
@@ -1161,11 +1169,12 @@ def set_object_boss(script: Event, obj_id: int, boss_id: int, boss_slot: int,
     pos = start
     while pos < end:
 
-        cmd = get_command(script.data, pos)
+        cmd = CommandView(script.data, pos)
 
         if cmd.command in EC.fwd_jump_commands and ignore_jumps:
-            pos += (cmd.args[-1] - 1)
+            pos += (cmd.get_arg(-1) - 1)
         elif cmd.command == 0x83:
+            cmd = get_command(script.data, pos)
             is_static = cmd.args[1] & 0x80
             cmd.args[0], cmd.args[1] = boss_id, (boss_slot | is_static)
             script.data[pos:pos+len(cmd)] = cmd.to_bytearray()
@@ -1184,10 +1193,10 @@ def set_object_coordinates(script: Event, obj_id: int, x: int, y: int,
     pos = start
     while pos < end:
 
-        cmd = get_command(script.data, pos)
+        cmd = CommandView(script.data, pos)
 
         if cmd.command in EC.fwd_jump_commands and ignore_jumps:
-            pos += (cmd.args[-1] - 1)
+            pos += (cmd.get_arg(-1) - 1)
         elif cmd.command in [0x8B, 0x8D]:
             new_coord_cmd = EC.set_object_coordinates(x, y, shift)
             # print(f"x={x:04X}, y={y:04X}")
@@ -1244,23 +1253,48 @@ def append_boss_object(script: Event, boss: BossScheme, part_index: int,
     # input()
 
     # Make the new object
-    init = EF()
-    init.add(EC.load_enemy(new_id, new_slot)) \
-        .add(EC.set_object_coordinates(new_x, new_y, shift)) \
-        .add(EC.set_own_drawing_status(is_shown)) \
-        .add(EC.return_cmd()) \
-        .add(EC.end_cmd())
-
-    act = EF()
-    act.add(EC.return_cmd())
+    coord_cmd = EC.set_object_coordinates(new_x, new_y, shift)
+    template = _get_boss_init_template(coord_cmd.command, is_shown)
+    init = template.instantiate(enemy_id=new_id, enemy_slot=new_slot,
+                                x=coord_cmd.args[0], y=coord_cmd.args[1])
 
     obj_id = script.append_empty_object()
     script.set_function(obj_id, 0, init)
-    script.set_function(obj_id, 1, act)
+    script.set_function(obj_id, 1, _boss_act_bytes)
 
     return obj_id
 
 
+# Boss object startup functions only differ by the coordinate command (tile
+# or pixel) and the drawing status.  (coord command id, is_shown) --> template
+_boss_init_templates: dict[tuple[int, bool], FunctionTemplate] = dict()
+_boss_act_bytes = bytes(EF().add(EC.return_cmd()).get_bytearray())
+
+
+def _get_boss_init_template(coord_cmd_id: int,
+                            is_shown: bool) -> FunctionTemplate:
+    key = (coord_cmd_id, is_shown)
+    if key not in _boss_init_templates:
+        init = EF()
+        init.set_label('load')
+        init.add(EC.load_enemy(0, 0))
+        init.set_label('coords')
+        init.add(EC.generic_two_arg(coord_cmd_id, 0, 0)) \
+            .add(EC.set_own_drawing_status(is_shown)) \
+            .add(EC.return_cmd()) \
+            .add(EC.end_cmd())
+
+        _boss_init_templates[key] = (
+            FunctionTemplate(init)
+            .add_arg_slot('enemy_id', 'load', 0)
+            .add_arg_slot('enemy_slot', 'load', 1)
+            .add_arg_slot('x', 'coords', 0)
+            .add_arg_slot('y', 'coords', 1)
+        )
+
+    return _boss_init_templates[key]
+
+
 # When Giga Gaia and Mother Brain get put into the pool, Zenan Bridge will
 # hit the sprite limit.  This function will copy Zenan Bridge to a new map
 # and adjust the scripts to link them together appropriately.
@@ -1296,7 +1330,6 @@ def duplicate_zenan_bridge(ctrom: CTRom, dup_loc_id: LocID):
     # Insert the transition commands after the party moves
     new_move_party = EC.move_party(0x8B, 0x08, 0x8B, 0x7, 0x8B, 0x0A)
 
-    script.delete_commands(pos, 1)
     # pos += len(new_move_party)
 
     change_loc = EC.change_location(dup_loc_id, 0x08, 0x08)
@@ -1312,13 +1345,13 @@ def duplicate_zenan_bridge(ctrom: CTRom, dup_loc_id: LocID):
         .add(change_loc)
     )
 
-    script.insert_commands(insert_cmds.get_bytearray(), pos)
-
     # after the move party in the normal script, each pc strikes a pose and the
     # screen scrolls (4 commands). We'll delete those commands because they'll
-    # never get executed since we're changing location.
-    pos += len(insert_cmds.get_bytearray())
-    script.delete_commands(pos, 4)
+    # never get executed since we're changing location.  So the old move
+    # party and the 4 commands are all replaced by the new commands.
+    with script.edit_batch() as batch:
+        batch.delete_commands(pos, 5)
+        batch.insert_commands(insert_cmds.get_bytearray(), pos)
 
     # Now, trim down the event for the duplicate map by removing the skeletons
     # other than the ones that make Zombor and the guards.
@@ -1457,8 +1490,8 @@ def duplicate_maps(fsrom: FS):
     #     There's no real value to doing so.
 
     loc_id = 0x2F  # Orig Heckran location id
-    loc_ptr = get_loc_event_ptr(fsrom.getbuffer(), loc_id)
-    script = Event.from_rom(fsrom.getbuffer(), loc_ptr)
+    loc_ptr = LocationTable.from_fsrom(fsrom).get_event_ptr(loc_id)
+    script = Event.from_rom(fsrom.getview(), loc_ptr)
 
     del_objs = [0x18, 0x17, 0x16, 0x15, 0x14, 0x13, 0x12, 0x11, 0x10, 0xF,
                 0xE, 0xC, 2, 1]
@@ -1473,8 +1506,8 @@ def duplicate_maps(fsrom: FS):
     #     command of Obj8, Activate.  It's after a 'If Marle in party' command.
 
     loc_id = 0x1B9
-    loc_ptr = get_loc_event_ptr(fsrom.getbuffer(), loc_id)
-    script = Event.from_rom(fsrom.getbuffer(), loc_ptr)
+    loc_ptr = LocationTable.from_fsrom(fsrom).get_event_ptr(loc_id)
+    script = Event.from_rom(fsrom.getview(), loc_ptr)
 
     # Find the if Marle is in party command
     (pos, cmd) = script.find_command([0xD2],
@@ -1508,8 +1541,8 @@ def duplicate_maps(fsrom: FS):
     # duplicate the King's Trial, 0x1B6, to 0xC1 (unused)
     duplicate_location_data(fsrom, 0x1B6, 0xC1)
 
-    loc_ptr = get_loc_event_ptr(fsrom.getbuffer(), 0x1B6)
-    script = Event.from_rom(fsrom.getbuffer(), loc_ptr)
+    loc_ptr = LocationTable.from_fsrom(fsrom).get_event_ptr(0x1B6)
+    script = Event.from_rom(fsrom.getview(), loc_ptr)
 
     # Can delete:
     #   - Object 0xB: The false witness against the king
@@ -2247,8 +2247,8 @@ def reassign_characters_on_ctrom(ctrom: CTRom, config: cfg.RandoConfig):
     fix_ayla_fist(rom, reassign)
     space_man.mark_block((0x4F1100, 0x4F1140), mark_used)
 
-    # Write everything back to the ctrom
-    ctrom.rom_data.seek(0)
-    ctrom.rom_data.write(rom, no_mark)
+    # Write back only what changed so that the rom's write journal (and any
+    # patch made from it) does not cover the whole rom.
+    ctrom.rom_data.write_changes(rom, no_mark)
 
     fix_kings_trial_anim(ctrom, config)
@@ -0,0 +1,118 @@
+'''
+Snapshots of the base RandoConfig read from a (patched) rom.
+
+Reading the techdb, enemy AI/attacks, enemy stats, items and shops out of
+the rom is the same for every seed with a given base rom, game mode and
+difficulty.  The config is built once, pickled, and every later request gets
+a fresh copy by unpickling the snapshot, which is much cheaper than reading
+the rom again.
+
+Snapshots are kept in memory and in ./pickles/cache/.  The key combines
+  - the base rom and patch files (see patchcache.get_cache_key),
+  - the source of the randomizer modules, since they define how the config
+    is read and pickled, and
+  - a variant string naming the mode/difficulty.
+So the old workflow of re-dumping pickles by hand whenever patch.ips
+changed is no longer needed.
+'''
+from __future__ import annotations
+
+import copy
+import glob
+import hashlib
+import os
+import pickle
+from typing import Callable, Optional
+
+import diskcache
+import patchcache
+import randoconfig as cfg
+
+# Version of the on-disk format.  Bump when the pickled dict changes.
+_SNAPSHOT_VERSION = 1
+
+# key --> pickled config, or the config itself if it could not be pickled.
+_memory_cache: dict[str, bytes | cfg.RandoConfig] = dict()
+_source_digest: Optional[str] = None
+
+
+def get_source_digest() -> str:
+    '''Hash the randomizer's own source.  Computed once per process.'''
+    global _source_digest
+
+    if _source_digest is None:
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        hasher = hashlib.sha256()
+
+        for filename in sorted(glob.glob(os.path.join(src_dir, '*.py'))):
+            hasher.update(os.path.basename(filename).encode('utf-8'))
+            with open(filename, 'rb') as infile:
+                hasher.update(infile.read())
+
+        _source_digest = hasher.hexdigest()
+
+    return _source_digest
+
+
+def get_snapshot_key(base_rom: bytes, variant: str) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(_SNAPSHOT_VERSION.to_bytes(2, 'little'))
+    hasher.update(patchcache.get_cache_key(base_rom).encode('ascii'))
+    hasher.update(get_source_digest().encode('ascii'))
+    hasher.update(variant.encode('utf-8'))
+
+    return hasher.hexdigest()
+
+
+def _read_disk_snapshot(key: str) -> Optional[bytes]:
+    entry = diskcache.read_entry('config', key, _SNAPSHOT_VERSION)
+    if entry is None:
+        return None
+
+    return entry['config']
+
+
+def _write_disk_snapshot(key: str, config_pickle: bytes):
+    diskcache.write_entry('config', key, _SNAPSHOT_VERSION,
+                          config=config_pickle)
+
+
+def get_config_snapshot(
+        base_rom: bytes, variant: str,
+        build_config: Callable[[], cfg.RandoConfig],
+        use_disk: bool = True
+) -> cfg.RandoConfig:
+    '''
+    Return a fresh copy of the config that build_config() produces for
+    base_rom and variant.  build_config is only called when there is no
+    valid snapshot.  The caller owns the returned config and may edit it.
+    '''
+    key = get_snapshot_key(base_rom, variant)
+
+    snapshot = _memory_cache.get(key, None)
+
+    if snapshot is None and use_disk:
+        snapshot = _read_disk_snapshot(key)
+
+    if snapshot is None:
+        config = build_config()
+
+        try:
+            snapshot = pickle.dumps(config, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Keep the object itself and fall back to deepcopy.
+            snapshot = config
+        else:
+            if use_disk:
+                _write_disk_snapshot(key, snapshot)
+
+    _memory_cache[key] = snapshot
+
+    if isinstance(snapshot, bytes):
+        return pickle.loads(snapshot)
+
+    return copy.deepcopy(snapshot)
+
+
+def clear_memory_cache():
+    _memory_cache.clear()
@@ -118,13 +118,12 @@ def death_peak_singing_mountain_music(ctrom: CTRom,
         LocID.DEATH_PEAK_UPPER_NORTH_FACE
     ]
 
-    LocData = mapmangler.LocationData
-    rom = ctrom.rom_data.getbuffer()
+    loc_table = mapmangler.LocationTable.from_fsrom(ctrom.rom_data)
 
     for loc in death_peak_maps:
-        data = LocData.from_rom(rom, loc)
+        data = loc_table.get_location_data(loc)
         data.music = 0x52
-        data.write_to_rom(rom, loc)
+        loc_table.set_location_data(ctrom.rom_data, loc, data)
 
     script = ctrom.script_manager.get_script(LocID.DEATH_PEAK_GUARDIAN_SPAWN)
 
@@ -11,8 +11,19 @@ except ImportError:
     def compress(source):
         return compress_py(source)
 
+# Older builds of ctcompress only provide compress.  Use the native
+# decompression routines when present and the python versions otherwise.
+try:
+    from ctcompress import decompress, get_compressed_length
+except ImportError:
+    def decompress(rom, start):
+        return decompress_py(rom, start)
+
+    def get_compressed_length(rom, addr):
+        return get_compressed_length_py(rom, addr)
+
 
-def decompress(rom, start):
+def decompress_py(rom, start):
     out_buffer = bytearray([0 for i in range(0, 0x10000)])
 
     # First two bytes are little endian size of compressed packet
@@ -94,7 +105,7 @@ def decompress(rom, start):
 
 
 # Find the length of a compressed packet
-def get_compressed_length(rom, addr):
+def get_compressed_length_py(rom, addr):
 
     # First two bytes determine length of main body
     main_length = get_value_from_bytes(rom[addr:addr+2])
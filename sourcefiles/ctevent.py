@@ -1,14 +1,22 @@
 from __future__ import annotations
 
+import bisect
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from typing import Optional, Union
+
 from ctdecompress import compress, decompress, get_compressed_length, \
     get_compressed_packet
 from ctenums import LocID
 from byteops import get_value_from_bytes, to_little_endian, to_file_ptr, \
     to_rom_ptr
 import ctstrings
-from eventcommand import EventCommand as EC, get_command
+from eventcommand import EventCommand as EC, CommandView, get_command, \
+    get_command_length, decode_command
 from eventfunction import EventFunction as EF
 from freespace import FreeSpace as FS, FSRom, FSWriteType
+from mapmangler import LocationTable
 
 
 def get_compressed_script(rom, event_id):
@@ -35,21 +43,9 @@ def get_loc_event_ptr(rom, loc_id):
     # Each record is 14 bytes.  Bytes 8 and 9 (0-indexed) hold an index into
     # the pointer table for event scripts.
 
-    loc_data_st = 0x360000
-    event_ind_st = loc_data_st + 14*loc_id + 8
-
-    loc_script_ind = get_value_from_bytes(rom[event_ind_st:event_ind_st+2])
-
-    event_ptr_st = 0x3CF9F0
-
-    # Each event pointer is an absolute, 3 byte pointer
-    start = event_ptr_st + 3*loc_script_ind
-    event_ptr = \
-        get_value_from_bytes(rom[start:start+3])
-
-    event_ptr = to_file_ptr(event_ptr)
-
-    return event_ptr
+    # Reading many locations?  Decode them all at once with
+    # mapmangler.LocationTable.
+    return LocationTable.read_event_ptr(rom, loc_id)
 
 
 def get_location_script(rom, loc_id):
@@ -70,8 +66,8 @@ def get_location_script(rom, loc_id):
 def free_event(fsrom: FS, loc_id: int):
     ''' Mark a location's script and (if possible) strings as free space. '''
 
-    rom = fsrom.getbuffer()
-    event_ptr = get_loc_event_ptr(rom, loc_id)
+    rom = fsrom.getview()
+    event_ptr = LocationTable.from_fsrom(fsrom).get_event_ptr(loc_id)
     event_len = get_compressed_length(rom, event_ptr)
 
     fsrom.mark_block((event_ptr, event_ptr+event_len), FSWriteType.MARK_FREE)
@@ -119,6 +115,197 @@ def free_event(fsrom: FS, loc_id: int):
             pass
 
 
+def _first_difference(old: bytes, new: bytearray, start: int = 0) -> int:
+    '''
+    Index of the first byte at or after start where old and new differ.  If
+    one is a prefix of the other, the length of the shorter.
+    '''
+    size = min(len(old), len(new))
+    with memoryview(old) as old_view, memoryview(new) as new_view:
+        if old_view[start:size] == new_view[start:size]:
+            return max(size, start)
+
+        # old[start:lo] == new[start:lo] and old[start:hi] != new[start:hi]
+        lo, hi = start, size
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if old_view[lo:mid] == new_view[lo:mid]:
+                lo = mid
+            else:
+                hi = mid
+
+    return lo
+
+
+def _common_suffix_length(old: bytes, new: bytearray, limit: int) -> int:
+    '''Length of the longest common suffix of old and new, up to limit.'''
+    old_end, new_end = len(old), len(new)
+    with memoryview(old) as old_view, memoryview(new) as new_view:
+        def suffix_equal(start: int, stop: int) -> bool:
+            # Compare the suffix bytes [stop, start) from the end.
+            return old_view[old_end-stop:old_end-start] == \
+                new_view[new_end-stop:new_end-start]
+
+        if suffix_equal(0, limit):
+            return limit
+
+        # Suffixes of length lo are equal, of length hi are not.
+        lo, hi = 0, limit
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if suffix_equal(lo, mid):
+                lo = mid
+            else:
+                hi = mid
+
+    return lo
+
+
+class _CommandIndex:
+    '''
+    The offsets of an Event's commands, from the start of object 0 to the
+    end of the script, as found by stepping through the script with
+    get_command.  Also keeps the offsets grouped by opcode.
+
+    The index keeps a copy of the data it describes.  Event compares it with
+    the current data before every use, so writes made directly to
+    Event.data are picked up: only the commands around the changed bytes are
+    decoded again.
+    '''
+
+    def __init__(self, data: bytearray, start: int):
+        self.start = start
+        self.positions: list[int] = []
+        self.snapshot = bytes(data)
+        self._by_opcode: Optional[dict[int, list[int]]] = None
+
+        pos = start
+        while pos < len(data):
+            self.positions.append(pos)
+            pos += get_command_length(data, pos)
+
+    @property
+    def by_opcode(self) -> dict[int, list[int]]:
+        if self._by_opcode is None:
+            by_opcode = dict()
+            snapshot = self.snapshot
+            for pos in self.positions:
+                by_opcode.setdefault(snapshot[pos], []).append(pos)
+
+            self._by_opcode = by_opcode
+
+        return self._by_opcode
+
+    def is_boundary(self, pos: int) -> bool:
+        ind = bisect.bisect_left(self.positions, pos)
+        return ind < len(self.positions) and self.positions[ind] == pos
+
+    def find_first(self, cmd_ids, start: int, end: int) -> Optional[int]:
+        '''Offset of the first command in cmd_ids in [start, end).'''
+        ret = None
+        by_opcode = self.by_opcode
+        for cmd_id in set(cmd_ids):
+            cmd_list = by_opcode.get(cmd_id, None)
+            if cmd_list:
+                ind = bisect.bisect_left(cmd_list, start)
+                if ind < len(cmd_list) and cmd_list[ind] < end and \
+                   (ret is None or cmd_list[ind] < ret):
+                    ret = cmd_list[ind]
+
+        return ret
+
+    def get_range(self, cmd_ids, start: int, end: int) -> list[int]:
+        '''Sorted offsets in [start, end) of the commands in cmd_ids.'''
+        ret = []
+        by_opcode = self.by_opcode
+        for cmd_id in set(cmd_ids):
+            cmd_list = by_opcode.get(cmd_id, None)
+            if cmd_list:
+                ret.extend(cmd_list[bisect.bisect_left(cmd_list, start):
+                                    bisect.bisect_left(cmd_list, end)])
+
+        ret.sort()
+        return ret
+
+    def update(self, data: bytearray, old_st: int, old_end: int,
+               new_end: int) -> bool:
+        '''
+        Data has changed from self.snapshot by replacing old bytes
+        [old_st, old_end) with new bytes [old_st, new_end).  Bytes outside of
+        that range are allowed to differ only in ways which do not change
+        the length of any command.  Decode the commands over the changed
+        range and shift the rest.  Returns False if the index has to be
+        rebuilt instead.
+        '''
+        positions = self.positions
+        if old_st < self.start or not positions:
+            return False
+
+        delta = new_end - old_end
+
+        # Decode from the start of the command containing old_st, or from
+        # old_st itself if it is the end of the script (appending).
+        first_ind = bisect.bisect_right(positions, old_st) - 1
+        if old_st == len(self.snapshot):
+            first_ind = len(positions)
+            pos = old_st
+        else:
+            pos = positions[first_ind]
+
+        # Old commands from resync_ind on are unchanged, just shifted.
+        resync_ind = bisect.bisect_left(positions, old_end)
+
+        new_positions = []
+        while pos < len(data):
+            if pos >= new_end:
+                while resync_ind < len(positions) and \
+                        positions[resync_ind] + delta < pos:
+                    resync_ind += 1
+
+                if resync_ind < len(positions) and \
+                   positions[resync_ind] + delta == pos:
+                    break
+
+            new_positions.append(pos)
+            pos += get_command_length(data, pos)
+        else:
+            resync_ind = len(positions)
+
+        removed = positions[first_ind:resync_ind]
+        shifted = [x + delta for x in positions[resync_ind:]]
+        positions[first_ind:] = new_positions + shifted
+
+        if self._by_opcode is not None:
+            if not removed and not new_positions and delta == 0:
+                pass
+            elif delta == 0 and removed == new_positions and \
+                    all(data[x] == self.snapshot[x] for x in removed):
+                # Only arguments changed.
+                pass
+            else:
+                self.__update_by_opcode(data, removed, new_positions, delta)
+
+        self.snapshot = bytes(data)
+        return True
+
+    def __update_by_opcode(self, data: bytearray, removed: list[int],
+                           added: list[int], delta: int):
+        if removed:
+            remove_st, remove_end = removed[0], removed[-1] + 1
+        elif added:
+            remove_st = remove_end = added[0]
+        else:
+            return
+
+        for cmd_list in self._by_opcode.values():
+            st_ind = bisect.bisect_left(cmd_list, remove_st)
+            end_ind = bisect.bisect_left(cmd_list, remove_end)
+            cmd_list[st_ind:] = [x + delta for x in cmd_list[end_ind:]]
+
+        for pos in added:
+            bisect.insort(self._by_opcode.setdefault(data[pos], []), pos)
+
+
 # The strategy is to handle the event very similarly to how the game does.
 # The event is just one big list of commands with pointers giving the starts
 # of relevant entities (objects, functions).
@@ -134,6 +321,49 @@ class Event:
 
         self.strings = []
 
+        # Built the first time a command lookup needs it.
+        self._cmd_index: Optional[_CommandIndex] = None
+
+    def __get_command_index(self) -> _CommandIndex:
+        '''
+        Return the command index, bringing it up to date with any changes
+        made to self.data since it was last used.
+        '''
+        start = self.get_object_start(0)
+        index = self._cmd_index
+
+        if index is not None and index.start == start:
+            old_data = index.snapshot
+            if old_data == self.data:
+                return index
+
+            # Changes to the pointers before the commands (e.g. from
+            # set_function) do not move any commands.
+            first_diff = _first_difference(old_data, self.data, start)
+            suffix_len = _common_suffix_length(
+                old_data, self.data,
+                min(len(old_data), len(self.data)) - first_diff
+            )
+
+            if index.update(self.data, first_diff,
+                            len(old_data) - suffix_len,
+                            len(self.data) - suffix_len):
+                return index
+
+        self._cmd_index = _CommandIndex(self.data, start)
+        return self._cmd_index
+
+    def __update_command_index(self, old_st: int, old_end: int,
+                               new_end: int):
+        '''
+        Tell the index that this Event replaced data [old_st, old_end) with
+        data [old_st, new_end).  See _CommandIndex.update.
+        '''
+        index = self._cmd_index
+        if index is not None and \
+           not index.update(self.data, old_st, old_end, new_end):
+            self._cmd_index = None
+
     def get_bytearray(self) -> bytearray:
         return bytearray([self.num_objects]) + self.data
 
@@ -170,15 +400,10 @@ class Event:
         fn_start = script.get_function_start(0, 0)
         fn_end = script.get_object_end(0)  # TODO: write a get_function_end
 
-        pos = fn_start
-        while pos < fn_end:
-            cmd = get_command(script.data, pos)
-            if cmd.command == 0xB8:
-                script.data[pos+1:pos+4] = string_index_b[:]
+        for pos in script.find_all_commands([0xB8], fn_start, fn_end):
+            script.data[pos+1:pos+4] = string_index_b[:]
 
-            pos += len(cmd)
-
-        compr_event = compress(script.get_bytearray())
+        compr_event = compress_script_data(script.get_bytearray())
 
         # debug stuff
         '''
@@ -202,21 +427,8 @@ class Event:
         fsrom.write(compr_event, FSWriteType.MARK_USED)
 
         # Now write the location's pointer
-        # Location data begins at 0x360000.
-        loc_data_st = 0x360000
-        event_ind_st = loc_data_st + 14*loc_id + 8
-
-        loc_script_ind = \
-            get_value_from_bytes(fsrom.getbuffer()[event_ind_st:
-                                                   event_ind_st+2])
-
-        event_ptr_st = 0x3CF9F0
-
-        # Each event pointer is an absolute, 3 byte pointer
-        loc_ptr = event_ptr_st + 3*loc_script_ind
-
-        fsrom.seek(loc_ptr)
-        fsrom.write(to_little_endian(to_rom_ptr(script_ptr), 3))
+        LocationTable.from_fsrom(fsrom).set_event_ptr(fsrom, loc_id,
+                                                      script_ptr)
 
     # End write_to_rom_fs
 
@@ -226,8 +438,16 @@ class Event:
         ptr = get_loc_event_ptr(rom, loc_id)
         return Event.from_rom(rom, ptr)
 
-    def from_flux(filename: str):
-        '''Reads a .flux file and loads it into an Event'''
+    def from_flux(filename: str) -> Event:
+        '''
+        Reads a .flux file and loads it into an Event.  The parsed file is
+        cached (see fluxcache), so each call only costs a copy.
+        '''
+        import fluxcache
+        return fluxcache.get_flux_event(filename)
+
+    def parse_flux(filename: str) -> Event:
+        '''Parses a .flux file into an Event without any caching.'''
 
         with open(filename, 'rb') as infile:
             flux = bytearray(infile.read())
@@ -356,12 +576,13 @@ class Event:
         string_indices = set()
 
         while pos < end:
-            cmd = get_command(self.data, pos)
+            length, cmd_id = decode_command(self.data, pos)
 
-            if cmd in EC.str_commands:
-                string_indices.add(cmd.args[0])
+            # string index argument is 0th arg
+            if cmd_id in EC.str_commands:
+                string_indices.add(self.data[pos+1])
 
-            pos += len(cmd)
+            pos += length
 
         string_indices = sorted(list(string_indices))
         strings = [self.strings[i][:] for i in string_indices]
@@ -374,23 +595,14 @@ class Event:
         start = self.get_function_start(0, 0)
         end = self.get_object_end(0)
 
-        pos = start
-        found = False
-        while pos < end:
-            cmd = get_command(self.data, pos)
-
-            if cmd.command == 0xB8:
-                string_index = cmd.args[0]
-                found = True
-                # Can maybe just return here.  There should only be one
+        # Can maybe just use the first.  There should only be one
+        positions = self.find_all_commands([0xB8], start, end)
 
-            pos += len(cmd)
-
-        if not found:
+        if not positions:
             print("Warning: No string index.")
             return None
 
-        return string_index
+        return CommandView(self.data, positions[-1]).get_arg(0)
 
     # Using the FS object's getbuffer() gives a memoryview which doesn't
     # support bytearray's .index method.  This is a stupid short method to
@@ -414,20 +626,12 @@ class Event:
 
         # First find the location where string pointers are stored by finding
         # the "string index" command in the script.
-        pos = self.get_object_start(0)
-
         str_pos = None
-        while pos < len(self.data):
-            cmd = get_command(self.data, pos)
-
-            if cmd.command == 0xB8:
-                str_pos = cmd.args[0]
-                # print(cmd)
 
-                # The string index should only be set once
-                # break
-
-            pos += len(cmd)
+        # The string index should only be set once, but use the last.
+        index_positions = self.find_all_commands([0xB8])
+        if index_positions:
+            str_pos = CommandView(self.data, index_positions[-1]).get_arg(0)
 
         if str_pos is None:
             self.orig_str_index = None
@@ -442,16 +646,10 @@ class Event:
         # store these to go back and update the indices if we have to
         str_addrs = []
 
-        pos = self.get_object_start(0)
-        while pos < len(self.data):
-            cmd = get_command(self.data, pos)
-
-            if cmd.command in EC.str_commands:
-                # string index argument is 0th arg
-                str_indices.add(cmd.args[0])
-                str_addrs.append(pos+1)
-
-            pos += len(cmd)
+        for pos in self.find_all_commands(EC.str_commands):
+            # string index argument is 0th arg
+            str_indices.add(self.data[pos+1])
+            str_addrs.append(pos+1)
 
         # turn str_indices into a sorted list
         str_indices = sorted(list(str_indices))
@@ -522,17 +720,11 @@ class Event:
 
         # addresses in the script data where an index is located
         # store these to go back and update the indices if we have to
-        pos = self.get_object_start(0)
-        while pos < len(self.data):
-            cmd = get_command(self.data, pos)
-
-            if cmd.command in EC.str_commands:
-                # string index argument is 0th arg.  In other words
-                # index is in self.data[pos+1]
-                self.data[pos+1] = \
-                    self.orig_str_indices.index(self.data[pos+1])
-
-            pos += len(cmd)
+        for pos in self.find_all_commands(EC.str_commands):
+            # string index argument is 0th arg.  In other words
+            # index is in self.data[pos+1]
+            self.data[pos+1] = \
+                self.orig_str_indices.index(self.data[pos+1])
 
     def get_object_start(self, obj_id: int) -> int:
         return get_value_from_bytes(self.data[32*obj_id: 32*obj_id+2])
@@ -673,14 +865,14 @@ class Event:
 
         pos = 0
         while pos < len(script.data):
-            cmd = get_command(script.data, pos)
-            if cmd.command in EC.str_commands:
+            length, cmd_id = decode_command(script.data, pos)
+            if cmd_id in EC.str_commands:
                 # add num_strs to get new data
                 # pos+1 is the location of the string index argument for all
                 # string commands
                 script.data[pos+1] += num_strs
 
-            pos += len(cmd)
+            pos += length
 
         # Now insert the data and update pointers
         num_ins_obj = script.num_objects
@@ -760,8 +952,11 @@ class Event:
         return self.num_objects-1
 
     def set_function(self, obj_id: int, func_id: int,
-                     ev_func: EF):
-        '''Sets the given EventFunction in the script.'''
+                     ev_func: Union[EF, bytes]):
+        '''
+        Sets the given EventFunction in the script.  The function may also
+        be given as bytes, such as an instantiated FunctionTemplate.
+        '''
         
         # The main difficulty is figuring out where the function should
         # actually begin.  The default behavior of CT scripts is that
@@ -822,13 +1017,18 @@ class Event:
 
         # By here we should have sorted out what the real start and end
         # positions should be
+        if isinstance(ev_func, EF):
+            func_bytes = ev_func.get_bytearray()
+        else:
+            func_bytes = ev_func
+
         old_size = func_end - func_st
-        new_size = len(ev_func.get_bytearray())
+        new_size = len(func_bytes)
         shift = new_size - old_size
 
         # print(f"{func_st+1:04X} to {func_end+1:04X}")
 
-        self.data[func_st:func_end] = ev_func.get_bytearray()
+        self.data[func_st:func_end] = func_bytes
 
         # Now shift all of the pointers after the one for the function we set
         # TODO: Make sure that function starts are really monotone
@@ -920,17 +1120,70 @@ class Event:
 
         # print(f"{start_pos:04X}, {end_pos:04X}")
 
+        index = self.__get_command_index()
+        if index.is_boundary(start_pos):
+            pos = index.find_first(cmd_ids, start_pos, end_pos)
+            if pos is None:
+                return (None, None)
+
+            return (pos, get_command(self.data, pos))
+
+        # A start which isn't on a command boundary of the script.  Step
+        # through the commands from there.
         pos = start_pos
         while pos < end_pos:
-            cmd = get_command(self.data, pos)
+            length, cmd_id = decode_command(self.data, pos)
 
-            if cmd.command in cmd_ids:
-                return (pos, cmd)
+            if cmd_id in cmd_ids:
+                return (pos, get_command(self.data, pos))
 
-            pos += len(cmd)
+            pos += length
 
         return (None, None)
 
+    def find_all_commands(self, cmd_ids: list[int],
+                          start_pos: int = None,
+                          end_pos: int = None) -> list[int]:
+        '''
+        Returns the sorted positions of all commands in cmd_ids, searching
+        as find_command does.
+        '''
+        if start_pos is None or start_pos < 0:
+            start_pos = self.get_object_start(0)
+
+        if end_pos is None or end_pos > len(self.data):
+            end_pos = len(self.data)
+
+        index = self.__get_command_index()
+        if index.is_boundary(start_pos):
+            return index.get_range(cmd_ids, start_pos, end_pos)
+
+        ret = []
+        pos = start_pos
+        while pos < end_pos:
+            length, cmd_id = decode_command(self.data, pos)
+            if cmd_id in cmd_ids:
+                ret.append(pos)
+
+            pos += length
+
+        return ret
+
+    def get_command_start(self, pos: int) -> Optional[int]:
+        '''
+        Returns the start of the command containing pos, or None if pos is
+        not in the commands of the script.
+        '''
+        if not 0 <= pos < len(self.data):
+            return None
+
+        positions = self.__get_command_index().positions
+        ind = bisect.bisect_right(positions, pos) - 1
+        if ind < 0:
+            return None
+
+        return positions[ind]
+
     def find_exact_command(self, find_cmd: EC, start_pos: int = None,
                            end_pos: int = None) -> int:
 
@@ -942,19 +1195,17 @@ class Event:
 
         jump_cmds = EC.fwd_jump_commands + EC.back_jump_commands
 
-        pos = start_pos
-        while pos < end_pos:
+        # Either match requires the same command id, so only look at those.
+        for pos in self.find_all_commands([find_cmd.command],
+                                          start_pos, end_pos):
             cmd = get_command(self.data, pos)
 
             if cmd == find_cmd:
                 return pos
             elif (cmd.command in jump_cmds and
-                  cmd.command == find_cmd.command and
                   cmd.args[0:-1] == find_cmd.args[0:-1]):
                 return pos
 
-            pos += len(cmd)
-
         return None
 
     # Helper method to shift all jumps by a given amount.  Typically this
@@ -973,34 +1224,29 @@ class Event:
                       after_pos: int,
                       shift: int):
 
-        pos = self.get_object_start(0)
-
         jmp_cmds = EC.fwd_jump_commands + EC.back_jump_commands
 
-        while True:
-            # Find the next jump command
-            (pos, cmd) = self.find_command(jmp_cmds, pos)
+        # Changing jump lengths doesn't move any commands, so the positions
+        # can all be found up front.
+        for pos in self.find_all_commands(jmp_cmds):
+            cmd = CommandView(self.data, pos)
 
-            if pos is None:
-                break
-            else:
-                jump_mult = 2*(cmd.command in EC.fwd_jump_commands)-1
-                jump_target = pos + len(cmd) + cmd.args[-1]*jump_mult - 1
-
-                st = min(jump_target, pos)
-                end = max(jump_target, pos)
+            # The jump length is always the last (one byte) argument.
+            arg_pos = cmd.get_arg_offset(-1)
+            jump_mult = 2*(cmd.command in EC.fwd_jump_commands)-1
+            jump_target = pos + len(cmd) + self.data[arg_pos]*jump_mult - 1
 
-                # the >= and < are due to treating [before_pos, after_pos)
-                # as a half open interval (as python tends to do)
-                if end >= after_pos and st < before_pos:
-                    arg_offset = len(cmd) - cmd.arg_lens[-1]
-                    self.data[pos+arg_offset] += shift
-                else:
-                    pass
-                    # print('not shifting')
-                    # input()
+            st = min(jump_target, pos)
+            end = max(jump_target, pos)
 
-                pos += len(cmd)
+            # the >= and < are due to treating [before_pos, after_pos)
+            # as a half open interval (as python tends to do)
+            if end >= after_pos and st < before_pos:
+                self.data[arg_pos] += shift
+            else:
+                pass
+                # print('not shifting')
+                # input()
 
     # Helper method for dealing with insertions and deletions.
     # All function starts strictly exceeding start_thresh will be shifted
@@ -1048,9 +1294,9 @@ class Event:
                 print("Error: Deleting out of script's range.")
                 exit()
 
-            cmd = get_command(self.data, pos)
-            cmd_len += len(cmd)
-            pos += len(cmd)
+            length = get_command_length(self.data, pos)
+            cmd_len += length
+            pos += length
 
         pos = del_pos
 
@@ -1062,15 +1308,16 @@ class Event:
                             shift=-cmd_len)
 
         del(self.data[del_pos:del_pos+cmd_len])
+        self.__update_command_index(del_pos, del_pos+cmd_len, del_pos)
 
     def delete_commands_range(self, del_start_pos, del_end_pos):
         pos = del_start_pos
         length_to_delete = del_end_pos - del_start_pos
         deleted_length = 0
         while deleted_length < length_to_delete:
-            cmd = get_command(self.data, pos)
+            length = get_command_length(self.data, pos)
             self.delete_commands(pos)
-            deleted_length += len(cmd)
+            deleted_length += length
 
         if deleted_length != length_to_delete:
             print('Warning: Last deleted command exceeded del_end_pos')
@@ -1105,7 +1352,9 @@ class Event:
         # print(f"{ins_position: 04X}")
         # input()
 
-        # Finally simplifying this using the __shift methods
+        # Finally simplifying this using the __shift methods.
+        # __shift_jumps also brings the command index up to date before the
+        # insertion.
         self.__shift_jumps(ins_position, ins_position, len(new_commands))
         self.__shift_starts(ins_position, len(new_commands))
 
@@ -1159,6 +1408,8 @@ class Event:
         # print("done backward jumps")
         '''
         self.data[ins_position:ins_position] = new_commands
+        self.__update_command_index(ins_position, ins_position,
+                                    ins_position+len(new_commands))
 
         '''
         # Every function start pointer whose value exceeds the insertion
@@ -1173,6 +1424,210 @@ class Event:
                     to_little_endian(ptr_loc+len(new_commands), 2)
         '''
 
+    def edit_batch(self) -> EventEditBatch:
+        '''
+        Returns an EventEditBatch for queueing edits to this script.  See
+        EventEditBatch.
+        '''
+        return EventEditBatch(self)
+
+    def apply_edits(self, edits: list[tuple[int, int, bytes]]):
+        '''
+        Apply many edits with one pass over the jumps and function pointers.
+        Each edit is (pos, del_len, new_commands) and replaces
+        data[pos:pos+del_len] with new_commands.  Every pos is a position
+        in the script before any of the edits are made.
+
+        The result is the same as calling delete_commands/insert_commands for
+        each edit, going from the last position to the first.  At a shared
+        position the deletion comes first and the insertions keep the order
+        that they were given in.
+        '''
+        if not edits:
+            return
+
+        # Combine the edits at each position into one replacement.
+        by_pos: dict[int, list] = dict()
+        for pos, del_len, new_commands in edits:
+            edit = by_pos.setdefault(pos, [0, bytearray()])
+            if del_len:
+                if edit[0]:
+                    raise ValueError(f'Two deletions at {pos:04X}.')
+                edit[0] = del_len
+            edit[1] += new_commands
+
+        merged = [(pos, by_pos[pos][0], by_pos[pos][1])
+                  for pos in sorted(by_pos.keys())]
+
+        if merged[0][0] < self.get_object_start(0):
+            raise ValueError('Editing the script\'s pointers.')
+
+        prev_end = 0
+        for pos, del_len, _ in merged:
+            if pos < prev_end:
+                raise ValueError(f'Edit at {pos:04X} is inside a deletion.')
+            prev_end = pos + del_len
+
+        if prev_end > len(self.data):
+            raise ValueError('Deleting out of script\'s range.')
+
+        # Each jump and function start is moved through the edits in the
+        # order they would be made one by one, using the same rules as
+        # __shift_jumps and __shift_starts.
+        rev_merged = merged[::-1]
+
+        jmp_cmds = EC.fwd_jump_commands + EC.back_jump_commands
+        new_jumps = []
+        for pos in self.find_all_commands(jmp_cmds):
+            cmd = CommandView(self.data, pos)
+            arg_offset = cmd.get_arg_offset(-1) - pos
+            jump_mult = 2*(cmd.command in EC.fwd_jump_commands)-1
+            jump_len = self.data[pos+arg_offset]
+
+            for st, del_len, new_commands in rev_merged:
+                if del_len:
+                    end = st + del_len
+                    if st <= pos < end:
+                        # The jump itself is deleted.
+                        pos = None
+                        break
+
+                    jump_target = pos + len(cmd) + jump_len*jump_mult - 1
+                    if max(jump_target, pos) >= end and \
+                       min(jump_target, pos) < st:
+                        jump_len -= del_len
+
+                    if pos >= end:
+                        pos -= del_len
+
+                if new_commands:
+                    jump_target = pos + len(cmd) + jump_len*jump_mult - 1
+                    if max(jump_target, pos) >= st and \
+                       min(jump_target, pos) < st:
+                        jump_len += len(new_commands)
+
+                    if pos >= st:
+                        pos += len(new_commands)
+
+            if pos is not None:
+                new_jumps.append((pos+arg_offset, jump_len))
+
+        new_starts = []
+        for ptr in range(0, 32*self.num_objects, 2):
+            ptr_loc = get_value_from_bytes(self.data[ptr:ptr+2])
+            for st, del_len, new_commands in rev_merged:
+                if ptr_loc > st:
+                    ptr_loc -= del_len
+                if ptr_loc > st:
+                    ptr_loc += len(new_commands)
+
+            new_starts.append(ptr_loc)
+
+        # Build the edited data in one go.
+        new_data = bytearray()
+        prev_end = 0
+        for pos, del_len, new_commands in merged:
+            new_data += self.data[prev_end:pos]
+            new_data += new_commands
+            prev_end = pos + del_len
+        new_data += self.data[prev_end:]
+
+        for arg_pos, jump_len in new_jumps:
+            new_data[arg_pos] = jump_len
+
+        for ind, ptr_loc in enumerate(new_starts):
+            new_data[2*ind:2*ind+2] = to_little_endian(ptr_loc, 2)
+
+        # The command index notices the change the next time it is used.
+        self.data[:] = new_data
+
+
+class EventEditBatch:
+    '''
+    Queue up insertions and deletions for an Event and make them all at once
+    with Event.apply_edits.  Each call to insert_commands/delete_commands on
+    an Event shifts every jump and function start in the script, so many
+    edits to one script are much faster in a batch.
+
+    All positions are positions in the script as it was before the batch,
+    so they can be found with find_command before anything moves.  Leaving
+    the with block applies the batch unless there was an exception.
+
+        with script.edit_batch() as batch:
+            batch.delete_commands(pos, 1)
+            batch.insert_commands(func.get_bytearray(), pos)
+    '''
+
+    def __init__(self, script: Event):
+        self.script = script
+        self.edits: list[tuple[int, int, bytes]] = []
+
+    def __enter__(self) -> EventEditBatch:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.apply()
+
+    def insert_commands(self, new_commands: bytearray, ins_position: int):
+        self.edits.append((ins_position, 0, bytes(new_commands)))
+
+    def delete_commands(self, del_pos: int, num_commands: int = 1):
+        data = self.script.data
+
+        pos = del_pos
+        for i in range(num_commands):
+            if pos >= len(data):
+                raise ValueError('Deleting out of script\'s range.')
+            pos += get_command_length(data, pos)
+
+        self.edits.append((del_pos, pos - del_pos, b''))
+
+    def delete_commands_range(self, del_start_pos: int, del_end_pos: int):
+        self.edits.append((del_start_pos, del_end_pos - del_start_pos, b''))
+
+    def apply(self):
+        self.script.apply_edits(self.edits)
+        self.edits = []
+
+
+# Compressed scripts keyed by get_script_digest of the uncompressed script.
+# Scripts which only depend on the settings come out the same in many seeds,
+# so this is kept for the life of the process.
+_COMPRESSED_CACHE_SIZE = 1024
+_compressed_cache: OrderedDict[bytes, bytes] = OrderedDict()
+
+
+def get_script_digest(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _cache_compressed_script(digest: bytes, compr_event: bytes):
+    _compressed_cache[digest] = compr_event
+    _compressed_cache.move_to_end(digest)
+
+    while len(_compressed_cache) > _COMPRESSED_CACHE_SIZE:
+        _compressed_cache.popitem(last=False)
+
+
+def compress_script_data(data) -> bytes:
+    '''
+    Returns compress(data), reusing the result from an earlier identical
+    script when possible.
+    '''
+    digest = get_script_digest(data)
+    compr_event = _compressed_cache.get(digest, None)
+
+    if compr_event is None:
+        compr_event = compress(data)
+
+    _cache_compressed_script(digest, compr_event)
+    return compr_event
+
+
+def clear_compressed_cache():
+    _compressed_cache.clear()
+
 
 # Find the length of a location's event script
 def get_compressed_event_length(rom: bytearray, loc_id: int) -> int:
@@ -1192,44 +1647,111 @@ class ScriptManager:
                  event_data_ptr=0x3CF9F0):
         self.fsrom = fsrom
 
-        self.script_dict = {x: None for x in list(LocID)}
-        self.orig_len_dict = {x: None for x in list(LocID)}
+        # Only locations which have been read or set have entries.
+        self.script_dict: dict[LocID, Event] = dict()
+        self.orig_len_dict: dict[LocID, int] = dict()
+
+        # The state of each script when it was last read from or written
+        # to the rom.  Scripts which still match are not written again.
+        self._clean_dict: dict[LocID, tuple] = dict()
 
-        # TODO: Just read the ptr from the rom since we have it.
+        # A scriptowners.ScriptOwnerIndex of the rom's scripts and strings.
+        # When present, old scripts and strings are freed only once no
+        # other location uses them.  patchcache sets this.
+        self.owner_index = None
+
+        # The location records and event pointers are read through
+        # self.loc_table, which is shared with anything else using fsrom.
         self.loc_data_ptr = loc_data_ptr
         self.event_data_ptr = event_data_ptr
 
         for x in location_list:
-            self.script_dict[x] = \
-                Event.from_rom_location(self.fsrom.getbuffer(), x)
-            self.orig_len_dict[x] = \
-                get_compressed_event_length(self.fsrom.getbuffer(), x)
+            self.get_script(x)
+
+    @staticmethod
+    def _get_script_state(script: Event) -> tuple[bytes, bytes]:
+        '''Fingerprints of the script's data and of its strings.'''
+        strings_hasher = hashlib.blake2b(digest_size=16)
+        for string in script.strings:
+            strings_hasher.update(len(string).to_bytes(2, 'little'))
+            strings_hasher.update(string)
+
+        return (get_script_digest(script.get_bytearray()),
+                strings_hasher.digest())
+
+    @property
+    def loc_table(self) -> LocationTable:
+        return LocationTable.from_fsrom(self.fsrom, self.loc_data_ptr,
+                                        self.event_data_ptr)
+
+    def __get_compressed_length(self, loc_id: LocID) -> int:
+        return get_compressed_length(self.fsrom.getview(),
+                                     self.loc_table.get_event_ptr(loc_id))
 
     # A note:  If a script obtained by get_script is edited it will edit
     # the copy in the manager.  This is how I think it should be since
     # making copies, editing copies and then re-setting the manager is
     # clunky.
     def get_script(self, loc_id: LocID) -> Event:
-        if not self.script_dict[loc_id]:
-            self.script_dict[loc_id] = \
-                Event.from_rom_location(self.fsrom.getbuffer(), loc_id)
+        if loc_id not in self.script_dict:
+            rom = self.fsrom.getview()
+            script_ptr = self.loc_table.get_event_ptr(loc_id)
+            script = Event.from_rom(rom, script_ptr)
+            self.script_dict[loc_id] = script
             self.orig_len_dict[loc_id] = \
-                get_compressed_event_length(self.fsrom.getbuffer(), loc_id)
+                get_compressed_length(rom, script_ptr)
+            self._clean_dict[loc_id] = self._get_script_state(script)
+
+            # Settings patches applied after the owner index was built (e.g.
+            # lost.ips) can point a location at a new script.  The index's
+            # blocks for it are then out of date and must not be freed.
+            if self.owner_index is not None and \
+               not self.owner_index.matches(loc_id, script_ptr,
+                                            self.orig_len_dict[loc_id],
+                                            script):
+                self.owner_index.forget(loc_id)
 
         return self.script_dict[loc_id]
 
     def set_script(self, script, loc_id: LocID):
-        if loc_id not in self.script_dict.keys() or \
-           self.script_dict[loc_id] is None:
-
-            self.orig_len_dict[loc_id] = \
-                get_compressed_event_length(self.fsrom.getbuffer(), loc_id)
+        if loc_id not in self.script_dict:
+            if self.owner_index is not None:
+                # Reading the old script checks the owner index against it.
+                self.get_script(loc_id)
+            else:
+                self.orig_len_dict[loc_id] = \
+                    self.__get_compressed_length(loc_id)
 
         self.script_dict[loc_id] = script
+        self._clean_dict.pop(loc_id, None)
+
+    def is_script_modified(self, loc_id: LocID) -> bool:
+        '''
+        Returns whether the script for loc_id differs from the copy in the
+        rom.  Locations which were never read are not modified.
+        '''
+        if loc_id not in self.script_dict:
+            return False
+
+        script = self.script_dict[loc_id]
+        return (
+            script.modified_strings or
+            self._clean_dict.get(loc_id) != self._get_script_state(script)
+        )
 
     def free_script(self, loc_id: LocID):
+        # Locations the owner index doesn't track (or stopped tracking, see
+        # get_script) are freed through their live pointer.
+        if self.owner_index is not None and \
+           self.owner_index.has_script(loc_id):
+            spaceman = self.fsrom.space_manager
+            for block in self.owner_index.release_script(loc_id):
+                spaceman.mark_block(block, FSWriteType.MARK_FREE)
+
+            return
+
         script = self.get_script(loc_id)
-        script_ptr = get_loc_event_ptr(self.fsrom.getbuffer(), loc_id)
+        script_ptr = self.loc_table.get_event_ptr(loc_id)
         script_compr_len = self.orig_len_dict[loc_id]
 
         spaceman = self.fsrom.space_manager
@@ -1242,18 +1764,69 @@ class ScriptManager:
         spaceman.mark_block((script_ptr, script_ptr+script_compr_len),
                             FSWriteType.MARK_FREE)
 
-    # writes the script to the specified locations
-    def write_script_to_rom(self, loc_id: LocID, free_old: bool = True):
-        # print('calling wstr', loc_id)
+    @staticmethod
+    def _get_string_table(script: Event) -> Optional[int]:
+        '''
+        The file address of the string table the script reads from, or None
+        if it has no strings.  Like set_string_index, only the startup
+        function of object 0 is searched.
+        '''
+        if not script.strings:
+            return None
 
-        spaceman = self.fsrom.space_manager
+        positions = script.find_all_commands([0xB8],
+                                             script.get_function_start(0, 0),
+                                             script.get_function_end(0, 0))
+        if not positions:
+            return None
 
-        if free_old:
-            self.free_script(loc_id)
+        return to_file_ptr(CommandView(script.data, positions[-1]).get_arg(0))
+
+    def __free_string_blocks(self, loc_id: LocID,
+                             blocks: list[tuple[int, int]]):
+        '''
+        Mark the string blocks free, except for those holding the string table
+        of another loaded script.  The owner index does not know about tables
+        that scripts were pointed at since it was built.
+        '''
+        if not blocks:
+            return
+
+        tables = [
+            self._get_string_table(script)
+            for other_id, script in self.script_dict.items()
+            if other_id != loc_id
+        ]
 
+        spaceman = self.fsrom.space_manager
+        for start, end in blocks:
+            if not any(table is not None and start <= table < end
+                       for table in tables):
+                spaceman.mark_block((start, end), FSWriteType.MARK_FREE)
+
+    def __write_strings(self, loc_id: LocID):
+        '''
+        If the script's strings have changed, find space for them, write them
+        out, and point the script's string index at them.  Otherwise make sure
+        the owner index knows which table the script reads from.
+        '''
         script = self.get_script(loc_id)
 
+        # Strings edited in place count as modified too.
+        clean_state = self._clean_dict.get(loc_id)
+        if clean_state is not None and \
+           clean_state[1] != self._get_script_state(script)[1]:
+            script.modified_strings = True
+
         if script.modified_strings:
+            spaceman = self.fsrom.space_manager
+
+            # The old strings can go if no other script uses them.
+            if self.owner_index is not None:
+                self.__free_string_blocks(
+                    loc_id, self.owner_index.release_strings(loc_id)
+                )
+
             # We need to find space for the new strings
             strings_len = sum(len(x) for x in script.strings)
             ptrs_len = 2*len(script.strings)
@@ -1278,31 +1851,117 @@ class ScriptManager:
 
             script.set_string_index(to_rom_ptr(string_index))
 
-        # The rest is mostly straightforward
-        compr_event = compress(script.get_bytearray())
+            if self.owner_index is not None:
+                self.owner_index.set_strings(
+                    loc_id, [(string_index, string_index+total_len)]
+                )
+        elif self.owner_index is not None:
+            # A copy of another location's script (e.g. from boss rando) still
+            # reads that location's strings, so it has to hold on to them.
+            self.__free_string_blocks(
+                loc_id,
+                self.owner_index.share_strings(loc_id,
+                                               self._get_string_table(script))
+            )
+
+    def __write_compressed_script(self, loc_id: LocID, compr_event: bytes):
+        '''
+        Find space for an already compressed script, write it, and point the
+        location at it.
+        '''
+        spaceman = self.fsrom.space_manager
+        script = self.get_script(loc_id)
+
         script_ptr = spaceman.get_free_addr(len(compr_event))
 
         self.fsrom.seek(script_ptr)
         self.fsrom.write(compr_event, FSWriteType.MARK_USED)
 
-        # Now write the location's pointer
-        event_ind_st = self.loc_data_ptr + 14*loc_id + 8
+        if self.owner_index is not None:
+            self.owner_index.set_script(
+                loc_id, (script_ptr, script_ptr+len(compr_event))
+            )
 
-        loc_script_ind = \
-            get_value_from_bytes(
-                self.fsrom.getbuffer()[event_ind_st:event_ind_st+2])
-
-        # Each event pointer is an absolute, 3 byte pointer
-        loc_ptr = self.event_data_ptr + 3*loc_script_ind
-
-        self.fsrom.seek(loc_ptr)
-        self.fsrom.write(to_little_endian(to_rom_ptr(script_ptr), 3))
+        # Now write the location's pointer
+        self.loc_table.set_event_ptr(self.fsrom, loc_id, script_ptr)
 
         # When the script is written, update the orig len and modified_strings.
         # Just in case we end up modifying and writing again.
-        self.modified_strings = False
+        script.modified_strings = False
         self.orig_len_dict[loc_id] = len(compr_event)
+        self._clean_dict[loc_id] = self._get_script_state(script)
+
+    # writes the script to the specified locations
+    def write_script_to_rom(self, loc_id: LocID, free_old: bool = True):
+        # print('calling wstr', loc_id)
+
+        if free_old:
+            self.free_script(loc_id)
+
+        self.__write_strings(loc_id)
+
+        script = self.get_script(loc_id)
+        compr_event = compress_script_data(script.get_bytearray())
+        self.__write_compressed_script(loc_id, compr_event)
     # End of write_script_to_rom
+
+    def write_all_scripts_to_rom(self, clear_scripts: bool = False,
+                                 max_workers: Optional[int] = None):
+        '''
+        Write every modified script back to the rom.  Freeing the old
+        scripts and writing strings is done first, then the scripts are
+        compressed concurrently (the native compressor releases the GIL),
+        and last the compressed scripts are placed in location order so
+        that the rom does not depend on the thread timing.
+
+        If clear_scripts is set, the manager forgets all scripts afterwards
+        and later get_script calls read them from the rom again.
+        '''
+        loc_order = {loc_id: ind for ind, loc_id in enumerate(LocID)}
+        loc_ids = sorted(
+            (loc_id for loc_id in self.script_dict
+             if self.is_script_modified(loc_id)),
+            key=lambda loc_id: loc_order.get(loc_id, len(loc_order))
+        )
+
+        for loc_id in loc_ids:
+            self.free_script(loc_id)
+            self.__write_strings(loc_id)
+
+        script_data = [bytes(self.script_dict[loc_id].get_bytearray())
+                       for loc_id in loc_ids]
+        digests = [get_script_digest(data) for data in script_data]
+
+        # Only compress what isn't in the cache, and each distinct script
+        # only once.
+        compr_dict = dict()
+        to_compress = dict()
+        for digest, data in zip(digests, script_data):
+            compr_event = _compressed_cache.get(digest, None)
+            if compr_event is not None:
+                _compressed_cache.move_to_end(digest)
+                compr_dict[digest] = compr_event
+            else:
+                to_compress[digest] = data
+
+        if len(to_compress) > 1 and max_workers != 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                compr_events = list(executor.map(compress,
+                                                 to_compress.values()))
+        else:
+            compr_events = [compress(data) for data in to_compress.values()]
+
+        for digest, compr_event in zip(to_compress.keys(), compr_events):
+            _cache_compressed_script(digest, compr_event)
+            compr_dict[digest] = compr_event
+
+        for loc_id, digest in zip(loc_ids, digests):
+            self.__write_compressed_script(loc_id, compr_dict[digest])
+
+        if clear_scripts:
+            self.script_dict.clear()
+            self.orig_len_dict.clear()
+            self._clean_dict.clear()
 # End class ScriptManager
 
 
@@ -1,4 +1,4 @@
-import functools
+from __future__ import annotations
 import hashlib
 
 import ctevent
@@ -30,6 +30,47 @@ class CTRom():
         self.rom_data = freespace.FSRom(rom, False)
         self.script_manager = ctevent.ScriptManager(self.rom_data, [])
 
+        # The script owner index at the last start_journal.  See rollback.
+        self._checkpoint_owner_index = None
+
+    def copy_on_write(self) -> CTRom:
+        '''
+        Returns a CTRom which shares this CTRom's rom image until one of them
+        is written to.  See FSRom.copy_on_write.  Scripts which have been
+        read into the ScriptManager are not carried over.
+        '''
+        ret = CTRom(self.rom_data.getvalue(), ignore_checksum=True)
+        ret.rom_data.space_manager = self.rom_data.space_manager.copy()
+        return ret
+
+    def start_journal(self):
+        '''
+        Journal writes to the rom (see FSRom.start_journal) so that rollback
+        can return this CTRom to its current state.  Scripts which have been
+        read into the ScriptManager are discarded by rollback, so write them
+        out first.
+        '''
+        self.rom_data.start_journal(track_source=False)
+
+        owner_index = self.script_manager.owner_index
+        self._checkpoint_owner_index = \
+            None if owner_index is None else owner_index.copy()
+
+    def is_journaled(self) -> bool:
+        return self.rom_data.journal is not None
+
+    def rollback(self):
+        '''
+        Undo every change since start_journal.  Only the journaled parts of
+        the rom are restored, which is much cheaper than a fresh copy.
+        '''
+        self.rom_data.rollback()
+
+        self.script_manager = ctevent.ScriptManager(self.rom_data, [])
+        if self._checkpoint_owner_index is not None:
+            self.script_manager.owner_index = \
+                self._checkpoint_owner_index.copy()
+
     @classmethod
     def from_file(cls, filename: str, ignore_checksum=False):
         with open(filename, 'rb') as infile:
@@ -38,12 +79,10 @@ class CTRom():
         return cls(rom_bytes, ignore_checksum)
 
     def write_all_scripts_to_rom(self, clear_scripts: bool = True):
-        script_dict = self.script_manager.script_dict
-        for loc_id in script_dict.keys():
-            if script_dict[loc_id] is not None:
-                self.script_manager.write_script_to_rom(loc_id)
-            elif clear_scripts:
-                script_dict[loc_id] = None
+        self.script_manager.write_all_scripts_to_rom(clear_scripts)
+
+    # md5 of an unheadered vanilla rom
+    vanilla_md5 = 'a2bc447961e52fd2227baed164f729dc'
 
     @staticmethod
     def validate_ct_rom_file(filename: str) -> bool:
@@ -53,45 +92,53 @@ class CTRom():
             infile.seek(0, 2)
             file_size = infile.tell()
 
+            infile.seek(0)
             if file_size == 4194816:
                 print('Header detected.')
                 infile.seek(0x200)
 
-            chunk_size = 8192
+            # Read into one reusable buffer instead of allocating a new
+            # chunk for every read.
+            chunk = bytearray(0x10000)
+            view = memoryview(chunk)
+            num_read = infile.readinto(chunk)
+            while num_read:
+                hasher.update(view[:num_read])
+                num_read = infile.readinto(chunk)
 
-            infile.seek(0)
-            chunk = infile.read(chunk_size)
-            while chunk:
-                hasher.update(chunk)
-                chunk = infile.read(chunk_size)
-
-            # print(f"\'{filename}\' hash: {hasher.hexdigest()}")
-            # print('Known good hash: a2bc447961e52fd2227baed164f729dc')
-            return hasher.hexdigest() == 'a2bc447961e52fd2227baed164f729dc'
+            return hasher.hexdigest() == CTRom.vanilla_md5
 
     @staticmethod
     def validate_ct_rom_bytes(rom: bytes) -> bool:
-        hasher = hashlib.md5()
-        # Check if this is the size of a headered ROM.
-        # If it is, strip off the header before hashing.
-        if len(rom) == 4194816:
-            rom = rom[0x200:]
+        # Hash through a memoryview so that neither the header strip nor
+        # the hashing copies the rom.
+        with memoryview(rom) as view:
+            # Check if this is the size of a headered ROM.
+            # If it is, strip off the header before hashing.
+            if len(view) == 4194816:
+                view = view[0x200:]
 
-        chunk_size = 8192
-        start = 0
+            digest = hashlib.md5(view).hexdigest()
 
-        while start < len(rom):
-            hasher.update(rom[start:start+chunk_size])
-            start += chunk_size
+        return digest == CTRom.vanilla_md5
 
-        return hasher.hexdigest() == 'a2bc447961e52fd2227baed164f729dc'
+    @staticmethod
+    def get_checksum(data) -> int:
+        '''
+        Returns the 16-bit sum of the bytes in data.  Data can be any object
+        supporting the buffer protocol.
+        '''
+        # Summing a memoryview runs the loop in C instead of calling a lambda
+        # for every byte.
+        with memoryview(data) as view:
+            return sum(view.cast('B')) % 0x10000
 
     def fix_snes_checksum(self):
         rom = self.rom_data
 
-        if len(rom.getbuffer()) == 0x400000:
+        if len(rom.getview()) == 0x400000:
             exhirom = False
-        elif len(rom.getbuffer()) == 0x600000:
+        elif len(rom.getview()) == 0x600000:
             exhirom = True
         else:
             raise InvalidRomException('Invalid ROM size.')
@@ -104,20 +151,16 @@ class CTRom():
             rom.seek(0x40FFDC)
             rom.write(int(0xFFFF0000).to_bytes(4, 'little'))
 
-        def get_checksum(byte_seq: bytes) -> int:
-            return functools.reduce(
-                lambda x, y: (x+y) % 0x10000,
-                byte_seq,
-                0
-            )
+        get_checksum = CTRom.get_checksum
 
-        # Compute the checksum of the first 0x400000
-        checksum = get_checksum(self.rom_data.getbuffer()[0:0x400000])
+        with rom.getview() as buf:
+            # Compute the checksum of the first 0x400000
+            checksum = get_checksum(buf[0:0x400000])
 
-        # Compute twice the expanded 2MB if exhirom
-        if exhirom:
-            checksum += 2*get_checksum(rom.getbuffer()[0x400000:0x600000])
-            checksum = checksum % 0x10000
+            # Compute twice the expanded 2MB if exhirom
+            if exhirom:
+                checksum += 2*get_checksum(buf[0x400000:0x600000])
+                checksum = checksum % 0x10000
 
         inverse_checksum = checksum ^ 0xFFFF
         checksum_b = inverse_checksum.to_bytes(2, 'little') + \
@@ -147,8 +190,8 @@ class CTRom():
                 return False
             return True
 
-        if len(rom.getbuffer()) != 0x400000 or \
-           not header_is_hirom(rom.getbuffer()):
+        if len(rom.getview()) != 0x400000 or \
+           not header_is_hirom(rom.getview()):
             raise RomFormatException('Existing ROM not HiRom')
 
         # ROM type:  Old value was 0x31 - HiROM + fastrom
@@ -0,0 +1,61 @@
+'''
+Pickle files for the caches kept in ./pickles/cache/ (patchcache,
+configcache, fluxcache).
+
+Each file holds a dict with the cache's format version and the full key, so
+an outdated file or two keys sharing a file name read as a miss.  Failing to
+read or write a file only costs time later, so neither raises.
+'''
+from __future__ import annotations
+
+import os
+import pickle
+from typing import Any, Optional
+
+CACHE_DIR = './pickles/cache'
+
+
+def get_cache_path(prefix: str, key: str) -> str:
+    return os.path.join(CACHE_DIR, f'{prefix}_{key[:32]}.pickle')
+
+
+def read_entry(prefix: str, key: str, version: int) -> Optional[dict]:
+    '''
+    Return the dict written by write_entry(prefix, key, version, ...), or
+    None if there is no such file or it is unreadable or outdated.
+    '''
+    try:
+        with open(get_cache_path(prefix, key), 'rb') as infile:
+            entry = pickle.load(infile)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+    if not isinstance(entry, dict) or \
+       entry.get('version') != version or entry.get('key') != key:
+        return None
+
+    return entry
+
+
+def write_entry(prefix: str, key: str, version: int, **fields: Any):
+    '''
+    Pickle the fields along with the key and version.  The file is written
+    to a temporary name first so that other processes never read a
+    partially written cache.
+    '''
+    entry = {'version': version, 'key': key}
+    entry.update(fields)
+
+    path = get_cache_path(prefix, key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as outfile:
+            pickle.dump(entry, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
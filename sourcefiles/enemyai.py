@@ -125,7 +125,7 @@ class BattleMessages:
         # Vanilla size: 0x0CDDC6 - 0CCBC9 = 0x11FD
         # Vanilla start: 0x0CCBC9
         ptr_table_st = self.get_ptr_table_file_ptr_from_rom(
-            ct_rom.rom_data.getbuffer()
+            ct_rom.rom_data.getview()
         )
 
         # Try vanilla location, otherwise use freespace.
@@ -151,7 +151,7 @@ class BattleMessages:
                 rom.write(string)
                 data_pos += len(string)
 
-        self.set_ptr_table_ptr(rom.getbuffer(), write_pos)
+        self.set_ptr_table_ptr(rom.get_journaled_buffer(), write_pos)
 
     def __str__(self):
         ret_str = ''
@@ -540,7 +540,7 @@ class EnemyAIDB:
 
     @classmethod
     def from_ctrom(cls, ct_rom: ctrom.CTRom):
-        return cls.from_rom(ct_rom.rom_data.getbuffer())
+        return cls.from_rom(ct_rom.rom_data.getview())
 
     def write_to_ctrom(self, ct_rom: ctrom.CTRom):
         # For now, we are confident that removing the unused enemies will
@@ -550,7 +550,7 @@ class EnemyAIDB:
         #        Write the scripts anywhere free (wherever) in bank 0C.
         rom = ct_rom.rom_data
         ai_ptr_start = int.from_bytes(
-            rom.getbuffer()[self.PTR_TO_AI_PTRS:self.PTR_TO_AI_PTRS+3],
+            rom.getview()[self.PTR_TO_AI_PTRS:self.PTR_TO_AI_PTRS+3],
             'little'
         )
         ai_ptr_pos = byteops.to_file_ptr(ai_ptr_start)
@@ -40,7 +40,8 @@ class EnemySpriteData:
         rom[sprite_st:sprite_st+10] = self._data
 
     def write_to_ctrom(self, ct_rom: ctrom.CTRom, enemy_id):
-        self.write_to_rom(ct_rom.rom_data.getbuffer(), enemy_id)
+        self.write_to_rom(ct_rom.rom_data.get_journaled_buffer(),
+                          enemy_id)
 
     def __str__(self):
         ret_str = self.__class__.__name__
@@ -192,7 +193,7 @@ class EnemyStats:
 
     @classmethod
     def from_ctrom(cls, ct_rom: ctrom.CTRom, enemy_id: ctenums.EnemyID):
-        return cls.from_rom(ct_rom.rom_data.getbuffer(), enemy_id)
+        return cls.from_rom(ct_rom.rom_data.getview(), enemy_id)
 
     def write_to_ctrom(self, ct_rom: ctrom.CTRom, enemy_id: ctenums.EnemyID):
         ct_rom.rom_data.seek(0x0C4700 + 0x17*enemy_id)
@@ -449,11 +450,12 @@ class EnemyStats:
 
 
 def get_stat_dict(rom: bytearray) -> dict[ctenums.EnemyID, EnemyStats]:
+    # Read straight from the given buffer.  Wrapping it in a CTRom would
+    # copy the whole rom just to read the enemy records.
     stat_dict = dict()
-    ct_rom = ctrom.CTRom(rom, True)
 
     for enemy_id in list(ctenums.EnemyID):
-        stat_dict[enemy_id] = EnemyStats.from_ctrom(ct_rom, enemy_id)
+        stat_dict[enemy_id] = EnemyStats.from_rom(rom, enemy_id)
 
     return stat_dict
 
@@ -505,7 +505,7 @@ class EnemyAttackDB:
 
     @classmethod
     def from_ctrom(cls, ct_rom: ctrom.CTRom):
-        return cls.from_rom(ct_rom.rom_data.getbuffer())
+        return cls.from_rom(ct_rom.rom_data.getview())
 
     def write_to_ctrom(self, ct_rom: ctrom.CTRom):
 
@@ -549,13 +549,13 @@ class EnemyAttackDB:
         else:
             raise ValueError('Incorrect atk gfx 2 size')
 
-        num_attacks = self._get_num_atks_from_rom(rom.getbuffer())
+        num_attacks = self._get_num_atks_from_rom(rom.getview())
         atk_control_orig_start = byteops.file_ptr_from_rom(
-            rom.getbuffer(), self.ATK_CONTROL_PTR
+            rom.getview(), self.ATK_CONTROL_PTR
         )
 
         atk_effect_orig_start = byteops.file_ptr_from_rom(
-            rom.getbuffer(), self.ATK_EFFECT_PTR
+            rom.getview(), self.ATK_EFFECT_PTR
         )
 
         MARK_FREE = ctrom.freespace.FSWriteType.MARK_FREE
@@ -582,7 +582,7 @@ class EnemyAttackDB:
             self._repoint_data(
                 byteops.to_rom_ptr(atk_control_start),
                 self.atk_control_refs,
-                rom.getbuffer()
+                rom.get_journaled_buffer()
             )
 
             atk_effect_start = rom.write_data_to_freespace(
@@ -592,5 +592,5 @@ class EnemyAttackDB:
             self._repoint_data(
                 byteops.to_rom_ptr(atk_effect_start),
                 self.atk_effect_refs,
-                rom.getbuffer()
+                rom.get_journaled_buffer()
             )
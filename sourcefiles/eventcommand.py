@@ -3,6 +3,7 @@ import math
 
 from byteops import to_little_endian, get_value_from_bytes
 from enum import Enum, IntEnum, auto
+from typing import Optional
 
 
 # Small enum to store the synchronization scheme when a function is called
@@ -1023,7 +1024,7 @@ event_commands[0x39] = \
                  'Jump R Button',
                  'Jump if R is not pressed.')
 
-event_commands[0x3A] = event_commands[0x01]
+event_commands[0x3A] = event_commands[0x01].copy()
 event_commands[0x3A].command = 0x3A
 event_commands[0x3A].desc += 'Alias of 0x01.'
 
@@ -1039,11 +1040,11 @@ event_commands[0x3C] = \
                  'Jump No Confirm',
                  'Jump if confirm has not been pressed since last check.')
 
-event_commands[0x3D] = event_commands[0x01]
+event_commands[0x3D] = event_commands[0x01].copy()
 event_commands[0x3D].command = 0x3D
 event_commands[0x3D].desc += 'Alias of 0x01.'
 
-event_commands[0x3E] = event_commands[0x01]
+event_commands[0x3E] = event_commands[0x01].copy()
 event_commands[0x3E].command = 0x3E
 event_commands[0x3E].desc += 'Alias of 0x01.'
 
@@ -1083,11 +1084,11 @@ event_commands[0x44] = \
                  'Jump No R',
                  'Jump if R has not been pressed since last check.')
 
-event_commands[0x45] = event_commands[0x01]
+event_commands[0x45] = event_commands[0x01].copy()
 event_commands[0x45].command = 0x45
 event_commands[0x45].desc += 'Alias of 0x01.'
 
-event_commands[0x46] = event_commands[0x01]
+event_commands[0x46] = event_commands[0x01].copy()
 event_commands[0x46].command = 0x46
 event_commands[0x46].desc += 'Alias of 0x01.'
 
@@ -1357,8 +1358,8 @@ event_commands[0x6D] = \
                  'Load Magus',
                  'Load Magus if in party.')
 
-event_commands[0x6E] = event_commands[0x01]
-event_commands[0x6E].command = 0x46
+event_commands[0x6E] = event_commands[0x01].copy()
+event_commands[0x6E].command = 0x6E
 event_commands[0x6E].desc += 'Alias of 0x01.'
 
 event_commands[0x6F] = \
@@ -1368,7 +1369,7 @@ event_commands[0x6F] = \
                  'Shift Bits',
                  'Shift bits in local memory')
 
-event_commands[0x70] = event_commands[0x01]
+event_commands[0x70] = event_commands[0x01].copy()
 event_commands[0x70].command = 0x70
 event_commands[0x70].desc += 'Alias of 0x01.'
 
@@ -1390,7 +1391,7 @@ event_commands[0x73] = \
                  'Decrement',
                  'Decrement local memory (1 byte).')
 
-event_commands[0x74] = event_commands[0x01]
+event_commands[0x74] = event_commands[0x01].copy()
 event_commands[0x74].command = 0x74
 event_commands[0x74].desc += 'Alias of 0x01.'
 
@@ -1412,11 +1413,11 @@ event_commands[0x77] = \
                  'Reset Byte',
                  'Reset local memory to 0 (1 byte?).')
 
-event_commands[0x78] = event_commands[0x01]
+event_commands[0x78] = event_commands[0x01].copy()
 event_commands[0x78].command = 0x78
 event_commands[0x78].desc += 'Alias of 0x01.'
 
-event_commands[0x79] = event_commands[0x01]
+event_commands[0x79] = event_commands[0x01].copy()
 event_commands[0x79].command = 0x79
 event_commands[0x79].desc += 'Alias of 0x01.'
 
@@ -1492,11 +1493,11 @@ event_commands[0x84] = \
                  'NPC Solidity',
                  'Alter NPC solidity properties')
 
-event_commands[0x85] = event_commands[0x01]
+event_commands[0x85] = event_commands[0x01].copy()
 event_commands[0x85].command = 0x85
 event_commands[0x85].desc += 'Alias of 0x01.'
 
-event_commands[0x86] = event_commands[0x01]
+event_commands[0x86] = event_commands[0x01].copy()
 event_commands[0x86].command = 0x86
 event_commands[0x86].desc += 'Alias of 0x01.'
 
@@ -1577,7 +1578,7 @@ event_commands[0x92] = \
                  'Vector Move',
                  'Move object along given vector.')
 
-event_commands[0x93] = event_commands[0x01]
+event_commands[0x93] = event_commands[0x01].copy()
 event_commands[0x93].command = 0x93
 event_commands[0x93].desc += 'Alias of 0x01.'
 
@@ -1629,7 +1630,7 @@ event_commands[0x9A] = \
                  'Move Toward Coordinates',
                  'Move toward the given coordinates.')
 
-event_commands[0x9B] = event_commands[0x01]
+event_commands[0x9B] = event_commands[0x01].copy()
 event_commands[0x9B].command = 0x9B
 event_commands[0x9B].desc += 'Alias of 0x01.'
 
@@ -1649,14 +1650,14 @@ event_commands[0x9D] = \
                  'Move object along given vector.  Does not change facing.')
 
 event_commands[0x9E] = \
-    EventCommand(0x9D, 1, [1],
+    EventCommand(0x9E, 1, [1],
                  ['oo: Object (/2) to move to'],
                  'Vector Move to Object',
                  'Move to given object. Does not change facing.  ' +
                  'Overlapped by 0x9F')
 
 event_commands[0x9F] = \
-    EventCommand(0x9D, 1, [1],
+    EventCommand(0x9F, 1, [1],
                  ['oo: Object (/2) to move to'],
                  'Vector Move to Object',
                  'Move to given object. Does not change facing.  ' +
@@ -1676,19 +1677,19 @@ event_commands[0xA1] = \
                  'Animated Move',
                  'Move while playing an animation.')
 
-event_commands[0xA2] = event_commands[0x01]
+event_commands[0xA2] = event_commands[0x01].copy()
 event_commands[0xA2].command = 0xA2
 event_commands[0xA2].desc += 'Alias of 0x01.'
 
-event_commands[0xA3] = event_commands[0x01]
+event_commands[0xA3] = event_commands[0x01].copy()
 event_commands[0xA3].command = 0xA3
 event_commands[0xA3].desc += 'Alias of 0x01.'
 
-event_commands[0xA4] = event_commands[0x01]
+event_commands[0xA4] = event_commands[0x01].copy()
 event_commands[0xA4].command = 0xA4
 event_commands[0xA4].desc += 'Alias of 0x01.'
 
-event_commands[0xA5] = event_commands[0x01]
+event_commands[0xA5] = event_commands[0x01].copy()
 event_commands[0xA5].command = 0xA5
 event_commands[0xA5].desc += 'Alias of 0x01.'
 
@@ -1840,11 +1841,11 @@ event_commands[0xBD] = \
                  'Pause 2',
                  'Pauses 2 seconds.')
 
-event_commands[0xBE] = event_commands[0x01]
+event_commands[0xBE] = event_commands[0x01].copy()
 event_commands[0xBE].command = 0xBE
 event_commands[0xBE].desc += 'Alias of 0x01.'
 
-event_commands[0xBF] = event_commands[0x01]
+event_commands[0xBF] = event_commands[0x01].copy()
 event_commands[0xBF].command = 0xBF
 event_commands[0xBF].desc += 'Alias of 0x01.'
 
@@ -1882,11 +1883,11 @@ event_commands[0xC4] = \
                  'Dec Box Bottom',
                  'Decision box at bottom.  Stores 01 to 7E0130. Overlaps 0xC0')
 
-event_commands[0xC5] = event_commands[0x01]
+event_commands[0xC5] = event_commands[0x01].copy()
 event_commands[0xC5].command = 0xC5
 event_commands[0xC5].desc += 'Alias of 0x01.'
 
-event_commands[0xC6] = event_commands[0x01]
+event_commands[0xC6] = event_commands[0x01].copy()
 event_commands[0xC6].command = 0xC6
 event_commands[0xC6].desc += 'Alias of 0x01.'
 
@@ -2021,7 +2022,7 @@ event_commands[0xDA] = \
                  'Party Follow',
                  'Makes PC2 and PC3 follow PC1.')
 
-event_commands[0xDB] = event_commands[0x01]
+event_commands[0xDB] = event_commands[0x01].copy()
 event_commands[0xDB].command = 0xDB
 event_commands[0xDB].desc += 'Alias of 0x01.'
 
@@ -2140,7 +2141,7 @@ event_commands[0xE8] = \
                  'Play Sound',
                  'Plays a sound.')
 
-event_commands[0xE9] = event_commands[0x01]
+event_commands[0xE9] = event_commands[0x01].copy()
 event_commands[0xE9].command = 0xE9
 event_commands[0xE9].desc += 'Alias of 0x01.'
 
@@ -2177,7 +2178,7 @@ event_commands[0xEE] = \
                  'Wait for Song End',
                  'Wait for Song End')
 
-event_commands[0xEF] = event_commands[0x01]
+event_commands[0xEF] = event_commands[0x01].copy()
 event_commands[0xEF].command = 0xEF
 event_commands[0xEF].desc += 'Alias of 0x01.'
 
@@ -2213,15 +2214,15 @@ event_commands[0xF4] = \
                  'Shake Screen',
                  'Shake screen.')
 
-event_commands[0xF5] = event_commands[0x01]
+event_commands[0xF5] = event_commands[0x01].copy()
 event_commands[0xF5].command = 0xF5
 event_commands[0xF5].desc += 'Alias of 0x01.'
 
-event_commands[0xF6] = event_commands[0x01]
+event_commands[0xF6] = event_commands[0x01].copy()
 event_commands[0xF6].command = 0xF6
 event_commands[0xF6].desc += 'Alias of 0x01.'
 
-event_commands[0xF7] = event_commands[0x01]
+event_commands[0xF7] = event_commands[0x01].copy()
 event_commands[0xF7].command = 0xF7
 event_commands[0xF7].desc += 'Alias of 0x01.'
 
@@ -2243,15 +2244,15 @@ event_commands[0xFA] = \
                  'Restore mp.',
                  'Restore mp.')
 
-event_commands[0xFB] = event_commands[0x01]
+event_commands[0xFB] = event_commands[0x01].copy()
 event_commands[0xFB].command = 0xFB
 event_commands[0xFB].desc += 'Alias of 0x01.'
 
-event_commands[0xFC] = event_commands[0x01]
+event_commands[0xFC] = event_commands[0x01].copy()
 event_commands[0xFC].command = 0xFC
 event_commands[0xFC].desc += 'Alias of 0x01.'
 
-event_commands[0xFD] = event_commands[0x01]
+event_commands[0xFD] = event_commands[0x01].copy()
 event_commands[0xFD].command = 0xFD
 event_commands[0xFD].desc += 'Alias of 0x01.'
 
@@ -2268,54 +2269,165 @@ event_commands[0xFF] = \
                  'Mode 7 Scene.')
 
 
-def get_command(buf: bytearray, offset: int) -> EventCommand:
+# The commands whose argument lengths depend on the bytes after the opcode.
+_variable_commands = (0x2E, 0x4E, 0x88, 0xF1, 0xFF)
 
-    command_id = buf[offset]
-    command = event_commands[command_id].copy()
+# Table of total command lengths by opcode.  The variable length commands
+# get 0 and are sized by _get_variable_arg_lens.
+_command_lengths = [len(cmd) for cmd in event_commands]
+for _cmd_id in _variable_commands:
+    _command_lengths[_cmd_id] = 0
 
-    # print(command)
-    # input()
+
+def _get_variable_arg_lens(buf, offset: int) -> Optional[tuple[int, ...]]:
+    '''
+    Returns the argument lengths of the variable length command at offset.
+    Returns None when the command's mode is not known.
+    '''
+    command_id = buf[offset]
 
     if command_id == 0x2E:
         mode = buf[offset+1] >> 4
-        if mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1, 1]
+        if mode in (4, 5):
+            return (1, 1, 1, 1, 1)
         elif mode == 8:
-            command.arg_lens = [1, 1, 2]
-        else:
-            print(f"{command_id:02X}: Error, Unknown Mode")
-            input()
+            # Palette data follows command.  As with 0x4E, the length
+            # includes its own two bytes.
+            data_len = get_value_from_bytes(buf[offset+3:offset+5]) - 2
+            return (1, 1, 2, data_len)
+        return None
     elif command_id == 0x4E:
-        # Data to copy follows command.  Shove data in last arg.
+        # Data to copy follows command.  It is the last arg.
         data_len = get_value_from_bytes(buf[offset+4:offset+6]) - 2
-        command.arg_lens = [2, 1, 2, data_len]
+        return (2, 1, 2, data_len)
     elif command_id == 0x88:
         mode = buf[offset+1] >> 4
         if mode == 0:
-            command.arg_lens = [1]
-        elif mode in [2, 3]:
-            command.arg_lens = [1, 1, 1]
-        elif mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1]
+            return (1,)
+        elif mode in (2, 3):
+            return (1, 1, 1)
+        elif mode in (4, 5):
+            return (1, 1, 1, 1)
         elif mode == 8:
             # bytes to copy follow command
             copy_len = buf[offset+2] - 2
-            command.arg_lens = [1, 1, 1, copy_len]
-        else:
-            print(f"{command_id:02X}: Error, Unknown Mode")
-            input()
+            return (1, 1, 1, copy_len)
+        return None
     elif command_id == 0xF1:
-        color = buf[offset+1]
-        if color == 0:
-            command.arg_lens = [1]
-        else:
-            command.arg_lens = [1, 1]
+        if buf[offset+1] == 0:
+            return (1,)
+        return (1, 1)
     elif command_id == 0xFF:  # Mode7 scenes can be weird
         scene = buf[offset+1]
         if scene == 0x90:
-            command.arg_lens = [1, 1, 1, 1]
-        if scene == 0x97:
-            command.arg_lens = [1, 1, 1]
+            return (1, 1, 1, 1)
+        elif scene == 0x97:
+            return (1, 1, 1)
+        return (1,)
+
+    raise ValueError(f'{command_id:02X} is not a variable length command.')
+
+
+def get_command_length(buf, offset: int) -> int:
+    '''
+    Returns the length of the command at offset without decoding it.
+    Commands with an unknown mode get the length of their template, as
+    get_command gives them.
+    '''
+    length = _command_lengths[buf[offset]]
+    if length:
+        return length
+
+    arg_lens = _get_variable_arg_lens(buf, offset)
+    if arg_lens is None:
+        return len(event_commands[buf[offset]])
+
+    return 1 + sum(arg_lens)
+
+
+def decode_command(buf, offset: int) -> tuple[int, int]:
+    '''Returns (length, opcode) of the command at offset.'''
+    return get_command_length(buf, offset), buf[offset]
+
+
+class CommandView:
+    '''
+    A read-only view of the command at buf[offset].  Only the length and
+    opcode are decoded up front.  Arguments are read from buf when asked
+    for, so the view is only valid until buf changes.  Use get_command for
+    a command that can be edited.
+    '''
+    __slots__ = ('buf', 'offset', 'command', 'length', '_arg_lens')
+
+    def __init__(self, buf, offset: int):
+        self.buf = buf
+        self.offset = offset
+        self.length, self.command = decode_command(buf, offset)
+        self._arg_lens = None
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def arg_lens(self) -> tuple[int, ...]:
+        if self._arg_lens is None:
+            arg_lens = None
+            if _command_lengths[self.command] == 0:
+                arg_lens = _get_variable_arg_lens(self.buf, self.offset)
+
+            if arg_lens is None:
+                arg_lens = tuple(event_commands[self.command].arg_lens)
+
+            self._arg_lens = arg_lens
+
+        return self._arg_lens
+
+    @property
+    def num_args(self) -> int:
+        return len(self.arg_lens)
+
+    def get_arg_offset(self, index: int) -> int:
+        '''Returns the position in buf of the index-th argument.'''
+        arg_lens = self.arg_lens
+        if index < 0:
+            index += len(arg_lens)
+
+        return self.offset + 1 + sum(arg_lens[0:index])
+
+    def get_arg(self, index: int):
+        arg_lens = self.arg_lens
+        if index < 0:
+            index += len(arg_lens)
+
+        pos = self.get_arg_offset(index)
+        arg_len = arg_lens[index]
+
+        # Memory copy data is kept as bytes like get_command does.
+        if self.command == 0x4E and index == len(arg_lens) - 1:
+            return bytearray(self.buf[pos:pos+arg_len])
+
+        return get_value_from_bytes(self.buf[pos:pos+arg_len])
+
+    @property
+    def args(self) -> list:
+        return [self.get_arg(i) for i in range(len(self.arg_lens))]
+
+    def to_command(self) -> EventCommand:
+        return get_command(self.buf, self.offset)
+
+
+def get_command(buf: bytearray, offset: int) -> EventCommand:
+
+    command_id = buf[offset]
+    command = event_commands[command_id].copy()
+
+    if _command_lengths[command_id] == 0:
+        arg_lens = _get_variable_arg_lens(buf, offset)
+        if arg_lens is None:
+            print(f"{command_id:02X}: Error, Unknown Mode")
+            input()
+        else:
+            command.arg_lens = list(arg_lens)
 
     # Now we can use arg_lens to extract the args
     pos = offset + 1
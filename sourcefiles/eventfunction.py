@@ -1,7 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass, replace
+from typing import Union
 
-from eventcommand import get_command, EventCommand
+from byteops import to_little_endian
+from eventcommand import get_command, CommandView, EventCommand
 
 
 class EventFunction:
@@ -201,7 +203,10 @@ class EventFunction:
         # Shift all of the function's jumps and labels
         # After shifting, we should be able to just append the function's
         # labels and jumps into self
+        # Resolve the function's own jumps before shifting.  Resolving after
+        # shifting writes the jump bytes pos bytes past where they belong.
         ins_function = event_function.copy()
+        ins_function.resolve_jumps()
         ins_function.__shift_jumps(0, 0, pos)
         ins_function.__shift_labels(0, 0, pos)
 
@@ -216,7 +221,7 @@ class EventFunction:
         self.__shift_jumps(pos, pos, len(ins_function))
         self.__shift_labels(pos, pos, len(ins_function))
 
-        self.data[pos:pos] = ins_function.get_bytearray()
+        self.data[pos:pos] = ins_function.data
 
         for i in range(ins_index, len(self.offsets)):
             self.offsets[i] += len(ins_function)
@@ -616,3 +621,110 @@ class EventFunction:
 
         self.resolve_jumps()
         return self.data
+
+
+class FunctionTemplate:
+    '''
+    An EventFunction compiled once into bytes along with named slots for the
+    arguments and jump targets which change between uses.  Instantiating
+    the template copies the bytes and writes the slot values, so functions
+    which are rebuilt for every seed only go through EventCommand and
+    EventFunction once.
+
+    Slots are placed on the command at a label or at a position in the
+    compiled function.  A slot which is not given a value keeps the value
+    the function was compiled with.
+    '''
+
+    def __init__(self, event_function: EventFunction):
+        self.data = bytes(event_function.get_bytearray())
+        self.labels = dict(event_function.labels)
+
+        # name --> [(offset, length)] of the argument bytes to write
+        self.arg_slots: dict[str, list[tuple[int, int]]] = dict()
+
+        # name --> [(offset, length)] of the jump commands to aim
+        self.jump_slots: dict[str, list[tuple[int, int]]] = dict()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __get_command_view(self, pos: Union[int, str]) -> CommandView:
+        if isinstance(pos, str):
+            if pos not in self.labels:
+                raise ValueError(f'Unknown label {pos}')
+            pos = self.labels[pos]
+
+        if not 0 <= pos < len(self.data):
+            raise ValueError(f'Position {pos:04X} is outside the function')
+
+        return CommandView(self.data, pos)
+
+    def add_arg_slot(self, name: str, pos: Union[int, str],
+                     arg_index: int) -> FunctionTemplate:
+        '''
+        Let name set the arg_index-th argument of the command at pos, which
+        is either a position in the function or a label.  The
+        value written is the raw argument as in EventCommand.args.  Many
+        slots may share a name to write the same value in several places.
+        '''
+        if name in self.jump_slots:
+            raise ValueError(f'{name} is already a jump slot')
+
+        view = self.__get_command_view(pos)
+        self.arg_slots.setdefault(name, []).append(
+            (view.get_arg_offset(arg_index), view.arg_lens[arg_index])
+        )
+
+        return self
+
+    def add_jump_slot(self, name: str,
+                      pos: Union[int, str]) -> FunctionTemplate:
+        '''
+        Let name set where the jump command at pos goes.  The value
+        written is the target's position relative to the template's start.
+        It may lie outside of the template, for example when the template is
+        one piece of a larger function.
+        '''
+        if name in self.arg_slots:
+            raise ValueError(f'{name} is already an argument slot')
+
+        view = self.__get_command_view(pos)
+        jump_cmds = (
+            EventCommand.fwd_jump_commands +
+            EventCommand.back_jump_commands
+        )
+
+        if view.command not in jump_cmds:
+            raise ValueError(f'{view.command:02X} is not a jump command')
+
+        self.jump_slots.setdefault(name, []).append(
+            (view.offset, view.length)
+        )
+
+        return self
+
+    def instantiate(self, **values: int) -> bytearray:
+        '''
+        Return a copy of the compiled bytes with the named slots set to the
+        given values.  The result can be passed to Event.set_function or
+        Event.insert_commands directly.
+        '''
+        ret = bytearray(self.data)
+
+        for name, value in values.items():
+            if name in self.arg_slots:
+                for offset, length in self.arg_slots[name]:
+                    ret[offset:offset+length] = \
+                        to_little_endian(value, length)
+            elif name in self.jump_slots:
+                for from_pos, cmd_len in self.jump_slots[name]:
+                    # Same computation as EventFunction.resolve_jumps
+                    jump_length = abs(value - (from_pos + cmd_len) + 1)
+                    if jump_length > 0xFF:
+                        raise ValueError(f'Jump for {name} is too long')
+                    ret[from_pos+cmd_len-1] = jump_length
+            else:
+                raise ValueError(f'Unknown slot {name}')
+
+        return ret
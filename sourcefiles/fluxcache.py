@@ -0,0 +1,156 @@
+'''
+Cache of Event objects parsed from .Flux files.
+
+Parsing a .Flux file means Huffman compressing every one of its strings
+(CTString.compress), and the same files are read for every seed.  The parsed
+script is kept in memory, keyed by path and modification time, and on disk
+in ./pickles/cache/, keyed by a hash of the file's contents and the parsing
+code.  Each request gets its own copy of the Event, so callers are free to
+edit what they receive.
+
+Running this module parses every file in ./flux/ so that the disk cache is
+already filled before any seeds are generated:
+    python fluxcache.py
+'''
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+from typing import Optional
+
+import ctevent
+import ctstrings
+import diskcache
+
+# Version of the on-disk format.  Bump when the pickled dict changes.
+_CACHE_VERSION = 1
+
+# The files that decide how a .Flux file is parsed.
+_PARSER_FILES = ('./ctevent.py', './ctstrings.py',
+                 './pickles/huffman_table.pickle')
+
+# num_objects, script data, and the compressed strings of a parsed Event
+FluxEntry = tuple[int, bytes, list[bytes]]
+
+# absolute path --> ((mtime_ns, size), entry)
+_memory_cache: dict[str, tuple[tuple[int, int], FluxEntry]] = dict()
+_parser_digest: Optional[str] = None
+
+
+def get_parser_digest() -> str:
+    '''Hash the files which determine the parsed form.  Computed once.'''
+    global _parser_digest
+
+    if _parser_digest is None:
+        hasher = hashlib.sha256()
+        hasher.update(_CACHE_VERSION.to_bytes(2, 'little'))
+        for filename in _PARSER_FILES:
+            with open(filename, 'rb') as infile:
+                hasher.update(infile.read())
+
+        _parser_digest = hasher.hexdigest()
+
+    return _parser_digest
+
+
+def get_cache_key(flux: bytes) -> str:
+    '''The disk cache key for a .Flux file with the given contents.'''
+    hasher = hashlib.sha256()
+    hasher.update(get_parser_digest().encode('ascii'))
+    hasher.update(flux)
+
+    return hasher.hexdigest()
+
+
+def _read_disk_cache(key: str) -> Optional[FluxEntry]:
+    entry = diskcache.read_entry('flux', key, _CACHE_VERSION)
+    if entry is None:
+        return None
+
+    return (entry['num_objects'], entry['data'], entry['strings'])
+
+
+def _write_disk_cache(key: str, flux_entry: FluxEntry):
+    num_objects, data, strings = flux_entry
+    diskcache.write_entry('flux', key, _CACHE_VERSION,
+                          num_objects=num_objects, data=data, strings=strings)
+
+
+def _get_entry(filename: str, use_disk: bool = True) -> FluxEntry:
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    file_id = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _memory_cache.get(path, None)
+    if cached is not None and cached[0] == file_id:
+        return cached[1]
+
+    entry = None
+    if use_disk:
+        with open(path, 'rb') as infile:
+            key = get_cache_key(infile.read())
+        entry = _read_disk_cache(key)
+
+    if entry is None:
+        event = ctevent.Event.parse_flux(path)
+        entry = (event.num_objects, bytes(event.data),
+                 [bytes(string) for string in event.strings])
+
+        if use_disk:
+            _write_disk_cache(key, entry)
+
+    _memory_cache[path] = (file_id, entry)
+    return entry
+
+
+def get_flux_event(filename: str, use_disk: bool = True) -> ctevent.Event:
+    '''
+    Return the Event that Event.parse_flux(filename) gives, parsing the
+    file at most once per process (and at most once per change to the file
+    when use_disk is set).
+    '''
+    num_objects, data, strings = _get_entry(filename, use_disk)
+
+    ret_event = ctevent.Event()
+    ret_event.num_objects = num_objects
+    ret_event.data = bytearray(data)
+    ret_event.strings = [ctstrings.CTString(string) for string in strings]
+    ret_event.modified_strings = True
+
+    return ret_event
+
+
+def get_flux_filenames(flux_dir: str = './flux') -> list[str]:
+    '''Every .Flux file in flux_dir, sorted.'''
+    # The set avoids doubles on case-insensitive file systems.
+    return sorted(set(
+        glob.glob(os.path.join(flux_dir, '*.flux')) +
+        glob.glob(os.path.join(flux_dir, '*.Flux'))
+    ))
+
+
+def precompile_flux_files(flux_dir: str = './flux') -> int:
+    '''
+    Parse every .Flux file in flux_dir into the disk cache.  Returns the
+    number of files.
+    '''
+    filenames = get_flux_filenames(flux_dir)
+
+    for filename in filenames:
+        _get_entry(filename)
+
+    return len(filenames)
+
+
+def clear_memory_cache():
+    _memory_cache.clear()
+
+
+def main():
+    num_files = precompile_flux_files()
+    print(f'Cached {num_files} flux files in {diskcache.CACHE_DIR}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
 from __future__ import annotations
+import bisect
 from enum import Enum
 from io import BytesIO
-from typing import Tuple
+import sys
+from typing import Optional, Tuple
 
 import byteops
 
@@ -21,6 +23,11 @@ class FreeSpace():
         self.markers = [0, self.num_bytes]
         self.first_free = is_free
 
+        # Largest free run inside each bank, keyed by bank number.  Banks
+        # are dropped from the dict when a write touches them and are
+        # recomputed the next time an allocation needs them.
+        self._bank_max_free = dict()
+
     # Mark a block of the buffer as free/not free depending on is_free.
     # block is a half-open interval [block[0], block[1]) as is Python's way.
     def mark_block(self,
@@ -52,8 +59,10 @@ class FreeSpace():
                   % (block[0], block[1]))
             block = (0, block[1])
 
-        left_blk = self.__search(0, len(self.markers)-2, block[0])
-        right_blk = self.__search(0, len(self.markers)-2, block[1])
+        self.__invalidate_banks(block[0], block[1])
+
+        left_blk = self.__search(block[0])
+        right_blk = self.__search(block[1])
 
         lc = (left_blk % 2 == 0)
         rc = (right_blk % 2 == 0)
@@ -107,15 +116,21 @@ class FreeSpace():
         left = block[0]
         right = block[1]
 
-        left_ind = self.__search(0, len(self.markers)-2, left)
-        right_ind = self.__search(0, len(self.mark_block)-2, right)
+        left_ind = self.__search(left)
+        right_ind = self.__search(right-1)
 
         left_parity = left_ind % 2 == 0
         left_free = left_parity == (self.first_free is True)
 
         return (left_ind == right_ind) and left_free
 
+    def copy(self) -> FreeSpace:
+        ret = FreeSpace(self.num_bytes, self.first_free)
+        ret.markers = self.markers[:]
+        return ret
+
     def extend_end_marker(self, new_end, is_free):
+        self.__invalidate_banks(self.markers[-1], new_end)
         last_free = self.__is_free(len(self.markers)-2)
 
         # print(f"{new_end:06X}, {is_free}")
@@ -127,108 +142,158 @@ class FreeSpace():
     def __is_free(self, ind):
         return ((ind % 2 == 0) == self.first_free)
 
-    # First fit.  Location must be after hint
-    def get_free_addr(self, size, hint=0):
-        # block associated with its left marker, so search to len-2
-        ind = self.__search(0, len(self.markers)-2, hint)
+    def __invalidate_banks(self, start, end):
+        for bank in range(start >> 16, ((end-1) >> 16) + 1):
+            self._bank_max_free.pop(bank, None)
 
-        # print(f"Searching for {size} free bytes.")
-        if self.__is_free(ind) and (self.markers[ind+1]-hint > 0):
-            return hint
-        else:
-            if not self.__is_free(ind):
-                ind += 1
-
-            start = ind
-            ret = None
-            for x in range(start, len(self.markers)-1, 2):
-                # print(f"({self.markers[x]}, {self.markers[x+1]})")
-                # print(f"Size: {self.markers[x+1]-self.markers[x]}")
-
-                block_st = self.markers[x]
-                block_end = self.markers[x+1]
-                next_bank = (block_st & 0xFF0000) + 0x010000
-
-                true_block_end = min(block_end, next_bank)
-                if true_block_end - block_st >= size:
-                    ret = block_st
-                    break
+    def __get_bank_max_free(self, bank):
+        if bank not in self._bank_max_free:
+            self._bank_max_free[bank] = max(
+                (end-start for start, end in self.__bank_free_runs(bank)),
+                default=0
+            )
 
-                # If the block ends before the next bank starts, then
-                # block_end == true_block_end, and this if won't trigger.
-                # Otherwise, true_block_end is the start of the next bank, and
-                # we're trying to fit at the start of the next bank.
-                if block_end - true_block_end >= size:
-                    ret = true_block_end  # == next bank start
-                    break
+        return self._bank_max_free[bank]
 
-            if ret is None:
-                # print("Error: Not enough free space.")
-                # print(f"size: {size:06X}, hint: {hint:06X}")
-                # self.print_blocks()
-                raise FreeSpaceError(
-                    f'Not Enough Free Space.  Size: {size:06X}, '
-                    f'hint: {hint:06X}'
-                )
+    def __bank_free_runs(self, bank, lower_bound=0):
+        '''
+        Yield the free blocks of a bank as half-open intervals clipped to
+        the bank and to lower_bound.
+        '''
+        bank_st = max(bank << 16, lower_bound)
+        bank_end = min((bank+1) << 16, self.markers[-1])
 
-            return ret
+        if bank_st >= bank_end:
+            return
 
-    # Sometimes data needs the same bank, so
+        ind = self.__search(bank_st)
+        if not self.__is_free(ind):
+            ind += 1
+
+        for x in range(ind, len(self.markers)-1, 2):
+            block_st = max(self.markers[x], bank_st)
+            block_end = min(self.markers[x+1], bank_end)
+
+            if block_st >= bank_end:
+                break
+
+            yield (block_st, block_end)
+
+    def __banks_from(self, hint):
+        num_banks = ((self.markers[-1]-1) >> 16) + 1
+        return range(hint >> 16, num_banks)
+
+    # First fit.  Location must be after hint.  Blocks are not allowed to
+    # cross a bank boundary.
+    def get_free_addr(self, size, hint=0):
+        if size > 0x10000:
+            return self.__get_free_addr_linear(size, hint)
+
+        for bank in self.__banks_from(hint):
+            # Skip over whole banks that can't hold the data.
+            if self.__get_bank_max_free(bank) < size:
+                continue
+
+            for block_st, block_end in self.__bank_free_runs(bank, hint):
+                if block_end - block_st >= size:
+                    return block_st
+
+        raise FreeSpaceError(
+            f'Not Enough Free Space.  Size: {size:06X}, '
+            f'hint: {hint:06X}'
+        )
+
+    # Allocations larger than a bank are only split at the first bank
+    # boundary.  Just walk the blocks for these.
+    def __get_free_addr_linear(self, size, hint=0):
+        ind = self.__search(hint)
+        if not self.__is_free(ind):
+            ind += 1
+
+        for x in range(ind, len(self.markers)-1, 2):
+            block_st = max(self.markers[x], hint)
+            block_end = self.markers[x+1]
+            next_bank = (block_st & 0xFF0000) + 0x010000
+
+            true_block_end = min(block_end, next_bank)
+            if true_block_end - block_st >= size:
+                return block_st
+
+            if block_end - true_block_end >= size:
+                return true_block_end  # == next bank start
+
+        raise FreeSpaceError(
+            f'Not Enough Free Space.  Size: {size:06X}, '
+            f'hint: {hint:06X}'
+        )
+
+    # Best fit.  Returns the start of the smallest free block (after hint)
+    # which can hold size bytes without crossing a bank boundary.
+    def get_best_fit_addr(self, size, hint=0):
+        best_addr = None
+        best_len = None
+
+        for bank in self.__banks_from(hint):
+            if self.__get_bank_max_free(bank) < size:
+                continue
+
+            for block_st, block_end in self.__bank_free_runs(bank, hint):
+                block_len = block_end - block_st
+                if size <= block_len and \
+                   (best_len is None or block_len < best_len):
+                    best_addr, best_len = block_st, block_len
+
+                    if block_len == size:
+                        return best_addr
+
+        if best_addr is None:
+            raise FreeSpaceError(
+                f'Not Enough Free Space.  Size: {size:06X}, '
+                f'hint: {hint:06X}'
+            )
+
+        return best_addr
+
+    # Sometimes data needs the same bank, so find the first bank (after
+    # hint) where every size fits.  Nothing is marked.
     def get_same_bank_free_addrs(self, sizes: list[int],
                                  hint: int = 0) -> list[int]:
 
         if not sizes:
             return []
 
-        tries = [0 for x in sizes]
-        perm = [i for i in range(len(sizes))]
-
         # going to assign in sorted order.
         # Should discard heavily used blocks more quickly.
         # Save the permutation to recover the original order
+        perm = [i for i in range(len(sizes))]
         sort_sizes, perm = zip(*sorted(zip(sizes, perm), reverse=True))
 
-        start = hint
-
-        while True:
-            tries[0] = self.get_free_addr(sort_sizes[0], start)
-            self.mark_block((tries[0], tries[0]+sort_sizes[0]),
-                            FSWriteType.MARK_USED)
-
-            first_bank = (tries[0] >> 16) << 16
-
-            success = True
-
-            for i in range(1, len(sort_sizes)):
-                tries[i] = self.get_free_addr(sort_sizes[i], first_bank)
-                this_bank = (tries[i] >> 16) << 16
-
-                if this_bank != first_bank:
-                    success = False
-                    start = this_bank
-
-                    # undo previous markings
-                    for j in range(0, i):
-                        self.mark_block((tries[j], tries[j]+sort_sizes[j]),
-                                        True)
+        for bank in self.__banks_from(hint):
+            if self.__get_bank_max_free(bank) < sort_sizes[0]:
+                continue
+
+            blocks = [list(block)
+                      for block in self.__bank_free_runs(bank, hint)]
+            tries = []
+
+            # First fit each size into what remains of the bank's blocks.
+            for size in sort_sizes:
+                for block in blocks:
+                    if block[1] - block[0] >= size:
+                        tries.append(block[0])
+                        block[0] += size
+                        break
                 else:
-                    # Mark and proceed to next
-                    self.mark_block((tries[i], tries[i]+sort_sizes[i]),
-                                    FSWriteType.MARK_USED)
-
-            if success:
-                break
-
-        # Undo markings.  This is sort of ugly.  It would be nice to separate
-        # the buffer from the freespace checker so that we can copy the
-        # freespace checker and mess with that while finding addresses.
-        for i in range(len(tries)):
-            self.mark_block((tries[i], tries[i]+sort_sizes[i]),
-                            FSWriteType.MARK_FREE)
+                    break
 
-        perm, tries = zip(*sorted(zip(perm, tries)))
+            if len(tries) == len(sort_sizes):
+                perm, tries = zip(*sorted(zip(perm, tries)))
+                return list(tries)
 
-        return list(tries)
+        raise FreeSpaceError(
+            f'Not Enough Free Space in one bank.  Sizes: {sizes}, '
+            f'hint: {hint:06X}'
+        )
 
     '''
     # writes data into the buffer.  The write can introduce free space, such
@@ -343,29 +408,259 @@ class FreeSpace():
                      (self.markers[x+1]-self.markers[x])))
 
     # Find the index of an address in the block map
-    def __search(self, start_ind, end_ind, addr):
-        search_ind = (start_ind+end_ind)//2
+    def __search(self, addr):
+        ind = bisect.bisect_right(self.markers, addr) - 1
+        return min(max(ind, 0), len(self.markers)-2)
+
 
-        left = self.markers[search_ind]
-        right = self.markers[search_ind+1]
+# Modules whose frames are skipped when finding who made a write.
+_JOURNAL_SKIP_MODULES = {__name__}
 
-        if left <= addr < right:
-            return search_ind
-        elif addr >= right:
-            if start_ind == len(self.markers)-1:
-                return len(self.markers)-2
+
+def _get_write_source() -> str:
+    '''Name of the first module outside of this one on the call stack.'''
+    frame = sys._getframe(1)
+    while frame is not None and \
+            frame.f_globals.get('__name__') in _JOURNAL_SKIP_MODULES:
+        frame = frame.f_back
+
+    if frame is None:
+        return '?'
+
+    return frame.f_globals.get('__name__', '?')
+
+
+class WriteJournal:
+    '''
+    Record of the writes made through an FSRom since its last checkpoint.
+
+    Only FSRom.write (and everything built on it) and JournaledBuffer writes
+    are recorded.  Code which writes through a getbuffer() view bypasses the
+    journal, so the journal notes when a view was handed out and the FSRom
+    falls back to comparing against the checkpoint in that case.  Use
+    FSRom.getview() to read and FSRom.get_journaled_buffer() to write
+    instead.
+    '''
+
+    def __init__(self, track_source: bool = True):
+        self.track_source = track_source
+
+        # List of (start, end, source module) for each write.  The source is
+        # None if track_source is not set.
+        self.records: list[tuple[int, int, Optional[str]]] = []
+        self.buffer_exported = False
+
+    def clear(self):
+        self.records.clear()
+        self.buffer_exported = False
+
+    def record(self, start: int, end: int):
+        source = _get_write_source() if self.track_source else None
+        self.records.append((start, end, source))
+
+    def get_extents(self) -> list[tuple[int, int]]:
+        '''Sorted, merged [start, end) ranges covered by the writes.'''
+        extents = []
+        for start, end, _ in sorted(self.records):
+            if extents and start <= extents[-1][1]:
+                extents[-1][1] = max(end, extents[-1][1])
             else:
-                return self.__search(search_ind+1, end_ind, addr)
+                extents.append([start, end])
+
+        return [(start, end) for start, end in extents]
+
+    def get_stats(self) -> dict[Optional[str], tuple[int, int]]:
+        '''Returns a dict of module --> (number of writes, bytes written).'''
+        stats = dict()
+        for start, end, source in self.records:
+            num_writes, num_bytes = stats.get(source, (0, 0))
+            stats[source] = (num_writes + 1, num_bytes + end - start)
+
+        return stats
+
+
+class JournaledBuffer:
+    '''
+    Writable view of an FSRom's data for code written against a bytearray.
+    Reads and writes go straight to the FSRom's buffer like a getbuffer()
+    view, but every write is recorded in the FSRom's journal.  Slices read
+    from it are ordinary memoryviews.  Like any view, it blocks FSRom.write
+    until it is released or deleted.
+    '''
+
+    def __init__(self, fsrom: FSRom):
+        self._fsrom = fsrom
+        self._view = BytesIO.getbuffer(fsrom)
+
+    def __len__(self):
+        return len(self._view)
+
+    def __getitem__(self, key):
+        return self._view[key]
+
+    def __setitem__(self, key, value):
+        self._view[key] = value
+
+        if isinstance(key, slice):
+            start, end, _ = key.indices(len(self._view))
         else:
-            return self.__search(start_ind, search_ind-1, addr)
+            start = key if key >= 0 else key + len(self._view)
+            end = start + 1
+
+        self._fsrom._note_write(start, end)
+
+    def release(self):
+        self._view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
 
 
 class FSRom(BytesIO):
 
     def __init__(self, rom: bytes, is_free=False):
+        # When rom is a bytes object, BytesIO shares it instead of copying.
+        # The copy only happens on the first write or getbuffer().
         super().__init__(rom)
         self.space_manager = FreeSpace(len(rom), is_free)
 
+        # Optional journal of writes.  See start_journal.
+        self.journal: Optional[WriteJournal] = None
+        self._checkpoint: Optional[Tuple[bytes, FreeSpace]] = None
+
+        # Decoded location records and event pointers, if anything has asked
+        # for them.  See mapmangler.LocationTable.from_fsrom.  Writes to
+        # either table drop it.
+        self.location_table = None
+
+    def copy_on_write(self) -> FSRom:
+        '''
+        Returns an FSRom with the same data and free space as this one.
+        The two share one rom image until either is written to, so many
+        copies can be made from a base rom without duplicating it.
+
+        The sharing only works if there are no live getbuffer() views of
+        this FSRom.  Otherwise getvalue() has to make a copy.
+        '''
+        ret = FSRom(self.getvalue())
+        ret.space_manager = self.space_manager.copy()
+        return ret
+
+    def start_journal(self, track_source: bool = True):
+        '''
+        Begin recording writes and take a checkpoint of the current state.
+        With track_source set, each write records the module that made it
+        (see WriteJournal.get_stats), which costs a small stack walk.
+        '''
+        self.journal = WriteJournal(track_source)
+        self.checkpoint()
+
+    def stop_journal(self):
+        self.journal = None
+        self._checkpoint = None
+
+    def checkpoint(self):
+        '''Make the current data and free space the rollback target.'''
+        if self.journal is None:
+            raise FreeSpaceError('No journal is active.')
+
+        # getvalue() shares the buffer until the next write, so the copy of
+        # the rom happens at most once per checkpoint.
+        self._checkpoint = (self.getvalue(), self.space_manager.copy())
+        self.journal.clear()
+
+    def rollback(self):
+        '''Restore the data and free space of the last checkpoint.'''
+        if self.journal is None:
+            raise FreeSpaceError('No journal is active.')
+
+        data, space_manager = self._checkpoint
+        pos = self.tell()
+
+        if self.journal.buffer_exported:
+            # Writes through views aren't recorded.  Restore everything.
+            self.seek(0)
+            BytesIO.write(self, data)
+        else:
+            view = memoryview(data)
+            for start, end in self.journal.get_extents():
+                end = min(end, len(data))
+                if start < end:
+                    self.seek(start)
+                    BytesIO.write(self, view[start:end])
+
+        # truncate() fails while views exist, so only call it if needed.
+        if self.seek(0, 2) != len(data):
+            self.truncate(len(data))
+        self.seek(pos)
+
+        self.space_manager = space_manager.copy()
+        self.location_table = None
+        self.journal.clear()
+
+    def get_dirty_extents(self) -> list[tuple[int, int]]:
+        '''
+        Sorted [start, end) ranges which may differ from the checkpoint.
+        Uses the journal when it is complete.  Otherwise the rom is compared
+        against the checkpoint.
+        '''
+        if self.journal is None:
+            raise FreeSpaceError('No journal is active.')
+
+        if not self.journal.buffer_exported:
+            return self.journal.get_extents()
+
+        data = self._checkpoint[0]
+        block_size = 0x100
+        extents = []
+
+        with self.getview() as cur:
+            common_size = min(len(cur), len(data))
+            for start in range(0, common_size, block_size):
+                end = min(start + block_size, common_size)
+                if cur[start:end].tobytes() != data[start:end]:
+                    if extents and extents[-1][1] == start:
+                        extents[-1][1] = end
+                    else:
+                        extents.append([start, end])
+
+            if len(cur) > common_size:
+                extents.append([common_size, len(cur)])
+
+        return [(start, end) for start, end in extents]
+
+    def getbuffer(self):
+        if self.journal is not None:
+            self.journal.buffer_exported = True
+
+        return BytesIO.getbuffer(self)
+
+    def getview(self) -> memoryview:
+        '''
+        Read-only view of the data.  Unlike getbuffer(), this leaves the
+        journal complete since nothing can be written through it.
+        '''
+        return BytesIO.getbuffer(self).toreadonly()
+
+    def get_journaled_buffer(self) -> JournaledBuffer:
+        '''
+        Writable view of the data whose writes are journaled.  Use this
+        rather than getbuffer() for code which writes to a bytearray.
+        '''
+        return JournaledBuffer(self)
+
+    def _note_write(self, start: int, end: int):
+        '''Journal a write and drop anything cached from the range.'''
+        if self.journal is not None:
+            self.journal.record(start, end)
+
+        if self.location_table is not None and \
+           self.location_table.overlaps(start, end):
+            self.location_table = None
+
     # Apply one of Anskiy's .txt patches and mark free space
     # Code copied from patcher.py with few modifications.
     # I am assuming that all writes are using up free space.
@@ -456,10 +751,41 @@ class FSRom(BytesIO):
                 spaceman.extend_end_marker(end, write_mark)
 
         spaceman.mark_block((start, end), write_mark)
+        self._note_write(start, end)
 
         self.seek(start)
         return BytesIO.write(self, payload)
 
+    def write_changes(self, data, write_mark: FSWriteType,
+                      block_size: int = 0x1000):
+        '''
+        Write data, a whole modified copy of the rom, over the rom.  Only the
+        blocks which differ are written, so the journal records the changes
+        instead of the whole rom.
+        '''
+        data = memoryview(data).cast('B')
+        runs = []
+
+        with self.getview() as cur:
+            if len(data) < len(cur):
+                raise FreeSpaceError('Data is shorter than the rom.')
+
+            for start in range(0, len(data), block_size):
+                end = min(start + block_size, len(data))
+
+                # Comparing bytes is much faster than comparing memoryviews.
+                if cur[start:end].tobytes() == data[start:end].tobytes():
+                    continue
+
+                if runs and runs[-1][1] == start:
+                    runs[-1][1] = end
+                else:
+                    runs.append([start, end])
+
+        for start, end in runs:
+            self.seek(start)
+            self.write(data[start:end], write_mark)
+
     # writes data to the buffer and marks the space as no longer free.
     # Errors out if there is insufficient space
     # returns the address where the data gets written
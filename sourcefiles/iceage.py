@@ -3,14 +3,13 @@ Provides functions to implement Cthulhu Crisis's Ice Age Mode.
 '''
 from __future__ import annotations
 
-import functools
-
 import ctenums
 import ctevent
 import ctrom
 import ctstrings
 import eventfunction
 import eventcommand
+import scripttools
 
 import randoconfig as cfg
 import randosettings as rset
@@ -169,9 +168,9 @@ def remove_darkages_from_eot(ct_rom: ctrom.CTRom):
     )
 
     pos = script.find_exact_command(da_pillar)
-    script.insert_commands(func.get_bytearray(), pos)
-    pos += len(func)
-    script.delete_commands(pos, 1)
+    with script.edit_batch() as batch:
+        batch.delete_commands(pos, 1)
+        batch.insert_commands(func.get_bytearray(), pos)
 
     # Pillars work by constantly checking the player's position/button press
     # instead of using activate.  Put a loop at the front that catches whe
@@ -238,9 +237,6 @@ def lock_mount_woe(ct_rom: ctrom.CTRom,
 def lock_tyrano_lair(ct_rom: ctrom.CTRom,
                      char_set: set[ctenums.CharID]):
     # The strategy here is to piggyback on the dreamstone switch.
-    EF = eventfunction.EventFunction
-    EC = eventcommand.EventCommand
-
     script = ct_rom.script_manager.get_script(
         ctenums.LocID.TYRANO_LAIR_ANTECHAMBERS
     )
@@ -248,9 +244,6 @@ def lock_tyrano_lair(ct_rom: ctrom.CTRom,
     start = script.get_function_start(0x09, 0x01)
     end = script.get_function_end(0x09, 0x01)
 
-    orig_func = EF.from_bytearray(script.data[start:end])
-    orig_func.set_label('return', len(orig_func)-1)
-
     new_string = ctstrings.CTString.from_str(
         'We need {ayla} and whoever is at the {linebreak+0}'
         'Dactyl Nest Summit before proceeding!{null}'
@@ -258,20 +251,12 @@ def lock_tyrano_lair(ct_rom: ctrom.CTRom,
 
     new_string_id = script.add_string(new_string)
 
-    func = EF()
-    for char in list(char_set):
-        func.add_if_else(
-            EC.check_active_pc(int(char), 0),
-            EF(),
-            (
-                EF()
-                .add(EC.text_box(new_string_id))
-                .jump_to_label(EC.jump_forward(0), 'return')
-            )
-        )
+    # A missing character jumps to the function's closing return.
+    func = scripttools.get_party_check_bytes(list(char_set), new_string_id,
+                                             end - start - 1)
+    func += script.data[start:end]
 
-    orig_func.insert(func, 0)
-    script.set_function(0x09, 0x01, orig_func)
+    script.set_function(0x09, 0x01, func)
 
 
 def set_ice_age_dungeon_locks(ct_rom: ctrom.CTRom,
@@ -323,43 +308,8 @@ def insert_char_lock(script: ctevent.Event,
     #   3) Kick the user back to party shuffle if required characters
     #      are missing
     #   4) Set the character locks
-    func = eventfunction.EventFunction()
-
-    # Turn chars into bytes (0x80 >> char_id) and logical OR them up
-    chars = list(char_set)
-    char_lock_bytes = functools.reduce(
-        lambda a, b: a | b,
-        [0x80 >> int(x) for x in chars]
-    )
-
+    func = scripttools.get_char_lock_bytes(script, char_set)
     EC = eventcommand.EventCommand
-    EF = eventfunction.EventFunction
-    # charlock bytes are in 0x7F01DF
-    func.add(EC.assign_val_to_mem(0x0, 0x7F01DF, 1))
-    func.set_label('replace')
-    func.add(EC.replace_characters())
-
-    for char in chars:
-        char_str = str(char).lower()
-        error_string = f"Must include {{{char_str}}}!{{null}}"
-        script.strings.append(ctstrings.CTString.from_str(error_string))
-        error_string_index = len(script.strings) - 1
-
-        func.add_if(
-            EC.check_recruited_pc(int(char), 0),
-            (
-                EF.if_else(
-                    EC.check_active_pc(int(char), 0),
-                    EF(),
-                    (
-                        EF()
-                        .add(EC.text_box(error_string_index))
-                        .jump_to_label(EC.jump_back(0), 'replace')
-                    )
-                )
-            )
-        )
-    func.add(EC.assign_val_to_mem(char_lock_bytes, 0x7F01DF, 1))
 
     start = script.get_object_start(obj_id)
     end = script.get_object_end(obj_id)
@@ -387,8 +337,9 @@ def insert_char_lock(script: ctevent.Event,
         quit()
 
     script.modified_strings = True
-    script.delete_commands(pos)
-    script.insert_commands(func.get_bytearray(), pos)
+    with script.edit_batch() as batch:
+        batch.delete_commands(pos)
+        batch.insert_commands(func, pos)
 
     # Now fix that jump to jump over everything we just added.
     # If it needs fixing anyway.
@@ -1291,7 +1291,7 @@ class ItemDB:
     def write_to_ctrom(self, ct_rom: ctrom.CTRom):
 
         # Everything but the descs are easy
-        rom = ct_rom.rom_data.getbuffer()
+        rom = ct_rom.rom_data.get_journaled_buffer()
         for item_id in self.item_dict:
             item = self.item_dict[item_id]
             item.stats.write_to_rom(rom, item_id)
@@ -2,7 +2,6 @@
 Provides functions to implement Cthulhu Crisis's Legacy of Cyrus mode.
 '''
 from __future__ import annotations
-import functools
 import random
 
 import ctenums
@@ -11,6 +10,7 @@ import ctrom
 import ctstrings
 import eventfunction
 import eventcommand
+import scripttools
 import treasuredata
 
 import randoconfig as cfg
@@ -188,13 +188,8 @@ def force_chars_at_carpenter(ct_rom: ctrom.CTRom):
     obj_id = 0xF
     func_id = 0x1
 
-    EF = eventfunction.EventFunction
-    EC = eventfunction.EventCommand
-
-    orig_func = script.get_function(obj_id, func_id)
-
-    # The return is actually in the touch function immediately after
-    orig_func.set_label('end', len(orig_func))
+    start = script.get_function_start(obj_id, func_id)
+    end = script.get_function_end(obj_id, func_id)
 
     error_string = ctstrings.CTString.from_str(
         'Let this man enjoy his drink until we{linebreak+0}'
@@ -202,22 +197,14 @@ def force_chars_at_carpenter(ct_rom: ctrom.CTRom):
     )
     error_string_id = script.add_string(error_string)
 
-    new_func = EF()
-
-    for char in (ctenums.CharID.FROG, ctenums.CharID.MAGUS):
-        new_func.add_if_else(
-            EC.check_active_pc(int(char), 0),
-            EF(),
-            (
-                EF()
-                .add(EC.text_box(error_string_id))
-                .jump_to_label(EC.jump_forward(0), 'end')
-            )
-        )
-
-    orig_func.insert(new_func, 0)
+    # The return is actually in the touch function immediately after
+    func = scripttools.get_party_check_bytes(
+        (ctenums.CharID.FROG, ctenums.CharID.MAGUS), error_string_id,
+        end - start
+    )
+    func += script.data[start:end]
 
-    script.set_function(obj_id, func_id, orig_func)
+    script.set_function(obj_id, func_id, func)
 
 
 def force_castle_before_ozzies_fort(ct_rom: ctrom.CTRom):
@@ -349,41 +336,8 @@ def insert_recruit_lock(ct_rom: ctrom.CTRom,
     script = ct_rom.script_manager.get_script(loc_id)
     obj_id = config.char_assign_dict[recruit_spot].recruit_obj_id
 
-    chars = list(required_chars)
-    char_lock_bytes = functools.reduce(
-        lambda a, b: a | b,
-        [0x80 >> int(x) for x in chars]
-    )
-
+    func = scripttools.get_char_lock_bytes(script, required_chars)
     EC = eventcommand.EventCommand
-    EF = eventfunction.EventFunction
-    # charlock bytes are in 0x7F01DF
-    func = eventfunction.EventFunction()
-    func.add(EC.assign_val_to_mem(0x0, 0x7F01DF, 1))
-    func.set_label('replace')
-    func.add(EC.replace_characters())
-
-    for char in chars:
-        char_str = str(char).lower()
-        error_string = f"Must include {{{char_str}}}!{{null}}"
-        script.strings.append(ctstrings.CTString.from_str(error_string))
-        error_string_index = len(script.strings) - 1
-
-        func.add_if(
-            EC.check_recruited_pc(int(char), 0),
-            (
-                EF.if_else(
-                    EC.check_active_pc(int(char), 0),
-                    EF(),
-                    (
-                        EF()
-                        .add(EC.text_box(error_string_index))
-                        .jump_to_label(EC.jump_back(0), 'replace')
-                    )
-                )
-            )
-        )
-    func.add(EC.assign_val_to_mem(char_lock_bytes, 0x7F01DF, 1))
 
     start = script.get_object_start(obj_id)
     end = script.get_object_end(obj_id)
@@ -414,8 +368,9 @@ def insert_recruit_lock(ct_rom: ctrom.CTRom,
         quit()
 
     script.modified_strings = True
-    script.delete_commands(pos)
-    script.insert_commands(func.get_bytearray(), pos)
+    with script.edit_batch() as batch:
+        batch.delete_commands(pos)
+        batch.insert_commands(func, pos)
 
     # Now fix that jump to jump over everything we just added.
     # If it needs fixing anyway.
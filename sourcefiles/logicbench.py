@@ -0,0 +1,390 @@
+'''
+Stress test the key item logic with many seeds of each flag combination.
+
+Only the config stage up to the key item placement is run
+(Randomizer.set_key_item_config), so a few thousand seeds per flag string
+take minutes rather than hours.  Seeds are spread over a pool of worker
+processes.  For each flag string the report gives:
+  - the success rate (the fill finished and every key item can be collected)
+  - which filler placed the key items, how often RandomRejectionFiller
+    hit its attempt cap and fell back to Chronosanity, and how often a
+    Chronosanity search ran out of nodes and started over
+  - the distribution of RandomRejectionFiller's attempts
+  - the time per seed, for sizing a fleet of generators
+  - the distribution of the number of spheres
+
+Without a rom the key items are placed in a fresh RandoConfig, which keeps
+the vanilla character assignment.  That still exercises the fillers and the
+logic, but not character rando's effect on them.  Vanilla rando needs a rom.
+
+Example:
+    python logicbench.py --rom ct.sfc --seeds 1000 --jobs 8 \\
+        --flags st.n.gzp --flags lw.n.gcr --json bench.json
+'''
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import traceback
+from typing import Iterable, Optional, Sequence
+
+import logicfactory
+import logicwriters
+import mystery
+import randoconfig as cfg
+import randomizer
+import randosettings as rset
+
+# Modes and the flags which change the key item logic.
+DEFAULT_FLAG_STRINGS = (
+    'st.n.gzp', 'st.n.gzpc', 'st.n.gzpcr', 'st.n.gzpef',
+    'lw.n.gzp', 'lw.n.gzpccr',
+    'ia.n.gzp', 'loc.n.gzp', 'loc.n.gzpcr'
+)
+
+
+@dataclass
+class BenchResult:
+    flag_string: str
+    seed: str
+    filler: Optional[str] = None
+    fell_back: bool = False
+    attempts: int = 0            # Placements tried by RandomRejectionFiller
+    restarts: int = 0            # Chronosanity searches which ran out
+    chronosanity_nodes: int = 0  # Locations chosen by ChronosanityFiller
+    spheres: Optional[int] = None
+    fill_time: float = 0.0       # Seconds in commitKeyItems's filler
+    total_time: float = 0.0      # Seconds for the whole config stage
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def get_spheres(settings: rset.Settings,
+                config: cfg.RandoConfig) -> tuple[int, bool]:
+    '''
+    The number of spheres of the config's key item placement and whether
+    every key item can be collected.
+    '''
+    game_config = logicfactory.getGameConfig(settings, config)
+    logicwriters.make_assignment(game_config, config.key_item_locations)
+    reachability = logicwriters.KeyItemReachability(game_config)
+
+    return reachability.get_sphere_count(), reachability.can_collect_all()
+
+
+def run_job(rando: Optional[randomizer.Randomizer],
+            flag_string: str, seed: str,
+            max_nodes: Optional[int] = logicwriters.DEFAULT_MAX_NODES,
+            max_restarts: int = logicwriters.DEFAULT_MAX_RESTARTS
+            ) -> BenchResult:
+    '''
+    Place the key items for one seed.  When rando is None, the key items are
+    placed in a fresh RandoConfig instead of one built from the rom.
+    max_nodes and max_restarts are the Chronosanity search budget (see
+    logicwriters.commitKeyItems).
+    '''
+    result = BenchResult(flag_string=flag_string, seed=seed)
+    start = time.perf_counter()
+
+    try:
+        settings = rset.Settings.from_flag_string(flag_string)
+        settings.seed = seed
+
+        if rando is None:
+            random.seed(seed)
+            if rset.GameFlags.MYSTERY in settings.gameflags:
+                settings = mystery.generate_mystery_settings(settings)
+
+            config = cfg.RandoConfig(settings=settings)
+            fill = logicwriters.commitKeyItems(settings, config,
+                                               max_nodes, max_restarts)
+        else:
+            rando.settings = settings
+            rando.chronosanity_max_nodes = max_nodes
+            rando.chronosanity_max_restarts = max_restarts
+            fill = rando.set_key_item_config()
+            # Mystery replaces the settings.
+            settings, config = rando.settings, rando.config
+
+        result.total_time = time.perf_counter() - start
+        result.filler = fill.filler
+        result.fell_back = fill.fell_back
+        result.attempts = fill.attempts
+        result.restarts = fill.restarts
+        result.fill_time = fill.elapsed
+        if fill.chronosanity_stats is not None:
+            result.chronosanity_nodes = fill.chronosanity_stats.nodes
+
+        result.spheres, collectable = get_spheres(settings, config)
+        if not collectable:
+            result.error = 'Not every key item can be collected.'
+    except Exception:
+        result.total_time = time.perf_counter() - start
+        result.error = traceback.format_exc()
+
+    return result
+
+
+# The randomizer each worker process keeps between jobs.
+_worker_rando: Optional[randomizer.Randomizer] = None
+
+
+def _init_worker(rom: Optional[bytes]):
+    global _worker_rando
+    if rom is not None:
+        _worker_rando = randomizer.Randomizer(rom, is_vanilla=False)
+
+
+def _run_worker_job(job: tuple) -> BenchResult:
+    return run_job(_worker_rando, *job)
+
+
+def run_bench(flag_strings: Iterable[str], seeds: Sequence[str],
+              rom: Optional[bytes] = None,
+              max_workers: Optional[int] = None,
+              max_nodes: Optional[int] = logicwriters.DEFAULT_MAX_NODES,
+              max_restarts: int = logicwriters.DEFAULT_MAX_RESTARTS
+              ) -> list[BenchResult]:
+    '''
+    Run every seed with every flag string.  Results are in job order.  When
+    max_workers is 1, the jobs run in this process without a pool.
+    '''
+    jobs = [(flag_string, seed, max_nodes, max_restarts)
+            for flag_string in flag_strings for seed in seeds]
+    if rom is not None:
+        rom = bytes(rom)
+
+    if max_workers == 1:
+        _init_worker(rom)
+        return [_run_worker_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker,
+                             initargs=(rom,)) as executor:
+        # Jobs are short, so hand them out in chunks.
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, min(64, len(jobs) // (4*workers)))
+        return list(executor.map(_run_worker_job, jobs, chunksize=chunksize))
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    '''Nearest-rank percentile of values, which must be sorted.'''
+    ind = max(0, min(len(values) - 1, round(fraction*len(values)) - 1))
+    return values[ind]
+
+
+def _describe(values: Iterable[float]) -> dict[str, float]:
+    values = sorted(values)
+    if not values:
+        return dict()
+
+    return {
+        'min': values[0],
+        'mean': statistics.fmean(values),
+        'p50': _percentile(values, 0.5),
+        'p95': _percentile(values, 0.95),
+        'p99': _percentile(values, 0.99),
+        'max': values[-1]
+    }
+
+
+def summarize(results: Sequence[BenchResult]) -> dict:
+    '''Summary of the results of one flag string in json-friendly form.'''
+    num_seeds = len(results)
+    successes = [result for result in results if result.success]
+    # Only RandomRejectionFiller makes attempts.
+    rejection_results = [
+        result for result in results if result.attempts > 0
+    ]
+    fallbacks = sum(result.fell_back for result in rejection_results)
+    restarts = sum(result.restarts for result in results)
+
+    # Tracebacks of the same failure differ between seeds, so group them by
+    # their last line.
+    errors = Counter(
+        result.error.strip().splitlines()[-1]
+        for result in results if not result.success
+    )
+
+    return {
+        'seeds': num_seeds,
+        'success_rate': len(successes)/num_seeds if num_seeds else 0.0,
+        'fillers': dict(Counter(result.filler for result in results
+                                if result.filler is not None)),
+        'fallbacks': fallbacks,
+        'restarts': restarts,
+        'fallback_rate': (fallbacks/len(rejection_results)
+                          if rejection_results else 0.0),
+        'attempts': _describe(result.attempts
+                              for result in rejection_results),
+        'chronosanity_nodes': _describe(
+            result.chronosanity_nodes for result in results
+            if result.filler == 'ChronosanityFiller'
+        ),
+        'fill_time': _describe(result.fill_time for result in results),
+        'total_time': _describe(result.total_time for result in results),
+        'spheres': dict(sorted(Counter(
+            result.spheres for result in successes
+        ).items())),
+        'errors': dict(errors)
+    }
+
+
+def format_summary(flag_string: str, summary: dict) -> str:
+    def format_times(times: dict[str, float]) -> str:
+        if not times:
+            return '-'
+        return ' '.join(
+            f'{key} {times[key]*1000:.1f}ms'
+            for key in ('mean', 'p50', 'p95', 'max')
+        )
+
+    def format_counts(counts: dict[str, float]) -> str:
+        if not counts:
+            return '-'
+        return ' '.join(
+            f'{key} {counts[key]:.1f}'
+            for key in ('mean', 'p50', 'p95', 'p99', 'max')
+        )
+
+    lines = [
+        f'{flag_string}: {summary["seeds"]} seeds, '
+        f'{summary["success_rate"]:.2%} success',
+        '  fillers: ' + (', '.join(
+            f'{filler} {count}'
+            for filler, count in summary['fillers'].items()
+        ) or '-'),
+        f'  fallbacks: {summary["fallbacks"]} '
+        f'({summary["fallback_rate"]:.2%} of rejection fills), '
+        f'{summary["restarts"]} chronosanity restarts',
+        '  rejection attempts: ' + format_counts(summary['attempts']),
+        '  chronosanity nodes: ' + format_counts(
+            summary['chronosanity_nodes']
+        ),
+        '  fill time: ' + format_times(summary['fill_time']),
+        '  config time: ' + format_times(summary['total_time']),
+        '  spheres: ' + (', '.join(
+            f'{spheres}: {count}'
+            for spheres, count in summary['spheres'].items()
+        ) or '-')
+    ]
+
+    for error, count in summary['errors'].items():
+        lines.append(f'  error x{count}: {error}')
+
+    return '\n'.join(lines)
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Measure the key item logic over many seeds of each '
+        'flag combination.'
+    )
+    parser.add_argument(
+        '--flags', action='append', default=[], metavar='FLAG_STRING',
+        help='flag string to test, e.g. st.n.gzpcr (repeatable, default: '
+        + ' '.join(DEFAULT_FLAG_STRINGS) + ')'
+    )
+    parser.add_argument(
+        '--seeds', '-n', type=int, default=100,
+        help='number of seeds per flag string'
+    )
+    parser.add_argument(
+        '--seed-prefix', default='bench',
+        help='seeds are the prefix followed by 0 to SEEDS-1'
+    )
+    parser.add_argument(
+        '--rom', help='vanilla (unheadered) Chrono Trigger rom'
+    )
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=0,
+        help='number of worker processes (0 for one per cpu)'
+    )
+    parser.add_argument(
+        '--max-nodes', type=int, default=logicwriters.DEFAULT_MAX_NODES,
+        help='locations a Chronosanity search may try before it starts '
+        'over (0 for no limit)'
+    )
+    parser.add_argument(
+        '--max-restarts', type=int,
+        default=logicwriters.DEFAULT_MAX_RESTARTS,
+        help='Chronosanity searches to start over before the seed fails'
+    )
+    parser.add_argument(
+        '--json', metavar='FILE',
+        help='write the summaries and every seed\'s result to FILE'
+    )
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = get_arg_parser()
+    args = parser.parse_args(argv)
+
+    flag_strings = args.flags or list(DEFAULT_FLAG_STRINGS)
+    for flag_string in flag_strings:
+        try:
+            rset.Settings.from_flag_string(flag_string)
+        except ValueError as err:
+            parser.error(str(err))
+
+    rom = None
+    if args.rom is not None:
+        with open(args.rom, 'rb') as infile:
+            rom = infile.read()
+
+    if args.max_nodes < 0 or args.max_restarts < 0:
+        parser.error('--max-nodes and --max-restarts must not be negative')
+
+    seeds = [f'{args.seed_prefix}{i}' for i in range(args.seeds)]
+    max_workers = args.jobs if args.jobs > 0 else None
+
+    start = time.perf_counter()
+    results = run_bench(flag_strings, seeds, rom, max_workers,
+                        args.max_nodes or None, args.max_restarts)
+    elapsed = time.perf_counter() - start
+
+    by_flags: dict[str, list[BenchResult]] = {
+        flag_string: [] for flag_string in flag_strings
+    }
+    for result in results:
+        by_flags[result.flag_string].append(result)
+
+    summaries = {
+        flag_string: summarize(flag_results)
+        for flag_string, flag_results in by_flags.items()
+    }
+    for flag_string, summary in summaries.items():
+        print(format_summary(flag_string, summary))
+
+    print(f'{len(results)} seeds in {elapsed:.1f}s '
+          f'({len(results)/elapsed:.1f} seeds/s)')
+
+    if args.json is not None:
+        with open(args.json, 'w') as outfile:
+            json.dump(
+                {
+                    'summaries': summaries,
+                    'results': [asdict(result) for result in results]
+                },
+                outfile, indent=2
+            )
+
+    num_failed = sum(not result.success for result in results)
+    return 1 if num_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
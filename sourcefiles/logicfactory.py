@@ -3,6 +3,7 @@ from math import ceil
 
 from logictypes import BaselineLocation, Location, LocationGroup,\
     LinkedLocation, Game
+import logicrules as rules
 import treasuredata as td
 
 from ctenums import TreasureID as TID, CharID as Characters, ItemID, \
@@ -40,6 +41,7 @@ class GameConfig:
         self.settings = settings
         self.config = config
         self.game = None
+        self.accessEvaluator: typing.Optional[rules.AccessEvaluator] = None
         self.initLocations()
         self.initKeyItems()
         self.initGame()
@@ -112,6 +114,23 @@ class GameConfig:
     def getGame(self) -> Game:
         return self.game
 
+    #
+    # Get the access rules of this mode's LocationGroups compiled together.
+    # The evaluator is kept until the groups or their rules change.
+    #
+    # return: A logicrules.AccessEvaluator whose rule i is the accessRule of
+    #         locationGroups[i]
+    #
+    def getAccessEvaluator(self) -> rules.AccessEvaluator:
+        ruleList = [group.accessRule for group in self.locationGroups]
+        if self.accessEvaluator is None or \
+           self.accessEvaluator.rules != ruleList:
+            self.accessEvaluator = rules.AccessEvaluator(
+                ruleList, self.game.flagState
+            )
+
+        return self.accessEvaluator
+
     #
     # Remove all LocationGroups with the given names.
     #
@@ -152,7 +171,7 @@ class ChronosanityGameConfig(GameConfig):
         # is being considered for key item drops.
         darkagesLocations = \
             LocationGroup("Darkages", 30,
-                          lambda game: game.canAccessMtWoe())
+                          rules.MT_WOE)
         (
             darkagesLocations
             .addLocation(Location(TID.MT_WOE_1ST_SCREEN))
@@ -174,7 +193,7 @@ class ChronosanityGameConfig(GameConfig):
         # Fiona Shrine (Key Item only)
         fionaShrineLocations = \
             LocationGroup("Fionashrine", 2,
-                          lambda game: game.canAccessFionasShrine())
+                          rules.FIONAS_SHRINE)
         (
             fionaShrineLocations
             .addLocation(Location(TID.FIONA_KEY))
@@ -183,7 +202,7 @@ class ChronosanityGameConfig(GameConfig):
         # Future
         futureOpenLocations = \
             LocationGroup("FutureOpen", 20,
-                          lambda game: game.canAccessFuture())
+                          rules.FUTURE)
         (
             futureOpenLocations
             # Chests
@@ -196,7 +215,7 @@ class ChronosanityGameConfig(GameConfig):
 
         futureSewersLocations = \
             LocationGroup("FutureSewers", 9,
-                          lambda game: game.canAccessFuture())
+                          rules.FUTURE)
         (
             futureSewersLocations
             .addLocation(Location(TID.SEWERS_1))
@@ -206,7 +225,7 @@ class ChronosanityGameConfig(GameConfig):
 
         futureLabLocations = \
             LocationGroup("FutureLabs", 15,
-                          lambda game: game.canAccessFuture())
+                          rules.FUTURE)
         (
             futureLabLocations
             .addLocation(Location(TID.LAB_16_1))
@@ -222,7 +241,7 @@ class ChronosanityGameConfig(GameConfig):
         )
 
         genoDomeLocations = \
-            LocationGroup("GenoDome", 33, lambda game: game.canAccessFuture())
+            LocationGroup("GenoDome", 33, rules.FUTURE)
         (
             genoDomeLocations
             .addLocation(Location(TID.GENO_DOME_1F_1))
@@ -241,7 +260,7 @@ class ChronosanityGameConfig(GameConfig):
         )
 
         factoryLocations = \
-            LocationGroup("Factory", 30, lambda game: game.canAccessFuture())
+            LocationGroup("Factory", 30, rules.FUTURE)
         (
             factoryLocations
             .addLocation(Location(TID.FACTORY_LEFT_AUX_CONSOLE))
@@ -264,7 +283,7 @@ class ChronosanityGameConfig(GameConfig):
         # GiantsClawLocations
         giantsClawLocations = \
             LocationGroup("Giantsclaw", 30,
-                          lambda game: game.canAccessGiantsClaw())
+                          rules.GIANTS_CLAW)
         (
             giantsClawLocations
             .addLocation(Location(TID.GIANTS_CLAW_KINO_CELL))
@@ -281,7 +300,7 @@ class ChronosanityGameConfig(GameConfig):
         # Northern Ruins
         northernRuinsLocations = \
             LocationGroup("NorthernRuins", 8,
-                          lambda game: (game.canAccessRuins()))
+                          rules.RUINS)
         (
             northernRuinsLocations
             .addLocation(Location(TID.NORTHERN_RUINS_BASEMENT_600))
@@ -298,8 +317,7 @@ class ChronosanityGameConfig(GameConfig):
         northernRuinsFrogLocked = \
             LocationGroup(
                 "NorthernRuinsFrogLocked", 1,
-                lambda game: (game.canAccessRuins()
-                              and game.hasCharacter(Characters.FROG))
+                rules.RUINS & rules.Character(Characters.FROG)
             )
         (
             northernRuinsFrogLocked
@@ -309,7 +327,7 @@ class ChronosanityGameConfig(GameConfig):
         # Guardia Treasury
         guardiaTreasuryLocations = \
             LocationGroup("GuardiaTreasury", 36,
-                          lambda game: game.canAccessKingsTrial())
+                          rules.KINGS_TRIAL)
         (
             guardiaTreasuryLocations
             .addLocation(Location(TID.GUARDIA_BASEMENT_1))
@@ -328,7 +346,7 @@ class ChronosanityGameConfig(GameConfig):
         # As of 3.1.1, the back two chests are lumped in with the front four.
         earlyOzziesFortLocations = LocationGroup(
             "Ozzie's Fort", 12,
-            lambda game: (game.canAccessFuture() or game.canAccessPrehistory())
+            rules.FUTURE | rules.PREHISTORY
         )
         (
             earlyOzziesFortLocations
@@ -345,7 +363,7 @@ class ChronosanityGameConfig(GameConfig):
         # can be applied separately to individual areas.
         openLocations = LocationGroup(
             "Open", 10,
-            lambda game: True,
+            rules.ALWAYS,
             lambda weight: int(weight * 0.2)
         )
         (
@@ -363,7 +381,7 @@ class ChronosanityGameConfig(GameConfig):
             .addLocation(Location(TID.FROGS_BURROW_RIGHT))
         )
 
-        openKeys = LocationGroup("OpenKeys", 5, lambda game: True)
+        openKeys = LocationGroup("OpenKeys", 5, rules.ALWAYS)
         (
             openKeys
             .addLocation(Location(TID.ZENAN_BRIDGE_KEY))
@@ -371,7 +389,7 @@ class ChronosanityGameConfig(GameConfig):
             .addLocation(Location(TID.LAZY_CARPENTER))
         )
 
-        heckranLocations = LocationGroup("Heckran", 4, lambda game: True)
+        heckranLocations = LocationGroup("Heckran", 4, rules.ALWAYS)
         (
             heckranLocations
             .addLocation(Location(TID.HECKRAN_CAVE_SIDETRACK))
@@ -382,7 +400,7 @@ class ChronosanityGameConfig(GameConfig):
         )
 
         guardiaCastleLocations = LocationGroup(
-            "GuardiaCastle", 3, lambda game: True
+            "GuardiaCastle", 3, rules.ALWAYS
         )
         (
             guardiaCastleLocations
@@ -399,7 +417,7 @@ class ChronosanityGameConfig(GameConfig):
         )
 
         cathedralLocations = LocationGroup(
-            "CathedralLocations", 6, lambda game: True
+            "CathedralLocations", 6, rules.ALWAYS
         )
         (
             cathedralLocations
@@ -421,7 +439,7 @@ class ChronosanityGameConfig(GameConfig):
         )
 
         denadoroLocations = LocationGroup(
-            "DenadoroLocations", 6, lambda game: True
+            "DenadoroLocations", 6, rules.ALWAYS
         )
         (
             denadoroLocations
@@ -450,7 +468,7 @@ class ChronosanityGameConfig(GameConfig):
         # Sealed locations
         sealedLocations = LocationGroup(
             "SealedLocations", 20,
-            lambda game: game.canAccessSealedChests(),
+            rules.SEALED_CHESTS,
             lambda weight: int(weight * 0.3)
         )
         (
@@ -490,8 +508,7 @@ class ChronosanityGameConfig(GameConfig):
         # Requires both powered up pendant and Magus' Castle access
         magicCaveLocations = LocationGroup(
             "Magic Cave", 4,
-            lambda game: (game.canAccessSealedChests() and
-                          game.canAccessMagusCastle())
+            rules.SEALED_CHESTS & rules.MAGUS_CASTLE
         )
         (
             magicCaveLocations
@@ -500,7 +517,7 @@ class ChronosanityGameConfig(GameConfig):
 
         # Prehistory
         prehistoryForestMazeLocations = LocationGroup(
-            "PrehistoryForestMaze", 18, lambda game: game.canAccessPrehistory()
+            "PrehistoryForestMaze", 18, rules.PREHISTORY
         )
         (
             prehistoryForestMazeLocations
@@ -517,7 +534,7 @@ class ChronosanityGameConfig(GameConfig):
         )
 
         prehistoryReptiteLocations = LocationGroup(
-            "PrehistoryReptite", 27, lambda game: game.canAccessPrehistory()
+            "PrehistoryReptite", 27, rules.PREHISTORY
         )
         (
             prehistoryReptiteLocations
@@ -530,7 +547,7 @@ class ChronosanityGameConfig(GameConfig):
         # weight compared to the other prehistory locations.
         prehistoryDactylNest = LocationGroup(
             "PrehistoryDactylNest", 6,
-            lambda game: game.canAccessPrehistory()
+            rules.PREHISTORY
         )
         (
             prehistoryDactylNest
@@ -542,7 +559,7 @@ class ChronosanityGameConfig(GameConfig):
         # MelchiorRefinements
         melchiorsRefinementslocations = LocationGroup(
             "MelchiorRefinements", 15,
-            lambda game: game.canAccessMelchiorsRefinements()
+            rules.MELCHIORS_REFINEMENTS
         )
         (
             melchiorsRefinementslocations
@@ -552,7 +569,7 @@ class ChronosanityGameConfig(GameConfig):
         # Frog's Burrow
         frogsBurrowLocation = LocationGroup(
             "FrogsBurrowLocation", 9,
-            lambda game: game.canAccessBurrowItem()
+            rules.BURROW_ITEM
         )
         (
             frogsBurrowLocation
@@ -675,7 +692,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
 
         # Prehistory
         prehistoryForestMazeLocations = \
-            LocationGroup("PrehistoryForestMaze", 10, lambda game: True)
+            LocationGroup("PrehistoryForestMaze", 10, rules.ALWAYS)
         (
             prehistoryForestMazeLocations
             .addLocation(Location(TID.MYSTIC_MT_STREAM))
@@ -691,7 +708,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         )
 
         prehistoryReptiteLocations = \
-            LocationGroup("PrehistoryReptite", 10, lambda game: True)
+            LocationGroup("PrehistoryReptite", 10, rules.ALWAYS)
         (
             prehistoryReptiteLocations
             .addLocation(Location(TID.REPTITE_LAIR_REPTITES_1))
@@ -702,7 +719,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         # Dactyl Nest already has a character, so give it a relatively low
         # weight compared to the other prehistory locations.
         prehistoryDactylNest = \
-            LocationGroup("PrehistoryDactylNest", 6, lambda game: True)
+            LocationGroup("PrehistoryDactylNest", 6, rules.ALWAYS)
         (
             prehistoryDactylNest
             .addLocation(Location(TID.DACTYL_NEST_1))
@@ -714,7 +731,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         # Mount Woe does not go away in the randomizer, so it
         # is being considered for key item drops.
         darkagesLocations = \
-            LocationGroup("Darkages", 10, lambda game: True)
+            LocationGroup("Darkages", 10, rules.ALWAYS)
         (
             darkagesLocations
             .addLocation(Location(TID.MT_WOE_1ST_SCREEN))
@@ -735,7 +752,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
 
         # Future
         futureOpenLocations = \
-            LocationGroup("FutureOpen", 10, lambda game: True)
+            LocationGroup("FutureOpen", 10, rules.ALWAYS)
         (
             futureOpenLocations
             # Chests
@@ -747,7 +764,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         )
 
         futureSewersLocations = \
-            LocationGroup("FutureSewers", 8, lambda game: True)
+            LocationGroup("FutureSewers", 8, rules.ALWAYS)
         (
             futureSewersLocations
             .addLocation(Location(TID.SEWERS_1))
@@ -756,7 +773,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         )
 
         futureLabLocations = \
-            LocationGroup("FutureLabs", 10, lambda game: True)
+            LocationGroup("FutureLabs", 10, rules.ALWAYS)
         (
             futureLabLocations
             .addLocation(Location(TID.LAB_16_1))
@@ -769,7 +786,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         )
 
         genoDomeLocations = \
-            LocationGroup("GenoDome", 10, lambda game: True)
+            LocationGroup("GenoDome", 10, rules.ALWAYS)
         (
             genoDomeLocations
             .addLocation(Location(TID.GENO_DOME_1F_1))
@@ -788,7 +805,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         )
 
         factoryLocations = \
-            LocationGroup("Factory", 10, lambda game: True)
+            LocationGroup("Factory", 10, rules.ALWAYS)
         (
             factoryLocations
             .addLocation(Location(TID.FACTORY_LEFT_AUX_CONSOLE))
@@ -811,7 +828,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         # Sealed locations
         sealedLocations = \
             LocationGroup("SealedLocations", 10,
-                          lambda game: game.canAccessSealedChests())
+                          rules.SEALED_CHESTS)
         (
             sealedLocations
             # Sealed Doors
@@ -898,8 +915,8 @@ def apply_epoch_fail(game_config: GameConfig):
         TID.MELCHIOR_KEY
     )
 
-    def add_flight(func):
-        return lambda game: func(game) and game.hasKeyItem(ItemID.JETSOFTIME)
+    def add_flight(rule: rules.Rule) -> rules.Rule:
+        return rule & rules.KeyItem(ItemID.JETSOFTIME)
 
     new_groups = []
     for group in game_config.locationGroups:
@@ -1007,7 +1024,7 @@ class NormalGameConfig(GameConfig):
         )
 
         prehistoryLocations = LocationGroup(
-            "PrehistoryReptite", 1, lambda game: game.canAccessPrehistory()
+            "PrehistoryReptite", 1, rules.PREHISTORY
         )
         (
             prehistoryLocations
@@ -1015,14 +1032,14 @@ class NormalGameConfig(GameConfig):
         )
 
         darkagesLocations = \
-            LocationGroup("Darkages", 1, lambda game: game.canAccessMtWoe())
+            LocationGroup("Darkages", 1, rules.MT_WOE)
         (
             darkagesLocations
             .addLocation(BaselineLocation(TID.MT_WOE_KEY, awesome_dist))
         )
 
         openKeys = LocationGroup(
-            "OpenKeys", 5, lambda game: True, lambda weight: weight-1
+            "OpenKeys", 5, rules.ALWAYS, lambda weight: weight-1
         )
         (
             openKeys
@@ -1035,7 +1052,7 @@ class NormalGameConfig(GameConfig):
 
         melchiorsRefinementslocations = LocationGroup(
             "MelchiorRefinements", 1,
-            lambda game: game.canAccessMelchiorsRefinements()
+            rules.MELCHIORS_REFINEMENTS
         )
         (
             melchiorsRefinementslocations
@@ -1043,7 +1060,7 @@ class NormalGameConfig(GameConfig):
         )
 
         frogsBurrowLocation = LocationGroup(
-            "FrogsBurrowLocation", 1, lambda game: game.canAccessBurrowItem()
+            "FrogsBurrowLocation", 1, rules.BURROW_ITEM
         )
         (
             frogsBurrowLocation
@@ -1051,7 +1068,7 @@ class NormalGameConfig(GameConfig):
         )
 
         guardiaTreasuryLocations = LocationGroup(
-            "GuardiaTreasury", 1, lambda game: game.canAccessKingsTrial()
+            "GuardiaTreasury", 1, rules.KINGS_TRIAL
         )
         (
             guardiaTreasuryLocations
@@ -1059,7 +1076,7 @@ class NormalGameConfig(GameConfig):
         )
 
         giantsClawLocations = LocationGroup(
-            "Giantsclaw", 1, lambda game: game.canAccessGiantsClaw()
+            "Giantsclaw", 1, rules.GIANTS_CLAW
         )
         (
             giantsClawLocations
@@ -1067,7 +1084,7 @@ class NormalGameConfig(GameConfig):
         )
 
         fionaShrineLocations = LocationGroup(
-            "Fionashrine", 1, lambda game: game.canAccessFionasShrine()
+            "Fionashrine", 1, rules.FIONAS_SHRINE
         )
         (
             fionaShrineLocations
@@ -1075,7 +1092,7 @@ class NormalGameConfig(GameConfig):
         )
 
         futureKeys = LocationGroup(
-            "FutureOpen", 3, lambda game: game.canAccessFuture(),
+            "FutureOpen", 3, rules.FUTURE,
             lambda weight: weight-1
         )
         (
@@ -1122,7 +1139,7 @@ class LostWorldsGameConfig(GameConfig):
     def initLocations(self):
         # Not bothering making these baseline locations
         prehistoryLocations = LocationGroup(
-            "PrehistoryReptite", 1, lambda game: game.canAccessPrehistory()
+            "PrehistoryReptite", 1, rules.PREHISTORY
         )
         (
             prehistoryLocations
@@ -1130,14 +1147,14 @@ class LostWorldsGameConfig(GameConfig):
         )
 
         darkagesLocations = \
-            LocationGroup("Darkages", 1, lambda game: game.canAccessMtWoe())
+            LocationGroup("Darkages", 1, rules.MT_WOE)
         (
             darkagesLocations
             .addLocation(Location(TID.MT_WOE_KEY))
         )
 
         futureKeys = LocationGroup(
-            "FutureOpen", 3, lambda game: game.canAccessFuture(),
+            "FutureOpen", 3, rules.FUTURE,
             lambda weight: weight-1
         )
         (
@@ -1208,7 +1225,7 @@ class ChronosanityLegacyOfCyrusGameConfig(ChronosanityGameConfig):
         self.removeLocationGroups(removed_names)
 
         sealed_group = self.getLocationGroup('SealedLocations')
-        sealed_group.accessRule = lambda game: game.hasKeyItem(ItemID.PENDANT)
+        sealed_group.accessRule = rules.KeyItem(ItemID.PENDANT)
 
         removed_sealed_tids = (
             TID.BANGOR_DOME_SEAL_1, TID.BANGOR_DOME_SEAL_2,
@@ -1221,7 +1238,7 @@ class ChronosanityLegacyOfCyrusGameConfig(ChronosanityGameConfig):
 
         # Only gate key gives Woe access in LoC
         woe_group = self.getLocationGroup('Darkages')
-        woe_group.accessRule = lambda game: game.hasKeyItem(ItemID.GATE_KEY)
+        woe_group.accessRule = rules.KeyItem(ItemID.GATE_KEY)
 
 
 class LegacyOfCyrusGameConfig(NormalGameConfig):
@@ -1268,7 +1285,7 @@ class LegacyOfCyrusGameConfig(NormalGameConfig):
             self.config.char_assign_dict[RecruitID.PROTO_DOME].held_char
 
         prehistoryLocations = LocationGroup(
-            "PrehistoryReptite", 1, lambda game: game.canAccessPrehistory()
+            "PrehistoryReptite", 1, rules.PREHISTORY
         )
         (
             prehistoryLocations
@@ -1277,7 +1294,7 @@ class LegacyOfCyrusGameConfig(NormalGameConfig):
         self.locationGroups.append(prehistoryLocations)
 
         darkagesLocations = \
-            LocationGroup("Darkages", 1, lambda game: game.canAccessMtWoe())
+            LocationGroup("Darkages", 1, rules.MT_WOE)
         (
             darkagesLocations
             .addLocation(BaselineLocation(TID.MT_WOE_KEY, awesome_dist))
@@ -1285,7 +1302,7 @@ class LegacyOfCyrusGameConfig(NormalGameConfig):
         self.locationGroups.append(darkagesLocations)
 
         openKeys = LocationGroup(
-            "OpenKeys", 5, lambda game: True, lambda weight: weight-1
+            "OpenKeys", 5, rules.ALWAYS, lambda weight: weight-1
         )
         (
             openKeys
@@ -1298,7 +1315,7 @@ class LegacyOfCyrusGameConfig(NormalGameConfig):
         self.locationGroups.append(openKeys)
 
         frogsBurrowLocation = LocationGroup(
-            "FrogsBurrowLocation", 1, lambda game: game.canAccessBurrowItem()
+            "FrogsBurrowLocation", 1, rules.BURROW_ITEM
         )
         (
             frogsBurrowLocation
@@ -1308,7 +1325,7 @@ class LegacyOfCyrusGameConfig(NormalGameConfig):
 
         if unavail_char != Characters.MARLE:
             guardiaTreasuryLocations = LocationGroup(
-                "GuardiaTreasury", 1, lambda game: game.canAccessKingsTrial()
+                "GuardiaTreasury", 1, rules.KINGS_TRIAL
             )
             (
                 guardiaTreasuryLocations
@@ -1318,7 +1335,7 @@ class LegacyOfCyrusGameConfig(NormalGameConfig):
             self.locationGroups.append(guardiaTreasuryLocations)
 
         giantsClawLocations = LocationGroup(
-            "Giantsclaw", 1, lambda game: game.canAccessGiantsClaw()
+            "Giantsclaw", 1, rules.GIANTS_CLAW
         )
         (
             giantsClawLocations
@@ -1328,7 +1345,7 @@ class LegacyOfCyrusGameConfig(NormalGameConfig):
 
         if unavail_char != Characters.ROBO:
             fionaShrineLocations = LocationGroup(
-                "Fionashrine", 1, lambda game: game.canAccessFionasShrine()
+                "Fionashrine", 1, rules.FIONAS_SHRINE
             )
             (
                 fionaShrineLocations
@@ -1366,14 +1383,13 @@ class IceAgeGameConfig(NormalGameConfig):
             x for x in self.locationGroups if x.name == 'Darkages'
         )
 
-        def has_go_mode(game: Game):
-            return (
-                game.canAccessDactylCharacter and
-                game.hasCharacter(Characters.AYLA) and
-                game.hasKeyItem(ItemID.DREAMSTONE)
-            )
-
-        woe_group.accessRule = has_go_mode
+        # This rule used to test game.canAccessDactylCharacter without
+        # calling it, which is always true.  The Dactyl requirement is left
+        # out to keep the same logic.
+        woe_group.accessRule = (
+            rules.Character(Characters.AYLA) &
+            rules.KeyItem(ItemID.DREAMSTONE)
+        )
 
 
 class ChronosanityIceAgeGameConfig(ChronosanityGameConfig):
@@ -1400,38 +1416,27 @@ class ChronosanityIceAgeGameConfig(ChronosanityGameConfig):
 
 # Note: Accessing MtWoe is the same as accessing EoT in current logic.
 #       This means you can grind for levels if you really need it.
-def _canAccessGiantsClawVR(game: Game):
-    return (
-        game.hasKeyItem(ItemID.TOMAS_POP) and
-        game.canAccessMtWoe()
-    )
-
-
-def _canAccessKingsTrialVR(game: Game):
-    return (
-        game.hasCharacter(Characters.MARLE) and
-        game.hasKeyItem(ItemID.PRISMSHARD) and
-        game.canAccessMtWoe()
-    )
-
-
-def _canAccessFionasShrineVR(game: Game):
-    return (
-        game.hasCharacter(Characters.ROBO) and
-        game.canAccessMtWoe()
-    )
+_GIANTS_CLAW_VR = (
+    rules.KeyItem(ItemID.TOMAS_POP) & rules.MT_WOE
+)
 
+_KINGS_TRIAL_VR = (
+    rules.Character(Characters.MARLE) &
+    rules.KeyItem(ItemID.PRISMSHARD) &
+    rules.MT_WOE
+)
 
-def _canAccessNorthernRuinsVR(game: Game):
-    return game.hasKeyItem(ItemID.TOOLS)
+_FIONAS_SHRINE_VR = (
+    rules.Character(Characters.ROBO) & rules.MT_WOE
+)
 
+_NORTHERN_RUINS_VR = rules.KeyItem(ItemID.TOOLS)
 
-def _canAccessCyrusGraveVR(game: Game):
-    return (
-        _canAccessNorthernRuinsVR(game) and
-        game.hasCharacter(Characters.FROG) and
-        game.canAccessMtWoe()
-    )
+_CYRUS_GRAVE_VR = (
+    _NORTHERN_RUINS_VR &
+    rules.Character(Characters.FROG) &
+    rules.MT_WOE
+)
 
 
 _awesome_gear_dist = td.TreasureDist(
@@ -1452,17 +1457,17 @@ class VanillaRandoGameConfig(NormalGameConfig):
 
         # Gate the endgame quests behind EOT (Mt. Woe) access.
         giants_claw = self.getLocationGroup('Giantsclaw')
-        giants_claw.accessRule = _canAccessGiantsClawVR
+        giants_claw.accessRule = _GIANTS_CLAW_VR
 
         kings_trial = self.getLocationGroup('GuardiaTreasury')
-        kings_trial.accessRule = _canAccessKingsTrialVR
+        kings_trial.accessRule = _KINGS_TRIAL_VR
 
         fiona_shrine = self.getLocationGroup('Fionashrine')
-        fiona_shrine.accessRule = _canAccessFionasShrineVR
+        fiona_shrine.accessRule = _FIONAS_SHRINE_VR
 
         bekklerKey = LocationGroup(
             "BekklersLab", 1,
-            lambda game: game.hasKeyItem(ItemID.C_TRIGGER)
+            rules.KeyItem(ItemID.C_TRIGGER)
         )
         bekklerKey.addLocation(
             BaselineLocation(TID.BEKKLER_KEY, _awesome_gear_dist)
@@ -1470,7 +1475,7 @@ class VanillaRandoGameConfig(NormalGameConfig):
         self.locationGroups.append(bekklerKey)
 
         cyrusKey = LocationGroup(
-            "HerosGrave", 1, _canAccessCyrusGraveVR
+            "HerosGrave", 1, _CYRUS_GRAVE_VR
         )
         cyrusKey.addLocation(
             BaselineLocation(TID.CYRUS_GRAVE_KEY, _awesome_gear_dist)
@@ -1493,28 +1498,28 @@ class ChronosanityVanillaRandoGameConfig(ChronosanityGameConfig):
         ChronosanityGameConfig.initLocations(self)
 
         giants_claw = self.getLocationGroup('Giantsclaw')
-        giants_claw.accessRule = _canAccessGiantsClawVR
+        giants_claw.accessRule = _GIANTS_CLAW_VR
 
         kings_trial = self.getLocationGroup('GuardiaTreasury')
-        kings_trial.accessRule = _canAccessKingsTrialVR
+        kings_trial.accessRule = _KINGS_TRIAL_VR
 
         fiona_shrine = self.getLocationGroup('Fionashrine')
-        fiona_shrine.accessRule = _canAccessFionasShrineVR
+        fiona_shrine.accessRule = _FIONAS_SHRINE_VR
 
         bekklerKey = LocationGroup(
             "BekklersLab", 2,
-            lambda game: game.hasKeyItem(ItemID.C_TRIGGER)
+            rules.KeyItem(ItemID.C_TRIGGER)
         )
         bekklerKey.addLocation(Location(TID.BEKKLER_KEY))
 
         self.locationGroups.append(bekklerKey)
 
         northernRuinsLocations = self.getLocationGroup('NorthernRuins')
-        northernRuinsLocations.accessRule = _canAccessNorthernRuinsVR
+        northernRuinsLocations.accessRule = _NORTHERN_RUINS_VR
 
         northernRuinsFrog = self.getLocationGroup('NorthernRuinsFrogLocked')
         northernRuinsFrog.addLocation(Location(TID.CYRUS_GRAVE_KEY))
-        northernRuinsFrog.accessRule = _canAccessCyrusGraveVR
+        northernRuinsFrog.accessRule = _CYRUS_GRAVE_VR
 
 
 #
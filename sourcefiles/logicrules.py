@@ -0,0 +1,490 @@
+'''
+Declarative access rules for the logic placement code.
+
+A Rule is built from key items, characters, and game flags (attributes of
+logictypes.Game like lostWorlds) joined with & and |.  Named rules such as
+FUTURE or TYRANO_LAIR are shared between the rules that need them, so the
+rules form a graph that can be printed and inspected instead of a pile of
+lambdas.
+
+Before use, a rule is compiled for one combination of game flags into a
+list of clauses.  Each clause is a (key item mask, character mask) pair (see
+logictypes.getKeyItemMask) and the rule holds when the game has everything
+in some clause.  Compiled rules are cached by the rule's structure and the
+flags, so each rule is only compiled once per (mode, flags) combination.
+
+Rules are callable on a Game, so they can be used anywhere an accessRule
+function could.  AccessEvaluator compiles the rules of a list of
+LocationGroups together and AccessTracker uses it to report which groups
+open as a game gains key items and characters, only re-testing the groups
+which depend on what changed.
+'''
+from __future__ import annotations
+
+import typing
+from typing import Callable, Iterable, Optional, Sequence
+
+from ctenums import CharID, ItemID
+
+if typing.TYPE_CHECKING:
+    from logictypes import Game
+
+# Clauses are (key item mask, character mask) pairs.
+Clause = tuple[int, int]
+
+
+class CompiledRule:
+    '''
+    A rule compiled for one set of game flags.  It holds when the game has
+    every key item and character of at least one clause.
+    '''
+
+    def __init__(self, clauses: Iterable[Clause]):
+        self.clauses = _remove_absorbed(clauses)
+
+        # The key items and characters which can change the rule's value.
+        self.key_bits = 0
+        self.char_bits = 0
+        for key_mask, char_mask in self.clauses:
+            self.key_bits |= key_mask
+            self.char_bits |= char_mask
+
+    def is_satisfied(self, key_mask: int, char_mask: int) -> bool:
+        for clause_keys, clause_chars in self.clauses:
+            if key_mask & clause_keys == clause_keys and \
+               char_mask & clause_chars == clause_chars:
+                return True
+        return False
+
+    def get_requirements(self) -> list[tuple[list[ItemID], list[CharID]]]:
+        '''
+        The (key items, characters) of each clause.  Getting everything in
+        any one of them is enough for the rule to hold.
+        '''
+        return [
+            ([ItemID(bit.bit_length() - 1) for bit in _get_bits(key_mask)],
+             [CharID(bit.bit_length() - 1) for bit in _get_bits(char_mask)])
+            for key_mask, char_mask in self.clauses
+        ]
+
+    def is_always(self) -> bool:
+        return (0, 0) in self.clauses
+
+    def is_never(self) -> bool:
+        return not self.clauses
+
+
+def _get_bits(mask: int) -> list[int]:
+    '''The set bits of mask, lowest first, as masks of one bit.'''
+    bits = []
+    while mask:
+        low_bit = mask & -mask
+        bits.append(low_bit)
+        mask ^= low_bit
+    return bits
+
+
+def _remove_absorbed(clauses: Iterable[Clause]) -> tuple[Clause, ...]:
+    '''
+    Remove duplicate clauses and clauses which require everything another
+    clause does and more.
+    '''
+    # Fewer requirements first so that absorbing clauses come first.
+    clauses = sorted(
+        set(clauses),
+        key=lambda x: (bin(x[0]).count('1') + bin(x[1]).count('1'), x)
+    )
+
+    ret: list[Clause] = []
+    for key_mask, char_mask in clauses:
+        absorbed = any(
+            key_mask & kept_keys == kept_keys and
+            char_mask & kept_chars == kept_chars
+            for kept_keys, kept_chars in ret
+        )
+        if not absorbed:
+            ret.append((key_mask, char_mask))
+
+    return tuple(ret)
+
+
+# (rule key, flag state) --> CompiledRule
+_compiled_cache: dict[tuple, CompiledRule] = dict()
+
+
+class Rule:
+    '''
+    Base class for access rules.  Subclasses give a key which identifies the
+    rule's structure and a way to compile themselves.
+    '''
+
+    def __init__(self, key: tuple):
+        self._key = key
+        self._hash = hash(key)
+
+        # flag state --> CompiledRule, so that calling a rule doesn't need
+        # to hash its key.
+        self._compiled: dict[tuple[bool, ...], CompiledRule] = dict()
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self._key == other._key
+
+    def __hash__(self):
+        return self._hash
+
+    def __and__(self, other: Rule) -> Rule:
+        if not isinstance(other, Rule):
+            return NotImplemented
+        return All(self, other)
+
+    def __or__(self, other: Rule) -> Rule:
+        if not isinstance(other, Rule):
+            return NotImplemented
+        return Any(self, other)
+
+    def __call__(self, game: Game) -> bool:
+        compiled = self._compiled.get(game.flagState, None)
+        if compiled is None:
+            compiled = self.compile(game.flagState)
+
+        return compiled.is_satisfied(game.keyItemMask, game.characterMask)
+
+    def named(self, name: str) -> Rule:
+        return Named(name, self)
+
+    def compile(self, flag_state: tuple[bool, ...]) -> CompiledRule:
+        '''
+        Compile the rule for the given Game.flagState.
+        '''
+        compiled = self._compiled.get(flag_state, None)
+        if compiled is None:
+            cache_key = (self._key, flag_state)
+            compiled = _compiled_cache.get(cache_key, None)
+            if compiled is None:
+                compiled = CompiledRule(self._get_clauses(flag_state))
+                _compiled_cache[cache_key] = compiled
+            self._compiled[flag_state] = compiled
+
+        return compiled
+
+    def _get_clauses(self, flag_state: tuple[bool, ...]) -> list[Clause]:
+        raise NotImplementedError
+
+
+class KeyItem(Rule):
+    '''Requires a key item.'''
+
+    def __init__(self, item: ItemID):
+        Rule.__init__(self, ('item', int(item)))
+        self.item = ItemID(item)
+
+    def _get_clauses(self, flag_state):
+        return [(1 << self.item, 0)]
+
+    def __str__(self):
+        return str(self.item)
+
+
+class Character(Rule):
+    '''Requires a character.'''
+
+    def __init__(self, char: CharID):
+        Rule.__init__(self, ('char', int(char)))
+        self.char = CharID(char)
+
+    def _get_clauses(self, flag_state):
+        return [(0, 1 << self.char)]
+
+    def __str__(self):
+        return str(self.char)
+
+
+# The Game attributes which a Flag may test.  Game.flagState holds their
+# values in this order.
+FLAG_NAMES = ('earlyPendant', 'lockedChars', 'lostWorlds', 'legacyofcyrus')
+
+
+class Flag(Rule):
+    '''
+    Requires a game setting (one of FLAG_NAMES) to have the given value.
+    Flags are constant for a seed, so they disappear when compiled.
+    '''
+
+    def __init__(self, name: str, value: bool = True):
+        if name not in FLAG_NAMES:
+            raise ValueError(f'Unknown flag: {name}')
+
+        Rule.__init__(self, ('flag', name, value))
+        self.name = name
+        self.value = value
+        self.index = FLAG_NAMES.index(name)
+
+    def _get_clauses(self, flag_state):
+        if flag_state[self.index] == self.value:
+            return [(0, 0)]
+        return []
+
+    def __str__(self):
+        return self.name if self.value else f'not {self.name}'
+
+
+class All(Rule):
+    '''Requires every one of the given rules.  All() always holds.'''
+
+    def __init__(self, *rules: Rule):
+        # Nested Alls are flattened so that a & b & c is one node.
+        rules = _flatten(All, rules)
+        Rule.__init__(self, ('all',) + tuple(rule._key for rule in rules))
+        self.rules = rules
+
+    def _get_clauses(self, flag_state):
+        clauses = [(0, 0)]
+        for rule in self.rules:
+            rule_clauses = rule.compile(flag_state).clauses
+            clauses = [
+                (key_mask | rule_keys, char_mask | rule_chars)
+                for key_mask, char_mask in clauses
+                for rule_keys, rule_chars in rule_clauses
+            ]
+        return clauses
+
+    def __str__(self):
+        if not self.rules:
+            return 'always'
+        return ' and '.join(_get_operand_str(rule) for rule in self.rules)
+
+
+class Any(Rule):
+    '''Requires at least one of the given rules.  Any() never holds.'''
+
+    def __init__(self, *rules: Rule):
+        # Nested Anys are flattened so that a | b | c is one node.
+        rules = _flatten(Any, rules)
+        Rule.__init__(self, ('any',) + tuple(rule._key for rule in rules))
+        self.rules = rules
+
+    def _get_clauses(self, flag_state):
+        return [
+            clause for rule in self.rules
+            for clause in rule.compile(flag_state).clauses
+        ]
+
+    def __str__(self):
+        if not self.rules:
+            return 'never'
+        return ' or '.join(_get_operand_str(rule) for rule in self.rules)
+
+
+class Named(Rule):
+    '''
+    A rule with a name.  Naming doesn't change what the rule requires, but
+    it keeps printed rules short and marks the shared nodes of the graph.
+    '''
+
+    def __init__(self, name: str, rule: Rule):
+        Rule.__init__(self, ('named', name, rule._key))
+        self.name = name
+        self.rule = rule
+
+    def _get_clauses(self, flag_state):
+        return list(self.rule.compile(flag_state).clauses)
+
+    def __str__(self):
+        return self.name
+
+
+def _flatten(rule_type: type, rules: Iterable[Rule]) -> tuple[Rule, ...]:
+    ret = []
+    for rule in rules:
+        if type(rule) is rule_type:
+            ret.extend(rule.rules)
+        else:
+            ret.append(rule)
+    return tuple(ret)
+
+
+def _get_operand_str(rule: Rule) -> str:
+    if isinstance(rule, (All, Any)) and len(rule.rules) > 1:
+        return f'({rule})'
+    return str(rule)
+
+
+ALWAYS = All()
+NEVER = Any()
+
+#
+# The rules that the logic is built from.  These mirror the logic
+# convenience functions of logictypes.Game, which are implemented with them.
+#
+FUTURE = (
+    Flag('legacyofcyrus', False) &
+    (Flag('lostWorlds') | KeyItem(ItemID.PENDANT))
+).named('Future')
+
+PREHISTORY = (
+    Flag('lostWorlds') | KeyItem(ItemID.GATE_KEY)
+).named('Prehistory')
+
+# If character locking is on, dreamstone is required to get the Dactyl Nest
+# character in addition to prehistory access.
+DACTYL_CHARACTER = (
+    PREHISTORY &
+    (Flag('lockedChars', False) | KeyItem(ItemID.DREAMSTONE))
+).named('DactylCharacter')
+
+TYRANO_LAIR = (
+    PREHISTORY & KeyItem(ItemID.DREAMSTONE)
+).named('TyranoLair')
+
+MASAMUNE = (
+    KeyItem(ItemID.BENT_HILT) & KeyItem(ItemID.BENT_SWORD)
+).named('Masamune')
+
+MAGUS_CASTLE = (
+    MASAMUNE & Character(CharID.FROG)
+).named('MagusCastle')
+
+MT_WOE = (
+    Flag('lostWorlds') | PREHISTORY | FUTURE
+).named('MtWoe')
+
+OCEAN_PALACE = (
+    MAGUS_CASTLE | (TYRANO_LAIR & KeyItem(ItemID.RUBY_KNIFE))
+).named('OceanPalace')
+
+BLACK_OMEN = (
+    FUTURE & KeyItem(ItemID.CLONE) & KeyItem(ItemID.C_TRIGGER)
+).named('BlackOmen')
+
+SUNSTONE = (
+    FUTURE & PREHISTORY & KeyItem(ItemID.MOON_STONE)
+).named('Sunstone')
+
+KINGS_TRIAL = (
+    Character(CharID.MARLE) & KeyItem(ItemID.PRISMSHARD)
+).named('KingsTrial')
+
+MELCHIORS_REFINEMENTS = (
+    KINGS_TRIAL & SUNSTONE
+).named('MelchiorsRefinements')
+
+GIANTS_CLAW = KeyItem(ItemID.TOMAS_POP).named('GiantsClaw')
+
+RUINS = KeyItem(ItemID.MASAMUNE_2).named('Ruins')
+
+# With 3.1.1. logic change, canAccessDarkAges isn't correct for checking
+# sealed chest access.  Instead check for actual go modes.
+SEALED_CHESTS = (
+    KeyItem(ItemID.PENDANT) &
+    (Flag('earlyPendant') | TYRANO_LAIR | MAGUS_CASTLE)
+).named('SealedChests')
+
+BURROW_ITEM = KeyItem(ItemID.HERO_MEDAL).named('BurrowItem')
+
+FIONAS_SHRINE = Character(CharID.ROBO).named('FionasShrine')
+
+
+class AccessEvaluator:
+    '''
+    The access rules of a list of LocationGroups compiled for one set of
+    game flags.  Rules which are plain functions rather than Rules are
+    called as they always were.
+    '''
+
+    def __init__(self, rules: Sequence[Callable[[Game], bool]],
+                 flag_state: tuple[bool, ...]):
+        self.rules = list(rules)
+        self.flag_state = flag_state
+
+        self.compiled: list[Optional[CompiledRule]] = [
+            rule.compile(flag_state) if isinstance(rule, Rule) else None
+            for rule in self.rules
+        ]
+
+    def is_satisfied(self, ind: int, game: Game) -> bool:
+        compiled = self.compiled[ind]
+        if compiled is None:
+            return bool(self.rules[ind](game))
+
+        return compiled.is_satisfied(game.keyItemMask, game.characterMask)
+
+    def get_satisfied(self, game: Game) -> list[int]:
+        '''The indices of the rules which hold in the game.'''
+        return [
+            ind for ind in range(len(self.rules))
+            if self.is_satisfied(ind, game)
+        ]
+
+    def get_tracker(
+            self,
+            closed: Optional[Iterable[int]] = None
+    ) -> AccessTracker:
+        return AccessTracker(self, closed)
+
+
+class AccessTracker:
+    '''
+    Follows a game which only gains key items and characters and reports
+    which rules of an AccessEvaluator become satisfied.  A rule is only
+    re-tested when the game gains something the rule mentions.
+    '''
+
+    def __init__(self, evaluator: AccessEvaluator,
+                 closed: Optional[Iterable[int]] = None):
+        '''
+        Follow the rules with indices in closed (default all).  The other
+        rules are treated as already satisfied and are never reported.
+        '''
+        self.evaluator = evaluator
+        if closed is None:
+            closed = range(len(evaluator.rules))
+        self.closed = sorted(closed)
+        self.key_mask: Optional[int] = None
+        self.char_mask = 0
+
+    def update(self, game: Game) -> list[int]:
+        '''
+        Return the indices of the rules which became satisfied since the
+        last update, in order.  The first update reports every satisfied
+        rule.
+        '''
+        evaluator = self.evaluator
+
+        if game.flagState != evaluator.flag_state:
+            raise ValueError('Game flags do not match the evaluator.')
+
+        key_mask, char_mask = game.keyItemMask, game.characterMask
+
+        is_first = self.key_mask is None
+        if is_first:
+            new_keys, new_chars = key_mask, char_mask
+        else:
+            if self.key_mask & ~key_mask or self.char_mask & ~char_mask:
+                raise ValueError(
+                    'AccessTracker can not follow a game which loses key '
+                    'items or characters.'
+                )
+            new_keys = key_mask & ~self.key_mask
+            new_chars = char_mask & ~self.char_mask
+
+        self.key_mask, self.char_mask = key_mask, char_mask
+
+        opened = []
+        closed = []
+        for ind in self.closed:
+            compiled = evaluator.compiled[ind]
+            if compiled is None:
+                is_open = evaluator.rules[ind](game)
+            elif is_first or compiled.key_bits & new_keys or \
+                    compiled.char_bits & new_chars:
+                is_open = compiled.is_satisfied(key_mask, char_mask)
+            else:
+                is_open = False
+
+            if is_open:
+                opened.append(ind)
+            else:
+                closed.append(ind)
+
+        self.closed = closed
+        return opened
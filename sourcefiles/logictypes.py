@@ -2,6 +2,7 @@ from __future__ import annotations
 import typing
 
 from ctenums import ItemID, CharID, RecruitID, TreasureID
+import logicrules as rules
 import treasuredata as td
 import randosettings as rset
 import randoconfig as cfg
@@ -10,6 +11,46 @@ import randoconfig as cfg
 #
 
 
+#
+# Key items and characters are kept as bitmasks in Game.  Bit n of a key item
+# mask is set when ItemID n is held, and bit n of a character mask is set
+# when CharID n is recruited.  Access rules (see logicrules) compile to
+# checks against these masks, so each rule is a few integer operations
+# instead of a chain of set lookups.
+#
+def getKeyItemMask(items: typing.Iterable[ItemID]) -> int:
+    mask = 0
+    for item in items:
+        mask |= 1 << item
+    return mask
+
+
+def getCharacterMask(chars: typing.Iterable[CharID]) -> int:
+    mask = 0
+    for char in chars:
+        mask |= 1 << char
+    return mask
+
+
+# Looking up the ids in a dict is much faster than calling the enum.
+_itemIDs = {int(item): item for item in ItemID}
+_charIDs = {int(char): char for char in CharID}
+
+
+#
+# Turn a mask back into the ItemIDs or CharIDs it holds, lowest id first.
+#
+# param: ids - _itemIDs or _charIDs
+#
+def _getMaskValues(mask: int, ids: dict) -> list:
+    values = []
+    while mask:
+        low_bit = mask & -mask
+        values.append(ids[low_bit.bit_length() - 1])
+        mask ^= low_bit
+    return values
+
+
 #
 # The Game class is used to keep track of game state
 # as the randomizer places key items.  It:
@@ -18,11 +59,15 @@ import randoconfig as cfg
 #   - Keeps track of user selected flags
 #   - Provides logic convenience functions
 #
+# The key items and characters are stored as bitmasks (keyItemMask,
+# characterMask).  The keyItems and characters properties are kept for
+# reading and assigning them as collections of ids.
+#
 class Game:
     def __init__(self, settings: rset.Settings,
                  config: cfg.RandoConfig):
-        self.characters = set()
-        self.keyItems = set()
+        self.characterMask = 0
+        self.keyItemMask = 0
         self.earlyPendant = rset.GameFlags.FAST_PENDANT in settings.gameflags
         self.lockedChars = rset.GameFlags.LOCKED_CHARS in settings.gameflags
         self.lostWorlds = rset.GameMode.LOST_WORLDS == settings.game_mode
@@ -30,9 +75,57 @@ class Game:
         self.legacyofcyrus = \
             rset.GameMode.LEGACY_OF_CYRUS == settings.game_mode
 
+        # The settings which change what the access rules require, in
+        # logicrules.FLAG_NAMES order.  Compiled rules are cached by this.
+        self.flagState = tuple(
+            getattr(self, name) for name in rules.FLAG_NAMES
+        )
+
         # In case we need to look something else up
         self.settings = settings
 
+    #
+    # The characters obtained, lowest CharID first.  Assigning any iterable
+    # of CharIDs replaces the current characters.
+    #
+    @property
+    def characters(self) -> tuple[CharID, ...]:
+        return tuple(_getMaskValues(self.characterMask, _charIDs))
+
+    @characters.setter
+    def characters(self, chars: typing.Iterable[CharID]):
+        self.characterMask = getCharacterMask(chars)
+
+    #
+    # The key items obtained, lowest ItemID first.  Assigning any iterable
+    # of ItemIDs replaces the current key items.  Duplicates are only
+    # counted once.
+    #
+    @property
+    def keyItems(self) -> tuple[ItemID, ...]:
+        return tuple(_getMaskValues(self.keyItemMask, _itemIDs))
+
+    @keyItems.setter
+    def keyItems(self, items: typing.Iterable[ItemID]):
+        self.keyItemMask = getKeyItemMask(items)
+
+    #
+    # Get the state of the game as a hashable value.  Two Games with the same
+    # settings and state answer every logic query the same way.
+    #
+    # return: (keyItemMask, characterMask)
+    #
+    def getState(self) -> tuple[int, int]:
+        return (self.keyItemMask, self.characterMask)
+
+    #
+    # Get a copy of this Game.  The settings and config are shared.
+    #
+    def copy(self) -> Game:
+        ret = Game.__new__(Game)
+        ret.__dict__.update(self.__dict__)
+        return ret
+
     #
     # Get the number of key items that have been acquired by the player.
     #
@@ -40,7 +133,7 @@ class Game:
     #
 
     def getKeyItemCount(self):
-        return len(self.keyItems)
+        return bin(self.keyItemMask).count('1')
 
     #
     # Set whether or not this seed is using the early pendant flag.
@@ -90,7 +183,7 @@ class Game:
     # return: true if the character has been acquired, false if not
     #
     def hasCharacter(self, character):
-        return character in self.characters
+        return bool(self.characterMask & (1 << character))
 
     #
     # Add a character to the set of characters acquired
@@ -98,7 +191,7 @@ class Game:
     # param: character - The character to add
     #
     def addCharacter(self, character):
-        self.characters.add(character)
+        self.characterMask |= 1 << character
 
     #
     # Remove a character from the set of characters acquired
@@ -106,7 +199,7 @@ class Game:
     # param: character: The character to remove
     #
     def removeCharacter(self, character):
-        self.characters.discard(character)
+        self.characterMask &= ~(1 << character)
 
     #
     # Check if the player has a given key item.
@@ -115,7 +208,16 @@ class Game:
     # returns: True if the player has the key item, false if not
     #
     def hasKeyItem(self, item):
-        return item in self.keyItems
+        return bool(self.keyItemMask & (1 << item))
+
+    #
+    # Check if the player has every key item in a mask from getKeyItemMask.
+    #
+    # param: mask - The key items to check for
+    # returns: True if the player has all of the key items, false if not
+    #
+    def hasKeyItemMask(self, mask: int) -> bool:
+        return self.keyItemMask & mask == mask
 
     #
     # Add a key item to the set of key items acquired
@@ -123,7 +225,15 @@ class Game:
     # param: item - The Key Item to add
     #
     def addKeyItem(self, item):
-        self.keyItems.add(item)
+        self.keyItemMask |= 1 << item
+
+    #
+    # Add several key items to the set of key items acquired
+    #
+    # param: items - An iterable of the Key Items to add
+    #
+    def addKeyItems(self, items: typing.Iterable[ItemID]):
+        self.keyItemMask |= getKeyItemMask(items)
 
     #
     # Remove a key item from the set of key items acquired
@@ -131,7 +241,7 @@ class Game:
     # param: item: The Key Item to remove
     #
     def removeKeyItem(self, item):
-        self.keyItems.discard(item)
+        self.keyItemMask &= ~(1 << item)
 
     #
     # Determine which characters are available based on what key items/time
@@ -146,7 +256,7 @@ class Game:
 
         # Empty the set just in case the placement algorithm had to
         # backtrack and a character is no longer available.
-        self.characters.clear()
+        self.characterMask = 0
 
         if rset.GameFlags.STARTERS_SUFFICIENT in self.settings.gameflags and \
            self.settings.game_mode == rset.GameMode.STANDARD:
@@ -202,87 +312,59 @@ class Game:
     #
     # Logic convenience functions.  These can be used to
     # quickly check if particular eras or locations are
-    # logically accessible.
+    # logically accessible.  Each is one of the rules in logicrules, which
+    # are also used as LocationGroup access rules.
     #
     def canAccessDactylCharacter(self):
-        # If character locking is on, dreamstone is required to get the
-        # Dactyl Nest character in addition to prehistory access.
-        return (self.canAccessPrehistory() and
-                ((not self.lockedChars) or
-                 self.hasKeyItem(ItemID.DREAMSTONE)))
+        return rules.DACTYL_CHARACTER(self)
 
     def canAccessFuture(self):
-        return not self.legacyofcyrus and \
-            (self.hasKeyItem(ItemID.PENDANT) or self.lostWorlds)
+        return rules.FUTURE(self)
 
     def canAccessPrehistory(self):
-        return self.hasKeyItem(ItemID.GATE_KEY) or self.lostWorlds
+        return rules.PREHISTORY(self)
 
     def canAccessTyranoLair(self):
-        return self.canAccessPrehistory() and \
-            self.hasKeyItem(ItemID.DREAMSTONE)
+        return rules.TYRANO_LAIR(self)
 
     def hasMasamune(self):
-        return (self.hasKeyItem(ItemID.BENT_HILT) and
-                self.hasKeyItem(ItemID.BENT_SWORD))
+        return rules.MASAMUNE(self)
 
     def canAccessMagusCastle(self):
-        return (self.hasMasamune() and
-                self.hasCharacter(CharID.FROG))
+        return rules.MAGUS_CASTLE(self)
 
     def canAccessMtWoe(self):
-        return (self.lostWorlds or
-                self.canAccessPrehistory() or
-                self.canAccessFuture())
+        return rules.MT_WOE(self)
 
     def canAccessOceanPalace(self):
-        return (
-            self.canAccessMagusCastle() or
-            (
-                self.canAccessTyranoLair() and
-                self.hasKeyItem(ItemID.RUBY_KNIFE)
-            )
-        )
+        return rules.OCEAN_PALACE(self)
 
     def canAccessBlackOmen(self):
-        return (self.canAccessFuture() and
-                self.hasKeyItem(ItemID.CLONE) and
-                self.hasKeyItem(ItemID.C_TRIGGER))
+        return rules.BLACK_OMEN(self)
 
     def canGetSunstone(self):
-        return (self.canAccessFuture() and
-                self.canAccessPrehistory() and
-                self.hasKeyItem(ItemID.MOON_STONE))
+        return rules.SUNSTONE(self)
 
     def canAccessKingsTrial(self):
-        return (self.hasCharacter(CharID.MARLE) and
-                self.hasKeyItem(ItemID.PRISMSHARD))
+        return rules.KINGS_TRIAL(self)
 
     def canAccessMelchiorsRefinements(self):
-        return (self.canAccessKingsTrial() and
-                self.canGetSunstone())
+        return rules.MELCHIORS_REFINEMENTS(self)
 
     def canAccessGiantsClaw(self):
-        return self.hasKeyItem(ItemID.TOMAS_POP)
+        return rules.GIANTS_CLAW(self)
 
     def canAccessRuins(self):
-        return self.hasKeyItem(ItemID.MASAMUNE_2)
+        return rules.RUINS(self)
 
     def canAccessSealedChests(self):
-        # With 3.1.1. logic change, canAccessDarkAges isn't correct for
-        # checking sealed chest access.  Instead check for actual go modes.
-        return (
-            self.hasKeyItem(ItemID.PENDANT) and
-             (self.earlyPendant or
-              self.canAccessTyranoLair() or
-              self.canAccessMagusCastle())
-        )
+        return rules.SEALED_CHESTS(self)
 
     def canAccessBurrowItem(self):
-        return self.hasKeyItem(ItemID.HERO_MEDAL)
+        return rules.BURROW_ITEM(self)
 
     def canAccessFionasShrine(self):
-        return self.hasCharacter(CharID.ROBO)
+        return rules.FIONAS_SHRINE(self)
     # End Game class
 
 #
@@ -504,8 +586,9 @@ class LocationGroup:
     #
     # param: name - The name of this LocationGroup
     # param: weight - The initial weighting factor of this LocationGroup
-    # param: accessRule - A function used to determine if this LocationGroup
-    #                     is accessible
+    # param: accessRule - A logicrules.Rule (or any function of a Game) used
+    #                     to determine if this LocationGroup is accessible.
+    #                     Only Rules can be compiled by an AccessEvaluator.
     # param: weightDecay - Optional function to define weight decay of this
     #                      LocationGroup
     #
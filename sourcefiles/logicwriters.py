@@ -1,8 +1,11 @@
 from __future__ import annotations
+from dataclasses import dataclass
 import random
+import time
 import typing
 
 import logicfactory
+import logicrules
 import logictypes
 
 import ctenums
@@ -20,6 +23,20 @@ class ImpossibleConfigurationException(Exception):
     pass
 
 
+class KeyItemFillException(LogicIterationException):
+    '''
+    Every budgeted Chronosanity search ran out of nodes.  The seed should be
+    rolled again.
+    '''
+    pass
+
+
+# Default budget of a ChronosanityFiller search, and how many times
+# commitKeyItems starts a search over after it runs out.
+DEFAULT_MAX_NODES = 50000
+DEFAULT_MAX_RESTARTS = 4
+
+
 class KeyItemFiller(typing.Protocol):
 
     def get_key_item_locations(
@@ -39,6 +56,7 @@ class RandomRejectionFiller:
 
     def __init__(self, max_attempts: int = 5000):
         self.max_attempts = max_attempts
+        self.attempts = 0  # Placements tried by the last fill
 
     def fill_key_item_locations(
             self,
@@ -52,7 +70,7 @@ class RandomRejectionFiller:
                                    game_config.config)
         max_game.keyItems = list(key_items_list)
 
-        num_attempts = 0
+        self.attempts = 0
 
         while True:
             available_locations = get_available_locations(game_config,
@@ -67,6 +85,7 @@ class RandomRejectionFiller:
             for ind, item in enumerate(key_items_list):
                 available_locations[ind].setKeyItem(item)
 
+            self.attempts += 1
             if is_placement_valid(game_config):
                 return available_locations[0: len(key_items_list)]
 
@@ -74,8 +93,7 @@ class RandomRejectionFiller:
             for loc in available_locations[0: len(key_items_list)]:
                 loc.unsetKeyItem()
 
-            num_attempts += 1
-            if num_attempts >= self.max_attempts:
+            if self.attempts >= self.max_attempts:
                 raise LogicIterationException('Maximum Attempts Reached.')
 
 
@@ -102,6 +120,7 @@ class ALTTPRWeightedFiller:
         key_items_list = set(list(game_config.keyItemList))
         unassigned_key_items = list(key_items_list)
         assigned_locations: list[_LocType] = []
+        reachability = KeyItemReachability(game_config)
 
         failure_count = 0
 
@@ -113,7 +132,8 @@ class ALTTPRWeightedFiller:
             random.shuffle(unassigned_key_items)
             next_item = unassigned_key_items.pop()
 
-            collectable_key_items = get_collectable_key_items(game_config)
+            collectable_key_items = \
+                reachability.get_collectable_key_items()
             assumed_key_items = unassigned_key_items + collectable_key_items
 
             max_game = logictypes.Game(settings, config)
@@ -131,7 +151,7 @@ class ALTTPRWeightedFiller:
 
                 # Reset everything
                 for loc in assigned_locations:
-                    loc.unsetKeyItem()
+                    reachability.unset_key_item(loc)
 
                 unassigned_key_items = list(key_items_list)
                 assigned_locations = []
@@ -145,7 +165,7 @@ class ALTTPRWeightedFiller:
                 group = random.choices(avail_groups, weights=weights, k=1)[0]
                 loc = random.choice([loc for loc in group.locations
                                      if loc not in assigned_locations])
-                loc.setKeyItem(next_item)
+                reachability.set_key_item(loc, next_item)
                 assigned_locations.append(loc)
 
                 # Decay group's weight
@@ -260,6 +280,7 @@ class ALTTPRFiller:
         key_items_list = set(list(game_config.keyItemList))
         unassigned_key_items = list(key_items_list)
         assigned_locations: list[_LocType] = []
+        reachability = KeyItemReachability(game_config)
 
         failure_count = 0
 
@@ -271,7 +292,8 @@ class ALTTPRFiller:
             random.shuffle(unassigned_key_items)
             next_item = unassigned_key_items.pop()
 
-            collectable_key_items = get_collectable_key_items(game_config)
+            collectable_key_items = \
+                reachability.get_collectable_key_items()
             assumed_key_items = unassigned_key_items + collectable_key_items
 
             max_game = logictypes.Game(settings, config)
@@ -290,26 +312,56 @@ class ALTTPRFiller:
                 # Reset everything
                 # A smarter system would only reset the previous placement.
                 for loc in assigned_locations:
-                    loc.unsetKeyItem()
+                    reachability.unset_key_item(loc)
 
                 unassigned_key_items = list(key_items_list)
                 assigned_locations = []
             else:
                 loc = random.choice(avail_locs)
                 assigned_locations.append(loc)
-                loc.setKeyItem(next_item)
+                reachability.set_key_item(loc, next_item)
 
                 print(f'Assigned {next_item} to {loc.getName()} ')
 
         return assigned_locations
 
 
+@dataclass
+class ChronosanitySearchStats:
+    '''Counts from one run of ChronosanityFiller's search.'''
+    nodes: int = 0            # Locations chosen
+    placements: int = 0       # Key items tried in a chosen location
+    backtracks: int = 0       # Chosen locations where every key item failed
+    dead_state_hits: int = 0  # States skipped because they failed before
+    max_depth: int = 0
+    elapsed: float = 0.0      # Seconds
+
+
+@dataclass
+class _PlacementFrame:
+    '''A location chosen by ChronosanityFiller and the key items to try.'''
+    group: logictypes.LocationGroup
+    location: _LocType
+    key_items: list[ctenums.ItemID]
+    remaining: list[ctenums.ItemID]
+    state: tuple[int, int]
+    index: int = 0
+
+
 class ChronosanityFiller:
     '''
     Filler for Anguirel's original Chronosanity algorithm.
+
+    The search stops after max_nodes locations have been chosen (no limit if
+    None) and raises LogicIterationException.  Statistics of the last search
+    are kept in stats.
     '''
-    def __init__(self):
+    def __init__(self,
+                 max_nodes: typing.Optional[int] = DEFAULT_MAX_NODES):
         self.locationGroups = []
+        self.max_nodes = max_nodes
+        self.stats = ChronosanitySearchStats()
+        self.evaluator: typing.Optional[logicrules.AccessEvaluator] = None
 
     #
     # Get a list of LocationGroups that are available for key item placement.
@@ -326,10 +378,10 @@ class ChronosanityFiller:
 
         # Get a list of all accessible location groups
         accessibleLocationGroups = []
-        for locationGroup in self.locationGroups:
-            if locationGroup.canAccess(game):
-                if locationGroup.getAvailableLocationCount() > 0:
-                    accessibleLocationGroups.append(locationGroup)
+        for ind in self.evaluator.get_satisfied(game):
+            locationGroup = self.locationGroups[ind]
+            if locationGroup.getAvailableLocationCount() > 0:
+                accessibleLocationGroups.append(locationGroup)
 
         return accessibleLocationGroups
 
@@ -399,123 +451,174 @@ class ChronosanityFiller:
     #
     # return: A list of locations with key items assigned.
     #
-    # Raises ImpossibleConfigurationException if not successful.
+    # Raises ImpossibleConfigurationException if not successful and
+    # LogicIterationException if the node budget runs out.
     def fill_key_item_locations(self, gameConfig: logicfactory.GameConfig):
         self.locationGroups = gameConfig.getLocations()
+        self.evaluator = gameConfig.getAccessEvaluator()
         remainingKeyItems = gameConfig.getKeyItemList()
-        chosenLocations = []
-        success, key_item_locations = self.determineKeyItemPlacement_impl(
-            chosenLocations, remainingKeyItems, gameConfig
-        )
 
-        if not success:
+        self.stats = ChronosanitySearchStats()
+        start_time = time.perf_counter()
+        try:
+            key_item_locations = self.determineKeyItemPlacement(
+                remainingKeyItems, gameConfig
+            )
+        finally:
+            self.stats.elapsed = time.perf_counter() - start_time
+
+        if key_item_locations is None:
             # ChronosanityFiller will find a valid assignment if there is one.
             raise ImpossibleConfigurationException
 
         return key_item_locations
 
     #
-    # NOTE: Do not call this function directly. This will be called
-    #       by determineKeyItemPlacement after setting up the parameters
-    #       needed by this function.
+    # Choose a location for the next key item and the order to try the key
+    # items in.  This undoes nothing if the search fails, see closeFrame.
+    #
+    def openFrame(
+            self,
+            availableLocations: list[logictypes.LocationGroup],
+            remainingKeyItems: list[ctenums.ItemID],
+            gameConfig: logicfactory.GameConfig,
+            state: tuple[int, int]
+    ) -> _PlacementFrame:
+        # Choose a random location
+        locationGroup, location = self.getRandomLocation(availableLocations)
+        locationGroup.removeLocation(location)
+        locationGroup.decayWeight()
+
+        # Sometimes key item bias is removed after N checks
+        gameConfig.updateKeyItems(remainingKeyItems)
+
+        # Use the weighted key item list to get a list of key items
+        # that we can loop through and attempt to place.
+        localKeyItemList = self.getShuffledKeyItemList(remainingKeyItems)
+
+        return _PlacementFrame(locationGroup, location, localKeyItemList,
+                               remainingKeyItems, state)
+
+    #
+    # Undo the location modifications of openFrame.
+    #
+    @staticmethod
+    def closeFrame(frame: _PlacementFrame):
+        frame.group.addLocation(frame.location)
+        frame.group.undoWeightDecay()
+        frame.location.unsetKeyItem()
+
     #
-    # This function will recursively determine key item locations
-    # such that a seed can be 100% completed.  This uses a weighted random
-    # approach to placement and will only consider logically accessible
-    # locations.
+    # Determine key item locations such that a seed can be 100% completed.
+    # This uses a weighted random approach to placement and will only
+    # consider logically accessible locations.
     #
-    # The algorithm for determining locations - For each recursion:
-    #   If there are no key items remaining, unwind the recursion, otherwise
+    # The algorithm for determining locations.  For each node:
+    #   If there are no key items remaining, we're done.  Otherwise
     #     Get a list of logically accessible locations
     #     Choose a location randomly (locations are weighted)
     #     Get a shuffled list of the remaining key items
     #     Loop through the key item list, trying each one in the chosen
     #     location
-    #       Recurse and try the next location/key item
-    #     
+    #       Go to the next node to try the next location/key item
+    #
+    # Nodes are kept on an explicit stack instead of recursing.  The
+    # future of a node only depends on which key items have been placed and
+    # which locations are used, so a node in a state that failed before is
+    # failed immediately.
     #
-    # param: chosenLocations - List of locations already chosen for key items
     # param: remainingKeyItems - List of key items remaining to be placed
     # param: gameConfig - GameConfig object used to determine logic.
     #                     In particular this contains a Game object which
     #                     determines the logic while the GameConfig itself
     #                     has rules for how the keyItem items may change over
     #                     time.
-    # TODO:  Should this passtwo parameters? Game and updateKeyItems function?
-    #        It's weird using the Game member of GameConfig.
-    #
-    # return: A tuple containing:
-    #             A Boolean indicating whether or not key item placement was
-    #             successful
     #
-    #             A list of locations with key items assigned
-    def determineKeyItemPlacement_impl(
+    # return: A list of locations with key items assigned, or None if no
+    #         assignment was found.
+    def determineKeyItemPlacement(
             self,
-            chosenLocations: list[_LocType],
             remainingKeyItems: list[ctenums.ItemID],
             gameConfig: logicfactory.GameConfig
-    ) -> typing.Tuple[bool, list[_LocType]]:
-        if len(remainingKeyItems) == 0:
-            # We've placed all key items.  This is our breakout condition
-            return True, chosenLocations
-        else:
-            # We still have key items to place.
-            availableLocations = self.getAvailableLocations(
-                gameConfig.getGame()
-            )
-            if len(availableLocations) == 0:
-                # This item configuration is not completable.
-                return False, chosenLocations
+    ) -> typing.Optional[list[_LocType]]:
+        game = gameConfig.getGame()
+        stats = self.stats
+
+        # Used locations are kept as a mask for the dead state keys.
+        locationBits = dict()
+        for locationGroup in self.locationGroups:
+            for location in locationGroup.getLocations():
+                locationBits.setdefault(location, 1 << len(locationBits))
+        usedLocations = 0
+
+        deadStates: set[tuple[int, int]] = set()
+        stack: list[_PlacementFrame] = []
+
+        while True:
+            if not remainingKeyItems:
+                # We've placed all key items.
+                return [frame.location for frame in stack]
+
+            frame = None
+            state = (game.keyItemMask, usedLocations)
+            if state in deadStates:
+                stats.dead_state_hits += 1
             else:
-                # Continue placing key items.
-                keyItemConfirmed = False
-                returnedChosenLocations = None
-
-                # Choose a random location
-                locationGroup, location = \
-                    self.getRandomLocation(availableLocations)
-                locationGroup.removeLocation(location)
-                locationGroup.decayWeight()
-                chosenLocations.append(location)
-
-                # Sometimes key item bias is removed after N checks
-                gameConfig.updateKeyItems(remainingKeyItems)
-
-                # Use the weighted key item list to get a list of key items
-                # that we can loop through and attempt to place.
-                localKeyItemList = \
-                    self.getShuffledKeyItemList(remainingKeyItems)
-                for keyItem in localKeyItemList:
-                    # Try placing this key item and then recurse
-                    location.setKeyItem(keyItem)
-                    gameConfig.getGame().addKeyItem(keyItem)
-
-                    newKeyItemList = [x for x in remainingKeyItems
-                                      if x != keyItem]
-                    # recurse and try to place the next key item.
-                    keyItemConfirmed, returnedChosenLocations = \
-                        self.determineKeyItemPlacement_impl(chosenLocations,
-                                                            newKeyItemList,
-                                                            gameConfig)
-
-                    if keyItemConfirmed:
-                        # We're unwinding the recursion here,
-                        # all key items are placed.
-                        return keyItemConfirmed, returnedChosenLocations
-                    else:
-                        gameConfig.getGame().removeKeyItem(keyItem)
-                # end keyItem loop
-
-                # If we get here, we failed to place an item.
-                # Undo location modifications
-                locationGroup.addLocation(location)
-                locationGroup.undoWeightDecay()
-                chosenLocations.remove(location)
-                location.unsetKeyItem()
-
-                return False, chosenLocations
-
-# end determineKeyItemPlacement_impl recursive function
+                availableLocations = self.getAvailableLocations(game)
+                if availableLocations:
+                    if self.max_nodes is not None and \
+                       stats.nodes >= self.max_nodes:
+                        self.__unwind(stack, game)
+                        raise LogicIterationException(
+                            f'Exceeded {self.max_nodes} search nodes.'
+                        )
+
+                    frame = self.openFrame(availableLocations,
+                                           remainingKeyItems,
+                                           gameConfig, state)
+                    stack.append(frame)
+                    usedLocations |= locationBits[frame.location]
+
+                    stats.nodes += 1
+                    stats.max_depth = max(stats.max_depth, len(stack))
+                else:
+                    # This item configuration is not completable.
+                    deadStates.add(state)
+
+            if frame is None:
+                # Move on to the next key item of the most recent location
+                # with any left.
+                while stack:
+                    frame = stack[-1]
+                    game.removeKeyItem(frame.key_items[frame.index])
+                    frame.index += 1
+                    if frame.index < len(frame.key_items):
+                        break
+
+                    self.closeFrame(frame)
+                    stack.pop()
+                    usedLocations &= ~locationBits[frame.location]
+                    deadStates.add(frame.state)
+                    stats.backtracks += 1
+                else:
+                    return None
+
+            # Try placing this key item and then go to the next node.
+            keyItem = frame.key_items[frame.index]
+            frame.location.setKeyItem(keyItem)
+            game.addKeyItem(keyItem)
+            stats.placements += 1
+
+            remainingKeyItems = [x for x in frame.remaining if x != keyItem]
+
+    #
+    # Undo every frame on the stack.
+    #
+    def __unwind(self, stack: list[_PlacementFrame], game: logictypes.Game):
+        while stack:
+            frame = stack.pop()
+            game.removeKeyItem(frame.key_items[frame.index])
+            self.closeFrame(frame)
 
 
 # These maybe should be methods of logicfactory.GameConfig?
@@ -546,12 +649,13 @@ def get_available_location_groups(
     location_groups = []
     game.updateAvailableCharacters()
 
-    for group in game_config.locationGroups:
-        if group.accessRule(game):
-            unassigned_locs = [loc for loc in group.locations
-                               if loc not in assigned_locs]
-            if unassigned_locs:
-                location_groups.append(group)
+    evaluator = game_config.getAccessEvaluator()
+    for ind in evaluator.get_satisfied(game):
+        group = game_config.locationGroups[ind]
+        unassigned_locs = [loc for loc in group.locations
+                           if loc not in assigned_locs]
+        if unassigned_locs:
+            location_groups.append(group)
 
     return location_groups
 
@@ -567,79 +671,268 @@ def get_available_locations(
 
     locations = []
     game.updateAvailableCharacters()
-    for group in game_config.locationGroups:
-        if group.accessRule(game):
-            locations.extend(
-                [loc for loc in group.locations if loc not in assigned_locs]
-            )
+
+    evaluator = game_config.getAccessEvaluator()
+    for ind in evaluator.get_satisfied(game):
+        group = game_config.locationGroups[ind]
+        locations.extend(
+            [loc for loc in group.locations if loc not in assigned_locs]
+        )
 
     return locations
 
 
-def get_collectable_key_items(
-        game_config: logicfactory.GameConfig
-) -> typing.Iterable[ctenums.ItemID]:
+class KeyItemReachability:
     '''
-    Traverse the game config to determine what can be collected.
+    Track which key items can be collected with a GameConfig's key item
+    placement as key items are placed and removed.
+
+    Groups open in spheres.  Sphere 0 groups are open from the start, and
+    sphere k+1 groups open once the key items in spheres 0 through k are
+    collected.  A change to a location in sphere k can only change the later
+    spheres, so only those are recomputed.
     '''
 
-    settings = game_config.settings
-    config = game_config.config
+    def __init__(self, game_config: logicfactory.GameConfig):
+        self.game_config = game_config
+        self.key_items = set(game_config.getKeyItemList())
+        self.evaluator = game_config.getAccessEvaluator()
+        self.groups = list(game_config.locationGroups)
+        self.game = logictypes.Game(game_config.settings, game_config.config)
+
+        self.location_groups: dict[_LocType, int] = dict()
+        for ind, group in enumerate(self.groups):
+            for location in group.locations:
+                self.location_groups.setdefault(location, ind)
+
+        # group_spheres[i] is the sphere in which group i opens (None if it
+        # never does).  sphere_groups[k] are the groups opening in sphere k
+        # and sphere_masks[k] is the key item mask during sphere k.
+        self.group_spheres: list[typing.Optional[int]] = []
+        self.sphere_groups: list[list[int]] = []
+        self.sphere_masks: list[int] = []
+        self.collected_mask = 0
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Recompute everything.  Use after changing locations directly.
+        '''
+        self.group_spheres = [None for _ in self.groups]
+        self.sphere_groups = []
+        self.sphere_masks = [0]
+        self.__propagate(range(len(self.groups)))
+
+    def __get_group_mask(self, ind: int) -> int:
+        mask = 0
+        for location in self.groups[ind].locations:
+            item = location.getKeyItem()
+            if item in self.key_items:
+                mask |= 1 << item
+        return mask
+
+    def __propagate(self, candidates: typing.Iterable[int]):
+        '''
+        Open spheres starting from the last entry of sphere_masks.  Only the
+        candidate groups can open.
+        '''
+        game = self.game
+        tracker = self.evaluator.get_tracker(candidates)
+        mask = self.sphere_masks[-1]
 
-    cur_game = logictypes.Game(settings, config)
-    cur_game.keyItems = []
-    cur_game.updateAvailableCharacters()
+        while True:
+            game.keyItemMask = mask
+            game.updateAvailableCharacters()
 
-    key_items = set(list(game_config.getKeyItemList()))
+            opened = tracker.update(game)
+            if not opened:
+                break
 
-    groups = list(game_config.locationGroups)
-    while True:
-        new_keys = []
-        exhausted_groups = []
-        for group in groups:
-            if group.accessRule(cur_game):
-                for location in group.locations:
-                    item = location.getKeyItem()
-                    if item in key_items:
-                        new_keys.append(item)
-                exhausted_groups.append(group)
+            sphere = len(self.sphere_groups)
+            self.sphere_groups.append(opened)
+            new_mask = mask
+            for ind in opened:
+                self.group_spheres[ind] = sphere
+                new_mask |= self.__get_group_mask(ind)
 
-        for group in exhausted_groups:
-            groups.remove(group)
+            if new_mask == mask:
+                break
+
+            mask = new_mask
+            self.sphere_masks.append(mask)
+
+        self.collected_mask = mask
 
-        if new_keys:
-            cur_game.keyItems.extend(new_keys)
-            cur_game.updateAvailableCharacters()
+    def __update_after(self, sphere: int, gained: bool):
+        '''
+        Recompute the spheres after the given one.  If nothing was gained,
+        only groups from those spheres can open again.
+        '''
+        next_mask = self.sphere_masks[sphere]
+        for ind in self.sphere_groups[sphere]:
+            next_mask |= self.__get_group_mask(ind)
+
+        # Nothing changes if the next sphere has the same key items.  After
+        # the last sphere, that's everything collected.
+        if sphere + 1 < len(self.sphere_masks):
+            old_next_mask = self.sphere_masks[sphere + 1]
         else:
-            break
+            old_next_mask = self.collected_mask
+
+        if next_mask == old_next_mask:
+            return
+
+        reopened = []
+        for groups in self.sphere_groups[sphere+1:]:
+            for ind in groups:
+                self.group_spheres[ind] = None
+            reopened.extend(groups)
+
+        del self.sphere_groups[sphere+1:]
+        del self.sphere_masks[sphere+1:]
+        self.sphere_masks.append(next_mask)
+
+        if gained:
+            candidates = [ind for ind, group_sphere
+                          in enumerate(self.group_spheres)
+                          if group_sphere is None]
+        else:
+            # Losing key items can only close groups.
+            candidates = reopened
+
+        self.__propagate(candidates)
+
+    def set_key_item(self, location: _LocType,
+                     item: typing.Optional[ctenums.ItemID]):
+        '''
+        Set the item at a location (unset if item is None) and update what
+        can be collected.
+        '''
+        old_item = location.getKeyItem()
+        if item is None:
+            location.unsetKeyItem()
+        else:
+            location.setKeyItem(item)
+
+        sphere = self.group_spheres[self.location_groups[location]]
+        if sphere is None:
+            return
 
-    return cur_game.keyItems
+        was_key = old_item in self.key_items
+        is_key = item in self.key_items
+        if was_key or is_key:
+            self.__update_after(sphere, is_key)
 
+    def unset_key_item(self, location: _LocType):
+        self.set_key_item(location, None)
 
-def getFiller(settings: rset.Settings) -> KeyItemFiller:
+    def get_collectable_key_items(self) -> list[ctenums.ItemID]:
+        '''The key items which can be collected, lowest ItemID first.'''
+        self.game.keyItemMask = self.collected_mask
+        return list(self.game.keyItems)
+
+    def can_collect_all(self) -> bool:
+        '''Whether every key item of the GameConfig can be collected.'''
+        return self.collected_mask == \
+            logictypes.getKeyItemMask(self.key_items)
+
+    def get_sphere(self, group: logictypes.LocationGroup) -> \
+            typing.Optional[int]:
+        '''The sphere in which group opens, or None if it never does.'''
+        return self.group_spheres[self.groups.index(group)]
+
+    def get_sphere_count(self) -> int:
+        return len(self.sphere_groups)
+
+
+def get_collectable_key_items(
+        game_config: logicfactory.GameConfig
+) -> typing.Iterable[ctenums.ItemID]:
+    '''
+    Traverse the game config to determine what can be collected.
+    '''
+    return KeyItemReachability(game_config).get_collectable_key_items()
+
+
+def getFiller(
+        settings: rset.Settings,
+        max_nodes: typing.Optional[int] = DEFAULT_MAX_NODES
+) -> KeyItemFiller:
+    '''
+    The filler for the settings.  max_nodes is the ChronosanityFiller's
+    search budget (None for no limit).
+    '''
     if rset.GameFlags.CHRONOSANITY in settings.gameflags:
-        filler = ChronosanityFiller()
+        filler = ChronosanityFiller(max_nodes=max_nodes)
     else:
         filler = RandomRejectionFiller(max_attempts=5000)
 
     return filler
 
 
-def commitKeyItems(settings: rset.Settings,
-                   config: cfg.RandoConfig):
-    '''Add Key Items to the config.'''
+@dataclass
+class KeyItemFillResult:
+    '''How commitKeyItems found its key item placement.'''
+    filler: str               # Class name of the filler which succeeded
+    fell_back: bool = False   # RandomRejectionFiller failed, Chronosanity ran
+    attempts: int = 0         # Placements tried by RandomRejectionFiller
+    restarts: int = 0         # Chronosanity searches which ran out of nodes
+    chronosanity_stats: typing.Optional[ChronosanitySearchStats] = None
+    elapsed: float = 0.0      # Seconds spent filling
+
+
+def commitKeyItems(
+        settings: rset.Settings,
+        config: cfg.RandoConfig,
+        max_nodes: typing.Optional[int] = DEFAULT_MAX_NODES,
+        max_restarts: int = DEFAULT_MAX_RESTARTS
+) -> KeyItemFillResult:
+    '''
+    Add Key Items to the config.
+
+    Chronosanity searches, including the fallback when RandomRejectionFiller
+    fails, stop after max_nodes locations (None for no limit).  A search
+    which runs out is started over at most max_restarts times before
+    KeyItemFillException is raised.
+    '''
     gameConfig = logicfactory.getGameConfig(settings, config)
-    filler = getFiller(settings)
-
-    try:
-        chosenLocations = filler.fill_key_item_locations(gameConfig)
-    except LogicIterationException:
-        # Chronosanity is guaranteed to return a valid assignment in the
-        # exceedingly rare case that another filler fails.
-        print(f'{filler.__class__.__name__} failed. '
-              'Falling back to ChronosanityFiller.')
-        filler = ChronosanityFiller()
-        chosenLocations = filler.fill_key_item_locations(gameConfig)
+    filler = getFiller(settings, max_nodes)
+    result = KeyItemFillResult(filler=filler.__class__.__name__)
+    start_time = time.perf_counter()
+
+    # A budgeted search can fail.  Chronosanity shuffles its search order, so
+    # a restart explores different placements and rarely gets stuck twice.
+    # When every restart fails too, give up so that the caller can try
+    # another seed rather than searching without a bound.
+    while True:
+        try:
+            chosenLocations = filler.fill_key_item_locations(gameConfig)
+            break
+        except LogicIterationException:
+            if isinstance(filler, RandomRejectionFiller):
+                print('RandomRejectionFiller failed. '
+                      'Falling back to ChronosanityFiller.')
+                result.attempts = filler.attempts
+                filler = ChronosanityFiller(max_nodes=max_nodes)
+                result.filler = filler.__class__.__name__
+                result.fell_back = True
+            elif result.restarts < max_restarts:
+                result.restarts += 1
+                print(f'ChronosanityFiller ran out of nodes. '
+                      f'Restarting the search ({result.restarts} of '
+                      f'{max_restarts}).')
+            else:
+                raise KeyItemFillException(
+                    f'No key item placement found in {max_restarts + 1} '
+                    f'searches of {max_nodes} nodes.  Try another seed.'
+                )
+
+    result.elapsed = time.perf_counter() - start_time
+    if isinstance(filler, RandomRejectionFiller):
+        result.attempts = filler.attempts
+    elif isinstance(filler, ChronosanityFiller):
+        result.chronosanity_stats = filler.stats
 
     for location in chosenLocations:
         location.writeKeyItem(config)
@@ -663,6 +956,8 @@ def commitKeyItems(settings: rset.Settings,
 
     config.key_item_locations = chosenLocations + additional_locs
 
+    return result
+
 
 def get_proof_string_from_settings_config(
         settings: rset.Settings,
@@ -759,7 +1054,7 @@ def get_proof_string(
 
         if new_locs or new_chars:
             new_keys = [loc.getKeyItem() for loc in new_locs]
-            cur_game.keyItems.extend(new_keys)
+            cur_game.addKeyItems(new_keys)
 
             for char in new_chars:
                 spot = inv_char_dict[char]
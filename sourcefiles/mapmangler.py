@@ -1,5 +1,6 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+import struct
 
 import byteops
 import freespace
@@ -74,6 +75,154 @@ class LocationData:
         rom[ptr_st:ptr_st+14] = self.to_bytearray()
 
 
+# Location events pointers are located on the rom starting at 0x3CF9F0.
+# Each is an absolute, 3 byte pointer.  Location records hold an index into
+# this table, and the indices do not occur in the same order as the locations.
+
+class LocationTable:
+    '''
+    Every location's LocationData along with the event script pointer table,
+    decoded in one pass.
+
+    Get the table of an FSRom with LocationTable.from_fsrom.  The FSRom keeps
+    it until a write (FSRom.write) touches either part of the rom, so patches
+    applied later are seen.  Writes made through the table keep it in sync.
+    '''
+    NUM_LOCATIONS = 0x200
+    RECORD_SIZE = 14
+
+    # music, tiles l12, tiles l3, palette, map, (ignored), event, l, t, r, b
+    _record_struct = struct.Struct('<4BH2xH4B')
+    _event_ptr_struct = struct.Struct('<HB')
+
+    def __init__(self, loc_data_st: int = 0x360000,
+                 event_ptr_st: int = 0x3CF9F0):
+        self.loc_data_st = loc_data_st
+        self.event_ptr_st = event_ptr_st
+
+        self.records: list[LocationData] = []
+
+        # Rom (not file) pointers indexed by event id.
+        self.event_ptrs: list[int] = []
+
+    @property
+    def loc_data_end(self) -> int:
+        return self.loc_data_st + self.NUM_LOCATIONS*self.RECORD_SIZE
+
+    @property
+    def event_ptr_end(self) -> int:
+        return self.event_ptr_st + 3*len(self.event_ptrs)
+
+    def __read_event_ptrs(self, rom, num_ptrs: int):
+        ptr_end = self.event_ptr_st + 3*num_ptrs
+        self.event_ptrs = [
+            low | (high << 16)
+            for low, high in self._event_ptr_struct.iter_unpack(
+                rom[self.event_ptr_st:ptr_end]
+            )
+        ]
+
+    @classmethod
+    def from_rom(cls, rom, loc_data_st: int = 0x360000,
+                 event_ptr_st: int = 0x3CF9F0) -> LocationTable:
+        ret = cls(loc_data_st, event_ptr_st)
+        ret.records = [
+            LocationData(*fields)
+            for fields in cls._record_struct.iter_unpack(
+                rom[ret.loc_data_st:ret.loc_data_end]
+            )
+        ]
+
+        num_events = max(record.event_id for record in ret.records) + 1
+        ret.__read_event_ptrs(rom, num_events)
+
+        return ret
+
+    @classmethod
+    def from_fsrom(cls, fsrom: freespace.FSRom,
+                   loc_data_st: int = 0x360000,
+                   event_ptr_st: int = 0x3CF9F0) -> LocationTable:
+        '''
+        The table of fsrom.  It is decoded only if fsrom has no up to date
+        table already.
+        '''
+        table = fsrom.location_table
+        if table is None or table.loc_data_st != loc_data_st or \
+           table.event_ptr_st != event_ptr_st:
+            table = cls.from_rom(fsrom.getview(), loc_data_st,
+                                 event_ptr_st)
+            fsrom.location_table = table
+
+        return table
+
+    @classmethod
+    def read_event_ptr(cls, rom, loc_id: int,
+                       loc_data_st: int = 0x360000,
+                       event_ptr_st: int = 0x3CF9F0) -> int:
+        '''
+        Read a single location's event pointer (a file pointer) from rom
+        without decoding the whole table.
+        '''
+        event_ind_st = loc_data_st + cls.RECORD_SIZE*loc_id + 8
+        event_id = int.from_bytes(rom[event_ind_st:event_ind_st+2], 'little')
+
+        ptr_st = event_ptr_st + 3*event_id
+        return byteops.to_file_ptr(
+            int.from_bytes(rom[ptr_st:ptr_st+3], 'little')
+        )
+
+    def overlaps(self, start: int, end: int) -> bool:
+        '''Whether [start, end) touches the rom this table was read from.'''
+        return (
+            (start < self.loc_data_end and end > self.loc_data_st) or
+            (start < self.event_ptr_end and end > self.event_ptr_st)
+        )
+
+    def __write(self, fsrom: freespace.FSRom, addr: int, payload: bytes):
+        fsrom.seek(addr)
+        fsrom.write(payload)
+
+        # The write dropped this table from fsrom, but the caller has already
+        # updated the table to match.
+        fsrom.location_table = self
+
+    def get_event_id(self, loc_id: int) -> int:
+        return self.records[loc_id].event_id
+
+    def get_event_ptr(self, loc_id: int) -> int:
+        '''The file pointer to loc_id's compressed event script.'''
+        return byteops.to_file_ptr(
+            self.event_ptrs[self.records[loc_id].event_id]
+        )
+
+    def set_event_ptr(self, fsrom: freespace.FSRom, loc_id: int,
+                      file_ptr: int):
+        '''
+        Point loc_id's event script at file_ptr.  Other locations with the
+        same event id are changed as well.
+        '''
+        event_id = self.records[loc_id].event_id
+        rom_ptr = byteops.to_rom_ptr(file_ptr)
+
+        self.event_ptrs[event_id] = rom_ptr
+        self.__write(fsrom, self.event_ptr_st + 3*event_id,
+                     byteops.to_little_endian(rom_ptr, 3))
+
+    def get_location_data(self, loc_id: int) -> LocationData:
+        return replace(self.records[loc_id])
+
+    def set_location_data(self, fsrom: freespace.FSRom, loc_id: int,
+                          loc_data: LocationData):
+        self.records[loc_id] = replace(loc_data)
+
+        # Keep every pointer that a location's event id can reach.
+        if loc_data.event_id >= len(self.event_ptrs):
+            self.__read_event_ptrs(fsrom.getview(), loc_data.event_id+1)
+
+        self.__write(fsrom, self.loc_data_st + self.RECORD_SIZE*loc_id,
+                     loc_data.to_bytearray())
+
+
 # Location Exit	00	FF	1	X coord	2004.04.21
 # Location Exit	01	FF	1	Y coord	2004.04.21
 # Location Exit	02	7F	1	Width - 1	2004.04.22
@@ -203,7 +352,7 @@ class LocExits:
     def from_rom(fsrom: freespace.FSRom) -> LocExits:
         # get the ptr from the rom
 
-        rom = fsrom.getbuffer()
+        rom = fsrom.getview()
 
         ptr_loc = 0x00A69E
         exit_ptr_st = byteops.get_value_from_bytes(rom[ptr_loc:ptr_loc+3])
@@ -238,7 +387,7 @@ class LocExits:
 
     def write_to_fsrom(self, fsrom: freespace.FSRom):
 
-        rom = fsrom.getbuffer()
+        rom = fsrom.getview()
         space_man = fsrom.space_manager
 
         # Get the existing data's bounds
@@ -354,12 +503,13 @@ class LocExits:
 
         # update ptrs wants both ptrs to be file ptrs.  It converts to
         # rom ptrs when writing
-        byteops.update_ptrs(fsrom.getbuffer(),
+        byteops.update_ptrs(fsrom.get_journaled_buffer(),
                             ptr_refs, exit_ptr_st, out_ptr_st)
 
         # All of the data pointers are based off of the bank.
         new_bank = (out_data_st >> 16) << 16
-        byteops.update_ptrs(fsrom.getbuffer(), data_refs, bank, new_bank)
+        byteops.update_ptrs(fsrom.get_journaled_buffer(), data_refs,
+                            bank, new_bank)
 # End class LocExits
 
 
@@ -398,10 +548,11 @@ def duplicate_heckran_map(fsrom: freespace.FSRom,
 def duplicate_location_data(fsrom: freespace.FSRom, loc_id, dup_loc_id):
     # I think all you have to do is change the LocationData and update the
     # exits?
-    orig_data = LocationData.from_rom(fsrom.getbuffer(), loc_id)
-    dup_data = LocationData.from_rom(fsrom.getbuffer(), dup_loc_id)
+    loc_table = LocationTable.from_fsrom(fsrom)
+    orig_data = loc_table.get_location_data(loc_id)
+    dup_data = loc_table.get_location_data(dup_loc_id)
     orig_data.event_id = dup_data.event_id
-    orig_data.write_to_rom(fsrom.getbuffer(), dup_loc_id)
+    loc_table.set_location_data(fsrom, dup_loc_id, orig_data)
 
 
 def main():
@@ -0,0 +1,175 @@
+'''
+Cache of the base rom after the patches which every jets rom receives.
+
+Applying patch.ips and the always-on .txt patches goes through
+FSRom.patch_ips/patch_txt a record at a time, and it used to happen at least
+twice per seed.  The patched image and its free space markers only depend on
+the base rom and the patch files, so they are computed once and kept both in
+memory and on disk (in ./pickles/cache/).  The same goes for the index of
+which locations use each script and string block (see scriptowners), which
+needs every script in the rom to be read.  The cache key is a hash of the
+base rom together with patch.ips and every file in ./patches/, so editing
+any patch invalidates the cache without any manual re-dumping.  The hashes
+are remembered per process, so a worker only rehashes when it is given a
+different rom or a patch file's size or modification time changes.
+'''
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Callable, Optional
+
+import ctrom
+import diskcache
+import scriptowners
+
+# Version of the on-disk format.  Bump when the pickled dict changes.
+_CACHE_VERSION = 2
+
+# digest --> (patched rom bytes, free space markers, first_free, owner index)
+_memory_cache: dict[
+    str,
+    tuple[bytes, list[int], bool, scriptowners.ScriptOwnerIndex]
+] = dict()
+
+# (size and mtime of every patch file, their digest)
+_patch_digest: Optional[tuple[tuple, str]] = None
+
+# (base rom, patch digest, cache key) of the last get_cache_key call
+_last_key: Optional[tuple[bytes, str, str]] = None
+
+
+def get_patch_files() -> list[str]:
+    '''Return the paths of all patch files which the cache depends on.'''
+    patch_files = ['./patch.ips']
+
+    patch_dir = './patches'
+    patch_files.extend(
+        os.path.join(patch_dir, name)
+        for name in sorted(os.listdir(patch_dir))
+    )
+
+    return patch_files
+
+
+def _get_patch_stamp(patch_files: list[str]) -> tuple:
+    stamp = []
+    for filename in patch_files:
+        stat = os.stat(filename)
+        stamp.append((filename, stat.st_size, stat.st_mtime_ns))
+
+    return tuple(stamp)
+
+
+def get_patch_digest() -> str:
+    '''
+    Hash the contents of every patch file.  The files are only read again
+    when one is added, removed or has its size or mtime change.
+    '''
+    global _patch_digest
+
+    patch_files = get_patch_files()
+    stamp = _get_patch_stamp(patch_files)
+    if _patch_digest is not None and _patch_digest[0] == stamp:
+        return _patch_digest[1]
+
+    hasher = hashlib.sha256()
+
+    for filename in patch_files:
+        hasher.update(os.path.basename(filename).encode('utf-8'))
+        with open(filename, 'rb') as infile:
+            hasher.update(infile.read())
+
+    _patch_digest = (stamp, hasher.hexdigest())
+    return _patch_digest[1]
+
+
+def get_cache_key(base_rom: bytes) -> str:
+    '''The cache key for a base rom with the current patch files.'''
+    global _last_key
+
+    patch_digest = get_patch_digest()
+
+    # The randomizer passes the same rom object for every seed.  Comparing
+    # the bytes is still far cheaper than hashing them again.
+    if _last_key is not None:
+        last_rom, last_digest, key = _last_key
+        if last_digest == patch_digest and \
+           (last_rom is base_rom or last_rom == base_rom):
+            return key
+
+    hasher = hashlib.sha256()
+    hasher.update(_CACHE_VERSION.to_bytes(2, 'little'))
+    hasher.update(base_rom)
+    hasher.update(patch_digest.encode('ascii'))
+
+    key = hasher.hexdigest()
+    _last_key = (bytes(base_rom), patch_digest, key)
+
+    return key
+
+
+def _read_disk_cache(key: str):
+    entry = diskcache.read_entry('patched_base', key, _CACHE_VERSION)
+    if entry is None:
+        return None
+
+    return (entry['rom'], entry['markers'], entry['first_free'],
+            entry['owner_index'])
+
+
+def _write_disk_cache(key: str, rom: bytes,
+                      markers: list[int], first_free: bool,
+                      owner_index: scriptowners.ScriptOwnerIndex):
+    diskcache.write_entry('patched_base', key, _CACHE_VERSION,
+                          rom=rom, markers=markers, first_free=first_free,
+                          owner_index=owner_index)
+
+
+def get_patched_ctrom(base_rom: bytes,
+                      apply_patches: Callable[[ctrom.CTRom], None],
+                      use_disk: bool = True) -> ctrom.CTRom:
+    '''
+    Return a CTRom equal to CTRom(base_rom) after apply_patches has been
+    called on it.  The patched image is built at most once per process (and
+    at most once per patch change when use_disk is set).
+
+    The returned CTRom shares the cached image copy-on-write, so it is safe
+    to write to it.
+    '''
+    key = get_cache_key(base_rom)
+
+    entry = _memory_cache.get(key, None)
+
+    if entry is None and use_disk:
+        entry = _read_disk_cache(key)
+
+    if entry is None:
+        ct_rom = ctrom.CTRom(base_rom, ignore_checksum=True)
+        apply_patches(ct_rom)
+
+        space_man = ct_rom.rom_data.space_manager
+        rom = ct_rom.rom_data.getvalue()
+        entry = (rom, space_man.markers[:], space_man.first_free,
+                 scriptowners.ScriptOwnerIndex.from_rom(rom))
+
+        if use_disk:
+            _write_disk_cache(key, *entry)
+
+    _memory_cache[key] = entry
+
+    rom, markers, first_free, owner_index = entry
+    ret_rom = ctrom.CTRom(rom, ignore_checksum=True)
+    ret_rom.rom_data.space_manager.markers = markers[:]
+    ret_rom.rom_data.space_manager.first_free = first_free
+    ret_rom.script_manager.owner_index = owner_index.copy()
+
+    return ret_rom
+
+
+def clear_memory_cache():
+    global _patch_digest, _last_key
+
+    _memory_cache.clear()
+    _patch_digest = None
+    _last_key = None
@@ -0,0 +1,253 @@
+'''
+Non-interactive command line for generating one or many seeds.
+
+Examples:
+    python randocli.py ct.sfc --flags st.n.gzpte --seed MySeed
+    python randocli.py ct.sfc --preset race --count 500 --jobs 8 \
+        --out-dir ./pool --patch bps --spoilers --manifest ./pool/seeds.jsonl
+    python randocli.py ct.sfc --settings settings.json \
+        --seed-prefix race --seed-range 1 100
+
+The settings come from a flag string (see Settings.get_flag_string), a json
+file in the form of the settings section of the json spoiler log, or a
+named preset.
+'''
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import os
+import random
+import sys
+from typing import Optional
+
+import batchgen
+from ctrom import CTRom
+import logicwriters
+import randomizer
+import randosettings as rset
+
+
+_presets = {
+    'race': rset.Settings.get_race_presets,
+    'new_player': rset.Settings.get_new_player_presets,
+    'lost_worlds': rset.Settings.get_lost_worlds_presets,
+    'hard': rset.Settings.get_hard_presets,
+    'tourney_early': rset.Settings.get_tourney_early_preset,
+    'tourney_top8': rset.Settings.get_tourney_top8_preset
+}
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Generate Jets of Time seeds without any prompts.'
+    )
+    parser.add_argument('rom', help='vanilla (unheadered) Chrono Trigger rom')
+
+    settings_group = parser.add_mutually_exclusive_group(required=True)
+    settings_group.add_argument(
+        '--flags', help='flag string, e.g. st.n.gzpte'
+    )
+    settings_group.add_argument(
+        '--settings', metavar='JSON_FILE',
+        help='json settings file (the "settings" object of a json spoiler '
+        'log also works)'
+    )
+    settings_group.add_argument(
+        '--preset', choices=sorted(_presets.keys()),
+        help='named settings preset'
+    )
+
+    seed_group = parser.add_argument_group(
+        'seeds',
+        'Seeds from all options are combined.  With none, the settings '
+        'file\'s seed or else one random seed is used.'
+    )
+    seed_group.add_argument(
+        '--seed', action='append', default=[], metavar='SEED',
+        help='seed to generate (repeatable)'
+    )
+    seed_group.add_argument(
+        '--seed-file', metavar='FILE',
+        help='file with one seed per line'
+    )
+    seed_group.add_argument(
+        '--seed-range', nargs=2, type=int, metavar=('FIRST', 'LAST'),
+        help='generate the seeds FIRST to LAST inclusive'
+    )
+    seed_group.add_argument(
+        '--seed-prefix', default='',
+        help='prefix for the seeds from --seed-range'
+    )
+    seed_group.add_argument(
+        '--count', type=int, default=0,
+        help='number of additional random seeds'
+    )
+
+    parser.add_argument(
+        '--out-dir', '-o',
+        help='output directory (default: the rom\'s directory)'
+    )
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=1,
+        help='number of worker processes (0 for one per cpu)'
+    )
+    parser.add_argument(
+        '--patch', choices=('ips', 'bps'),
+        help='write a patch against the input rom instead of the full rom'
+    )
+    parser.add_argument(
+        '--spoilers', action='store_true',
+        help='also write text and json spoiler logs'
+    )
+    parser.add_argument(
+        '--manifest', metavar='FILE',
+        help='append one json line per generated seed to FILE'
+    )
+    parser.add_argument(
+        '--allow-nonvanilla', action='store_true',
+        help='do not stop if the rom is not a vanilla CT rom'
+    )
+    parser.add_argument(
+        '--max-nodes', type=int, default=logicwriters.DEFAULT_MAX_NODES,
+        help='locations a Chronosanity key item search may try before it '
+        'starts over (0 for no limit)'
+    )
+    parser.add_argument(
+        '--max-restarts', type=int,
+        default=logicwriters.DEFAULT_MAX_RESTARTS,
+        help='Chronosanity searches to start over before the seed fails'
+    )
+
+    return parser
+
+
+def get_settings_from_args(args: argparse.Namespace) -> rset.Settings:
+    if args.flags is not None:
+        return rset.Settings.from_flag_string(args.flags)
+    elif args.preset is not None:
+        return _presets[args.preset]()
+
+    with open(args.settings, 'r') as infile:
+        json_dict = json.load(infile)
+
+    # Accept a whole json spoiler log as well as its settings object.
+    if 'settings' in json_dict:
+        json_dict = json_dict['settings']
+
+    return rset.Settings.from_jot_json(json_dict)
+
+
+def get_seeds_from_args(args: argparse.Namespace,
+                        default_seed: str = '') -> list[str]:
+    '''
+    Collect the seeds given on the command line.  If there are none, use
+    default_seed (e.g. from a settings file) or else one random seed.
+    '''
+    seeds = list(args.seed)
+
+    if args.seed_file is not None:
+        with open(args.seed_file, 'r') as infile:
+            seeds.extend(line.strip() for line in infile if line.strip())
+
+    if args.seed_range is not None:
+        first, last = args.seed_range
+        seeds.extend(f'{args.seed_prefix}{i}' for i in range(first, last+1))
+
+    num_random = args.count
+    if not seeds and num_random == 0:
+        if default_seed:
+            return [default_seed]
+        num_random = 1
+
+    if num_random > 0:
+        # Same style of seed as the interactive command line, but from a
+        # private generator since generation reseeds the global one.
+        names = randomizer.read_names()
+        seed_rng = random.Random()
+        used_seeds = set(seeds)
+        while num_random > 0:
+            seed = ''.join(seed_rng.choice(names) for i in range(2))
+            if seed not in used_seeds:
+                used_seeds.add(seed)
+                seeds.append(seed)
+                num_random -= 1
+
+    return seeds
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = get_arg_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        settings = get_settings_from_args(args)
+    except (OSError, ValueError, KeyError) as err:
+        parser.error(f'Unable to read settings: {err}')
+
+    try:
+        seeds = get_seeds_from_args(args, settings.seed)
+    except OSError as err:
+        parser.error(f'Unable to read seeds: {err}')
+
+    if args.jobs < 0:
+        parser.error('--jobs must not be negative')
+
+    if args.max_nodes < 0 or args.max_restarts < 0:
+        parser.error('--max-nodes and --max-restarts must not be negative')
+
+    try:
+        with open(args.rom, 'rb') as infile:
+            rom = infile.read()
+    except OSError as err:
+        parser.error(f'Unable to read rom: {err}')
+
+    if not args.allow_nonvanilla and not CTRom.validate_ct_rom_bytes(rom):
+        parser.error(
+            'The rom is not a vanilla CT rom.  Use --allow-nonvanilla to '
+            'proceed anyway.'
+        )
+
+    out_dir = args.out_dir
+    if out_dir is None:
+        out_dir = os.path.dirname(os.path.abspath(args.rom))
+
+    max_workers = None if args.jobs == 0 else args.jobs
+    jobs = [batchgen.SeedJob(settings, seed) for seed in seeds]
+
+    manifest = None
+    if args.manifest is not None:
+        try:
+            manifest = open(args.manifest, 'a')
+        except OSError as err:
+            parser.error(f'Unable to open manifest: {err}')
+
+    num_failed = 0
+    try:
+        for result in batchgen.generate_seeds(
+                rom, jobs, out_dir, args.rom, max_workers,
+                args.patch, args.spoilers,
+                args.max_nodes or None, args.max_restarts
+        ):
+            if result.success:
+                print(f'generated: {result.out_path} '
+                      f'({result.timings["total"]:.1f}s)')
+            else:
+                num_failed += 1
+                print(f'failed: seed {result.seed}\n{result.error}',
+                      file=sys.stderr)
+
+            if manifest is not None:
+                manifest.write(json.dumps(dataclasses.asdict(result)) + '\n')
+                manifest.flush()
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+    print(f'{len(jobs) - num_failed} of {len(jobs)} seeds generated.')
+    return 1 if num_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
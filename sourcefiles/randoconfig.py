@@ -56,7 +56,7 @@ class PlayerChar:
                              stat_growth_start: int = 0x0C25FA,
                              tp_thresh_start: int = 0x0C26FA):
         # TODO: Try to read these x_start pointers from the rom
-        self.stats.write_to_rom(ct_rom.rom_data.getbuffer(),
+        self.stats.write_to_rom(ct_rom.rom_data.get_journaled_buffer(),
                                 self.pc_id,
                                 stat_start,
                                 hp_growth_start,
@@ -166,7 +166,7 @@ class ShopManager:
         # assume that the space currently allotted is enough.
 
         shop_data_bank, shop_ptr_start = \
-            ShopManager.__get_shop_pointers(ct_rom.rom_data.getbuffer())
+            ShopManager.__get_shop_pointers(ct_rom.rom_data.getview())
 
         rom = ct_rom.rom_data
 
@@ -1237,16 +1237,9 @@ class RandoConfig:
             cls,
             rom: bytearray,
             settings: rset.Settings = rset.Settings.get_race_presets()):
-        ret_cfg = RandoConfig(rom, settings)
-
-        ret_cfg.enemy_dict = enemystats.get_stat_dict(rom)
-        ret_cfg.shop_manager = ShopManager(rom)
-        ret_cfg.itemdb = itemdata.ItemDB.from_rom(rom)
-        ret_cfg.char_manager = CharManager(rom)
-        ret_cfg.techdb = techdb.TechDB.get_default_db(rom)
-        ret_cfg.enemy_aidb = enemyai.EnemyAIDB.from_rom(rom)
-        ret_cfg.enemy_atkdb = enemytechdb.EnemyAttackDB.from_rom(rom)
-        return ret_cfg
+        # RandoConfig.__init__ already reads every rom-based member when
+        # it is given a rom.
+        return RandoConfig(rom, settings)
 
 
 def main():
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import os
-import pickle
 import sys
 import json
+from typing import Optional
 
 import itemrando
 import treasurewriter
@@ -12,6 +12,7 @@ import logicwriters as logicwriter
 import random as rand
 import bossrandoevent as bossrando
 import bossscaler
+import configcache
 import tabchange as tabwriter
 import fastmagic
 import fastpendant
@@ -27,6 +28,8 @@ import mystery
 import vanillarando
 import epochfail
 import flashreduce
+import patchcache
+import romdiff
 import seedhash
 
 import byteops
@@ -55,7 +58,12 @@ class Randomizer:
 
     def __init__(self, rom: bytearray, is_vanilla: bool = True,
                  settings: rset.Settings = None,
-                 config: cfg.RandoConfig = None):
+                 config: cfg.RandoConfig = None,
+                 reuse_out_rom: bool = False,
+                 chronosanity_max_nodes: Optional[int] =
+                 logicwriter.DEFAULT_MAX_NODES,
+                 chronosanity_max_restarts: int =
+                 logicwriter.DEFAULT_MAX_RESTARTS):
 
         # We want to keep a copy of the base rom around so that we can
         # generate many seeds from it.
@@ -63,6 +71,21 @@ class Randomizer:
         self.out_rom = None
         self.has_generated = False
 
+        # With reuse_out_rom, out_rom is kept between seeds and rolled back
+        # to the patched base rom (see CTRom.rollback) instead of being
+        # copied from it again.  The rom returned by get_generated_rom must
+        # be dropped before the next seed, or the rollback has to copy it.
+        self.reuse_out_rom = reuse_out_rom
+
+        # Where the patched base rom differs from the base rom, once a
+        # reused out rom exists.  See get_changed_extents.
+        self._base_patch_extents: Optional[list[tuple[int, int]]] = None
+
+        # The budget of the Chronosanity key item search.  See
+        # logicwriter.commitKeyItems.
+        self.chronosanity_max_nodes = chronosanity_max_nodes
+        self.chronosanity_max_restarts = chronosanity_max_restarts
+
         self.settings = settings
         self.config = config
 
@@ -93,9 +116,9 @@ class Randomizer:
         self.config = config
         # TODO: Are there any sanity checks to apply to the config?
 
-    # Given the settings passed to the randomizer, give the randomizer a
-    # random RandoConfig object.
-    def set_random_config(self):
+    # The part of set_random_config up to and including the key item
+    # placement.  logicbench runs only this to test the logic.
+    def set_key_item_config(self) -> logicwriter.KeyItemFillResult:
         if self.settings is None:
             raise NoSettingsException
 
@@ -106,24 +129,15 @@ class Randomizer:
 
         # Some of the config defaults (prices, techdb, enemy stats) are
         # read from the rom.  This routine partially patches a copy of the
-        # base rom, gets the data, and builds the base config.
+        # base rom, gets the data, and builds the base config.  The rom
+        # reads are snapshotted by configcache, which rebuilds them when
+        # the rom, patches or code change.
+        # getvalue() shares the base rom's bytes rather than copying them.
         self.config = Randomizer.get_base_config_from_settings(
-            bytearray(self.base_ctrom.rom_data.getvalue()),
+            self.base_ctrom.rom_data.getvalue(),
             self.settings
         )
 
-        # An alternate approach is to build the base config with the pickles
-        # provided.  You just have to make sure to redump any time time that
-        # patch.ips or hard.ips change.  Below is how you would use pickles.
-        '''
-        with open('./pickles/default_randoconfig.pickle', 'rb') as infile:
-            self.config = pickle.load(infile)
-
-        if self.settings.enemy_difficulty == rset.Difficulty.HARD:
-            with open('./pickles/enemy_dict_hard.pickle', 'rb') as infile:
-                self.config.enemy_dict = pickle.load(infile)
-        '''
-
         # Character config.  Includes tech randomization and who can equip
         # which items.
         charrando.write_config(self.settings, self.config)
@@ -143,7 +157,14 @@ class Randomizer:
         # Key item config.  Important that this goes after treasures because
         # otherwise the treasurewriter can overwrite key items placed by
         # Chronosanity
-        logicwriter.commitKeyItems(self.settings, self.config)
+        return logicwriter.commitKeyItems(self.settings, self.config,
+                                          self.chronosanity_max_nodes,
+                                          self.chronosanity_max_restarts)
+
+    # Given the settings passed to the randomizer, give the randomizer a
+    # random RandoConfig object.
+    def set_random_config(self):
+        self.set_key_item_config()
 
         # Now go write LW extra items if need be
         treasurewriter.add_lw_key_item_gear(self.settings, self.config)
@@ -204,7 +225,7 @@ class Randomizer:
             raise NoConfigException
 
         config = self.get_base_config_from_settings(
-            self.base_ctrom.rom_data.getbuffer(),
+            self.base_ctrom.rom_data.getvalue(),
             self.settings
         )
 
@@ -779,11 +800,25 @@ class Randomizer:
 
     def __write_out_rom(self):
         '''Given config and settings, write to self.out_rom'''
-        self.out_rom = CTRom(self.base_ctrom.rom_data.getvalue(), True)
+        # The out rom shares the cached patched image until the first write,
+        # so the patched rom is copied exactly once per seed.  A reused out
+        # rom only restores the parts the last seed wrote.
+        if self.reuse_out_rom and self.out_rom is not None and \
+           self.out_rom.is_journaled():
+            self.out_rom.rollback()
+        else:
+            self.out_rom = self.get_patched_base_ctrom(
+                self.base_ctrom.rom_data.getvalue()
+            )
+            if self.reuse_out_rom:
+                self.out_rom.start_journal()
+                with self.base_ctrom.rom_data.getview() as base_rom, \
+                     self.out_rom.rom_data.getview() as patched_rom:
+                    self._base_patch_extents = \
+                        romdiff.get_changed_blocks(base_rom, patched_rom)
 
         # TODO:  Consider working some of the always-applied script changes
         #        Into patch.ips to improve generation speed.
-        self.__apply_basic_patches(self.out_rom, self.settings)
 
         self.__apply_settings_patches(self.out_rom, self.settings)
 
@@ -980,6 +1015,21 @@ class Randomizer:
 
         return self.out_rom.rom_data.getvalue()
 
+    def get_changed_extents(self) -> Optional[list[tuple[int, int]]]:
+        '''
+        Sorted [start, end) ranges of the generated rom which may differ
+        from the base rom, or None if they are not known (reuse_out_rom is
+        not set).  Pass them to romdiff to only diff those parts.
+        '''
+        if not self.has_generated or not self.out_rom.is_journaled() or \
+           self._base_patch_extents is None:
+            return None
+
+        return romdiff.merge_extents(
+            self._base_patch_extents +
+            self.out_rom.rom_data.get_dirty_extents()
+        )
+
     def write_spoiler_log(self, outfile):
         if isinstance(outfile, str):
             with open(outfile, 'w') as real_outfile:
@@ -1383,6 +1433,16 @@ class Randomizer:
         # Add qwertymodo's MSU-1 patch
         # rom_data.patch_ips_file('./patches/chrono_msu1.ips')
 
+    @classmethod
+    def get_patched_base_ctrom(cls, base_rom: bytes) -> CTRom:
+        '''
+        Returns a CTRom of base_rom with the basic patches applied.  The
+        patched image is cached (see patchcache) so the patches are only
+        applied again when base_rom or a patch file changes.
+        '''
+        return patchcache.get_patched_ctrom(base_rom,
+                                            cls.__apply_basic_patches)
+
     @classmethod
     def __apply_settings_patches(cls, ctrom: CTRom,
                                  settings: rset.Settings):
@@ -1473,21 +1533,37 @@ class Randomizer:
         settings.ctoptions.write_to_ctrom(ctrom)
 
     @classmethod
-    def dump_default_config(cls, ct_vanilla: bytearray):
-        '''Turn vanilla ct rom into default objects for a config.
-        Should run whenever a big patch (patch.ips, hard.ips) changes.'''
-        ctrom = CTRom(ct_vanilla, ignore_checksum=False)
-        cls.__apply_basic_patches(ctrom)
+    def __read_jets_config(cls, ct_vanilla: bytes,
+                           enemy_hard: bool,
+                           item_hard: bool) -> cfg.RandoConfig:
+        '''Read the unmodified jets config from the patched rom.'''
+        ctrom = cls.get_patched_base_ctrom(ct_vanilla)
+
+        # The config objects keep mutable slices of the rom, so they need a
+        # bytearray.
+        config = cfg.RandoConfig.get_config_from_rom(
+            bytearray(ctrom.rom_data.getvalue())
+        )
+
+        # Get hard versions of config items if needed.
+        if enemy_hard or item_hard:
+            ctrom.rom_data.patch_ips_file('./patches/hard.ips')
+
+        if enemy_hard:
+            config.enemy_dict = cfg.enemystats.get_stat_dict(
+                ctrom.rom_data.getvalue()
+            )
 
-        RC = cfg.RandoConfig
-        config = RC.get_config_from_rom(ctrom.rom_data.getbuffer())
+        if item_hard:
+            config.itemdb = cfg.itemdata.ItemDB.from_rom(
+                ctrom.rom_data.getvalue()
+            )
 
-        with open('./pickles/default_randoconfig.pickle', 'wb') as outfile:
-            pickle.dump(config, outfile)
+        return config
 
     @classmethod
     def get_base_config_from_settings(cls,
-                                      ct_vanilla: bytearray,
+                                      ct_vanilla: bytes,
                                       settings: rset.Settings):
         '''Gets an rset.RandoConfig object with the correct initial values.
 
@@ -1505,39 +1581,29 @@ class Randomizer:
           - enemy_aidb: Various enemy attack scripts are changed by patch.ips.
         '''
 
-        # It's a little wasteful copying the rom data to partially patch it
-        # to extract the base values for the above.
-
-        # I do have a pickle with a default config and normal/hard enemy dicts
-        # which can be used instead if this is an issue.  The problem with
-        # using those is the need to update them with every patch.
-        ctrom = CTRom(ct_vanilla, True)
-        Randomizer.__apply_basic_patches(ctrom)
-
+        # The values read from the rom only depend on ct_vanilla, the
+        # patches, the mode and the difficulty.  They are read once and
+        # then copied out of configcache's snapshot for each seed.  Only the
+        # settings-dependent edits below are redone per seed.
         if settings.game_mode == rset.GameMode.VANILLA_RANDO:
-            config = cfg.RandoConfig.get_config_from_rom(
-                ct_vanilla, settings)
+            config = configcache.get_config_snapshot(
+                ct_vanilla, 'vanilla',
+                lambda: cfg.RandoConfig.get_config_from_rom(
+                    bytearray(ct_vanilla), settings)
+            )
             vanillarando.fix_config(config)
 
         else:
-            config = cfg.RandoConfig.get_config_from_rom(
-                bytearray(ctrom.rom_data.getvalue())
+            enemy_hard = settings.enemy_difficulty == rset.Difficulty.HARD
+            item_hard = settings.item_difficulty == rset.Difficulty.HARD
+
+            config = configcache.get_config_snapshot(
+                ct_vanilla,
+                f'jets_enemy_hard={enemy_hard}_item_hard={item_hard}',
+                lambda: cls.__read_jets_config(ct_vanilla,
+                                               enemy_hard, item_hard)
             )
 
-            # Get hard versions of config items if needed.
-            # We're done with the rom at this point, so it's OK to patch
-            # regardless.
-            ctrom.rom_data.patch_ips_file('./patches/hard.ips')
-            if settings.enemy_difficulty == rset.Difficulty.HARD:
-                config.enemy_dict = cfg.enemystats.get_stat_dict(
-                    ctrom.rom_data.getvalue()
-                )
-
-            if settings.item_difficulty == rset.Difficulty.HARD:
-                config.itemdb = cfg.itemdata.ItemDB.from_rom(
-                    ctrom.rom_data.getvalue()
-                )
-
             # Why is Dalton worth so few TP?
             config.enemy_dict[ctenums.EnemyID.DALTON_PLUS].tp = 50
 
@@ -1966,12 +2032,17 @@ def get_settings_from_command_line() -> rset.Settings:
 
 
 def main():
-    if len(sys.argv) > 1 and sys.argv[1] == "-c":
+    if len(sys.argv) == 2 and sys.argv[1] == "-c":
         generate_from_command_line()
+    elif len(sys.argv) > 1:
+        # Anything else goes to the non-interactive command line.
+        import randocli
+        sys.exit(randocli.main(sys.argv[1:]))
     else:
         print("Please run randomizergui.py for a graphical interface. \n"
               "Either randomizer.py or randomizergui.py can be run with the "
-              "-c option to use\nthe command line.")
+              "-c option to use\nthe command line.  For scripted or bulk "
+              "generation, see\n'randocli.py --help'.")
 
 
 if __name__ == "__main__":
@@ -154,6 +154,53 @@ def get_forced_on(flag: GameFlags) -> GameFlags:
     return _forced_on_dict.get(flag, GameFlags(0))
 
 
+# Symbols used by Settings.get_flag_string.  The order of _flag_str_dict is
+# the order the symbols appear in the flag string.
+_diff_str_dict = {
+    Difficulty.EASY: 'e',
+    Difficulty.NORMAL: 'n',
+    Difficulty.HARD: 'h',
+}
+
+_tech_str_dict = {
+    TechOrder.FULL_RANDOM: 'te',
+    TechOrder.BALANCED_RANDOM: 'tex',
+    TechOrder.NORMAL: ''
+}
+
+_game_mode_str_dict = {
+    GameMode.STANDARD: 'st',
+    GameMode.LOST_WORLDS: 'lw',
+    GameMode.ICE_AGE: 'ia',
+    GameMode.LEGACY_OF_CYRUS: 'loc',
+    GameMode.VANILLA_RANDO: 'van'
+}
+
+_flag_str_dict = {
+    GameFlags.FIX_GLITCH: 'g',
+    GameFlags.BOSS_SCALE: 'b',
+    GameFlags.BOSS_RANDO: 'ro',
+    GameFlags.ZEAL_END: 'z',
+    GameFlags.FAST_PENDANT: 'p',
+    GameFlags.LOCKED_CHARS: 'c',
+    GameFlags.UNLOCKED_MAGIC: 'm',
+    GameFlags.CHRONOSANITY: 'cr',
+    GameFlags.TAB_TREASURES: 'tb',
+    GameFlags.DUPLICATE_CHARS: 'dc',
+    GameFlags.HEALING_ITEM_RANDO: 'h',  # h for Healing
+    GameFlags.GEAR_RANDO: 'q',  # q for eQuipment (g taken)
+    GameFlags.EPOCH_FAIL: 'ef',  # ef for Epoch Fail
+    GameFlags.BUCKET_FRAGMENTS: 'k'  # k for bucKet
+}
+
+_shop_str_dict = {
+    ShopPrices.FREE: 'spf',
+    ShopPrices.MOSTLY_RANDOM: 'spm',
+    ShopPrices.FULLY_RANDOM: 'spr',
+    ShopPrices.NORMAL: ''
+}
+
+
 class CosmeticFlags(Flag):
     ZENAN_ALT_MUSIC = auto()
     DEATH_PEAK_ALT_MUSIC = auto()
@@ -401,51 +448,6 @@ class Settings:
 
     def get_flag_string(self):
         # Flag string is based only on main game flags and game mode
-
-        diff_str_dict = {
-            Difficulty.EASY: 'e',
-            Difficulty.NORMAL: 'n',
-            Difficulty.HARD: 'h',
-        }
-
-        tech_str_dict = {
-            TechOrder.FULL_RANDOM: 'te',
-            TechOrder.BALANCED_RANDOM: 'tex',
-            TechOrder.NORMAL: ''
-        }
-
-        game_mode_dict = {
-            GameMode.STANDARD: 'st',
-            GameMode.LOST_WORLDS: 'lw',
-            GameMode.ICE_AGE: 'ia',
-            GameMode.LEGACY_OF_CYRUS: 'loc',
-            GameMode.VANILLA_RANDO: 'van'
-        }
-
-        flag_str_dict = {
-            GameFlags.FIX_GLITCH: 'g',
-            GameFlags.BOSS_SCALE: 'b',
-            GameFlags.BOSS_RANDO: 'ro',
-            GameFlags.ZEAL_END: 'z',
-            GameFlags.FAST_PENDANT: 'p',
-            GameFlags.LOCKED_CHARS: 'c',
-            GameFlags.UNLOCKED_MAGIC: 'm',
-            GameFlags.CHRONOSANITY: 'cr',
-            GameFlags.TAB_TREASURES: 'tb',
-            GameFlags.DUPLICATE_CHARS: 'dc',
-            GameFlags.HEALING_ITEM_RANDO: 'h',  # h for Healing
-            GameFlags.GEAR_RANDO: 'q',  # q for eQuipment (g taken)
-            GameFlags.EPOCH_FAIL: 'ef',  # ef for Epoch Fail
-            GameFlags.BUCKET_FRAGMENTS: 'k'  # k for bucKet
-        }
-
-        shop_str_dict = {
-            ShopPrices.FREE: 'spf',
-            ShopPrices.MOSTLY_RANDOM: 'spm',
-            ShopPrices.FULLY_RANDOM: 'spr',
-            ShopPrices.NORMAL: ''
-        }
-
         if GameFlags.MYSTERY in self.gameflags:
             flag_string = 'mystery'
         else:
@@ -454,21 +456,154 @@ class Settings:
             # This won't match for easy, since there's no easy enemy
             # difficulty.
             flag_string = ''
-            flag_string += (game_mode_dict[self.game_mode] + '.')
-            flag_string += diff_str_dict[self.enemy_difficulty]
+            flag_string += (_game_mode_str_dict[self.game_mode] + '.')
+            flag_string += _diff_str_dict[self.enemy_difficulty]
 
             # Add the item difficulty if it differs
             # (old 'e' will end up as 'ne')
             if self.item_difficulty != self.enemy_difficulty:
-                flag_string += diff_str_dict[self.item_difficulty]
+                flag_string += _diff_str_dict[self.item_difficulty]
 
             # Add a . between mode and difficulty to free up symbols
             flag_string += '.'
-            for flag in flag_str_dict:
+            for flag in _flag_str_dict:
                 if flag in self.gameflags:
-                    flag_string += flag_str_dict[flag]
+                    flag_string += _flag_str_dict[flag]
 
-            flag_string += tech_str_dict[self.techorder]
-            flag_string += shop_str_dict[self.shopprices]
+            flag_string += _tech_str_dict[self.techorder]
+            flag_string += _shop_str_dict[self.shopprices]
 
         return flag_string
+
+    @staticmethod
+    def from_flag_string(flag_string: str) -> Settings:
+        '''
+        Inverse of get_flag_string.  Anything which the flag string does not
+        record (cosmetic flags, minor flags, character choices, ...) is left
+        at the Settings() default.
+        '''
+        ret = Settings()
+        ret.gameflags = GameFlags(0)
+
+        flag_string = flag_string.strip().lower()
+        if flag_string == 'mystery':
+            ret.gameflags = GameFlags.MYSTERY
+            return ret
+
+        parts = flag_string.split('.')
+        if len(parts) != 3:
+            raise ValueError(
+                f'Flag string \'{flag_string}\' is not of the form '
+                'mode.difficulty.flags'
+            )
+        mode_str, diff_str, flags_str = parts
+
+        inv_mode_dict = {val: key for key, val in _game_mode_str_dict.items()}
+        if mode_str not in inv_mode_dict:
+            raise ValueError(f'Unknown game mode \'{mode_str}\'')
+        ret.game_mode = inv_mode_dict[mode_str]
+
+        inv_diff_dict = {val: key for key, val in _diff_str_dict.items()}
+        if not 1 <= len(diff_str) <= 2 or \
+           any(char not in inv_diff_dict for char in diff_str):
+            raise ValueError(f'Unknown difficulty \'{diff_str}\'')
+
+        if diff_str == 'e':
+            # Old flag strings used 'e' for easy items with normal enemies.
+            ret.enemy_difficulty = Difficulty.NORMAL
+            ret.item_difficulty = Difficulty.EASY
+        else:
+            ret.enemy_difficulty = inv_diff_dict[diff_str[0]]
+            ret.item_difficulty = inv_diff_dict[diff_str[-1]]
+
+        ret.techorder = TechOrder.NORMAL
+        ret.shopprices = ShopPrices.NORMAL
+
+        # The symbols are not prefix-free ('c' and 'cr', 'te' and 'tex'),
+        # but get_flag_string always writes them in the same order.  Match
+        # them in that order, backtracking if a short symbol was wrong.
+        symbols = [
+            (val, key) for key, val in _flag_str_dict.items()
+        ]
+        symbols += [(val, key) for key, val in _tech_str_dict.items() if val]
+        symbols += [(val, key) for key, val in _shop_str_dict.items() if val]
+
+        def match(pos: int, first_symbol: int) -> list | None:
+            if pos == len(flags_str):
+                return []
+
+            for ind in range(first_symbol, len(symbols)):
+                symbol, value = symbols[ind]
+                if flags_str.startswith(symbol, pos):
+                    rest = match(pos+len(symbol), ind+1)
+                    if rest is not None:
+                        return [value] + rest
+
+            return None
+
+        values = match(0, 0)
+        if values is None:
+            raise ValueError(f'Unable to parse flags \'{flags_str}\'')
+
+        for value in values:
+            if isinstance(value, GameFlags):
+                ret.gameflags |= value
+            elif isinstance(value, TechOrder):
+                ret.techorder = value
+            elif isinstance(value, ShopPrices):
+                ret.shopprices = value
+
+        return ret
+
+    @staticmethod
+    def from_jot_json(json_dict: dict) -> Settings:
+        '''
+        Inverse of _jot_json.  Keys which are missing keep their Settings()
+        default.  Flags may be given either as str(flag) or by member name.
+        '''
+        ret = Settings()
+
+        def get_enum(enum_type, key: str):
+            value = json_dict[key]
+            inv_dict = enum_type.inv_str_dict()
+            if value in inv_dict:
+                return inv_dict[value]
+
+            name = str(value).split('.')[-1].upper().replace(' ', '_')
+            try:
+                return enum_type[name]
+            except KeyError:
+                raise ValueError(f'Unknown value \'{value}\' for {key}')
+
+        def get_flags(flag_type, key: str):
+            flags = flag_type(0)
+            for value in json_dict[key]:
+                name = str(value).split('.')[-1].upper().replace(' ', '_')
+                try:
+                    flags |= flag_type[name]
+                except KeyError:
+                    raise ValueError(f'Unknown value \'{value}\' for {key}')
+
+            return flags
+
+        if 'seed' in json_dict:
+            ret.seed = str(json_dict['seed'])
+
+        enum_keys = (
+            ('mode', 'game_mode', GameMode),
+            ('enemy_difficulty', 'enemy_difficulty', Difficulty),
+            ('item_difficulty', 'item_difficulty', Difficulty),
+            ('tech_order', 'techorder', TechOrder),
+            ('shops', 'shopprices', ShopPrices)
+        )
+        for key, attr, enum_type in enum_keys:
+            if key in json_dict:
+                setattr(ret, attr, get_enum(enum_type, key))
+
+        if 'flags' in json_dict:
+            ret.gameflags = get_flags(GameFlags, 'flags')
+
+        if 'cosmetic_flags' in json_dict:
+            ret.cosmetic_flags = get_flags(CosmeticFlags, 'cosmetic_flags')
+
+        return ret
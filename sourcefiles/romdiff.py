@@ -0,0 +1,441 @@
+'''
+Write a generated rom as an IPS or BPS patch against the base rom, and apply
+such patches.
+
+A seed only changes a few hundred KiB of the 4-6 MiB image, so the patch is
+far smaller to store and serve than the rom itself.  When the caller knows
+which parts of the rom may have been written (e.g. from an FSRom write log),
+passing them as extents limits the comparison to those parts.
+'''
+from __future__ import annotations
+
+from typing import Iterable, Optional
+import zlib
+
+
+class PatchFormatException(Exception):
+    pass
+
+
+# Identical bytes shorter than this between two changed runs are folded into
+# one run.  Splitting costs a 5 byte IPS record header.
+_MERGE_GAP = 6
+
+# Runs of one repeated byte at least this long are written as IPS RLE
+# records / BPS target copies.
+_MIN_RLE_LENGTH = 16
+
+# Size of the blocks compared before looking at individual bytes.
+_COMPARE_BLOCK = 256
+
+_IPS_MAX_OFFSET = 0xFFFFFF
+_IPS_MAX_RECORD = 0xFFFF
+_IPS_EOF_OFFSET = 0x454F46  # 'EOF'
+
+
+def merge_extents(
+        extents: Iterable[tuple[int, int]]
+) -> list[tuple[int, int]]:
+    '''Sort [start, end) extents and merge any which overlap or touch.'''
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(extents):
+        if start >= end:
+            continue
+
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def get_changed_runs(
+        base: bytes, rom: bytes,
+        extents: Optional[Iterable[tuple[int, int]]] = None,
+        merge_gap: int = _MERGE_GAP
+) -> list[tuple[int, int]]:
+    '''
+    Return a sorted list of [start, end) ranges where rom differs from base.
+    Everything past the end of base counts as changed.  Ranges closer than
+    merge_gap bytes are merged.
+
+    If extents are given, only those parts of the rom are compared and the
+    rest is assumed to be unchanged.
+    '''
+    base_view = memoryview(base).cast('B')
+    rom_view = memoryview(rom).cast('B')
+    common_size = min(len(base_view), len(rom_view))
+
+    if extents is None:
+        extents = [(0, common_size)]
+    else:
+        extents = merge_extents(extents)
+
+    runs: list[tuple[int, int]] = []
+
+    def add_run(start: int, end: int):
+        if runs and start - runs[-1][1] < merge_gap:
+            runs[-1] = (runs[-1][0], end)
+        else:
+            runs.append((start, end))
+
+    for ext_st, ext_end in extents:
+        ext_end = min(ext_end, common_size)
+
+        for block_st in range(ext_st, ext_end, _COMPARE_BLOCK):
+            block_end = min(block_st + _COMPARE_BLOCK, ext_end)
+
+            # Comparing bytes is much faster than comparing memoryviews.
+            if base_view[block_st:block_end].tobytes() == \
+               rom_view[block_st:block_end].tobytes():
+                continue
+
+            pos = block_st
+            while pos < block_end:
+                if base_view[pos] == rom_view[pos]:
+                    pos += 1
+                    continue
+
+                run_st = pos
+                while pos < block_end and base_view[pos] != rom_view[pos]:
+                    pos += 1
+                add_run(run_st, pos)
+
+    if len(rom_view) > common_size:
+        add_run(common_size, len(rom_view))
+
+    return runs
+
+
+def get_changed_blocks(
+        base: bytes, rom: bytes, block_size: int = 0x1000
+) -> list[tuple[int, int]]:
+    '''
+    Return sorted [start, end) extents, in whole blocks, which cover every
+    difference between base and rom.  Much cheaper than get_changed_runs
+    when the result only needs to cover the changes, e.g. as extents.
+    '''
+    base_view = memoryview(base).cast('B')
+    rom_view = memoryview(rom).cast('B')
+    common_size = min(len(base_view), len(rom_view))
+
+    extents: list[tuple[int, int]] = []
+    for start in range(0, common_size, block_size):
+        end = min(start + block_size, common_size)
+        if base_view[start:end].tobytes() != rom_view[start:end].tobytes():
+            extents.append((start, end))
+
+    if len(rom_view) > common_size:
+        extents.append((common_size, len(rom_view)))
+
+    return merge_extents(extents)
+
+
+def _split_repeats(data, start: int, end: int):
+    '''
+    Split data[start:end] into pieces.  Yields (start, end, is_repeat) where
+    is_repeat pieces are a single byte repeated _MIN_RLE_LENGTH+ times.
+    '''
+    pos = start
+    literal_st = start
+    while pos < end:
+        rep_end = pos + 1
+        while rep_end < end and data[rep_end] == data[pos]:
+            rep_end += 1
+
+        if rep_end - pos >= _MIN_RLE_LENGTH:
+            if literal_st < pos:
+                yield (literal_st, pos, False)
+            yield (pos, rep_end, True)
+            literal_st = rep_end
+
+        pos = rep_end
+
+    if literal_st < end:
+        yield (literal_st, end, False)
+
+
+def make_ips(base: bytes, rom: bytes,
+             extents: Optional[Iterable[tuple[int, int]]] = None) -> bytes:
+    '''
+    Return an IPS patch which turns base into rom.  See get_changed_runs for
+    extents.
+    '''
+    if len(rom) > _IPS_MAX_OFFSET + 1:
+        raise ValueError('IPS cannot address roms larger than 16 MiB.')
+    if len(rom) < len(base):
+        raise ValueError('IPS cannot shrink the rom.')
+
+    rom_view = memoryview(rom).cast('B')
+    patch = bytearray(b'PATCH')
+
+    for run_st, run_end in get_changed_runs(base, rom, extents):
+        for piece_st, piece_end, is_repeat in \
+                _split_repeats(rom_view, run_st, run_end):
+            pos = piece_st
+            while pos < piece_end:
+                # A record can not begin at 0x454F46 because the offset would
+                # read as the EOF marker.  Back up one byte.  Rewriting the
+                # byte with its final value is harmless.
+                rec_st = pos
+                if rec_st == _IPS_EOF_OFFSET:
+                    rec_st -= 1
+
+                size = min(piece_end - rec_st, _IPS_MAX_RECORD)
+                use_rle = is_repeat and rom_view[rec_st] == rom_view[pos]
+                if is_repeat and not use_rle:
+                    # The backed up byte breaks the repeat.
+                    size = 2
+
+                patch.extend(rec_st.to_bytes(3, 'big'))
+                if use_rle:
+                    patch.extend(b'\x00\x00')
+                    patch.extend(size.to_bytes(2, 'big'))
+                    patch.append(rom_view[rec_st])
+                else:
+                    patch.extend(size.to_bytes(2, 'big'))
+                    patch.extend(rom_view[rec_st:rec_st+size])
+
+                pos = rec_st + size
+
+    patch.extend(b'EOF')
+
+    return bytes(patch)
+
+
+def _encode_bps_number(number: int) -> bytes:
+    ret = bytearray()
+    while True:
+        low = number & 0x7F
+        number >>= 7
+        if number == 0:
+            ret.append(0x80 | low)
+            return bytes(ret)
+
+        ret.append(low)
+        number -= 1
+
+
+def make_bps(base: bytes, rom: bytes,
+             extents: Optional[Iterable[tuple[int, int]]] = None) -> bytes:
+    '''
+    Return a BPS patch which turns base into rom.  See get_changed_runs for
+    extents.
+    '''
+    base_view = memoryview(base).cast('B')
+    rom_view = memoryview(rom).cast('B')
+
+    patch = bytearray(b'BPS1')
+    patch.extend(_encode_bps_number(len(base_view)))
+    patch.extend(_encode_bps_number(len(rom_view)))
+    patch.extend(_encode_bps_number(0))  # no metadata
+
+    SOURCE_READ, TARGET_READ, TARGET_COPY = 0, 1, 3
+
+    def add_action(action: int, length: int):
+        patch.extend(_encode_bps_number(((length - 1) << 2) | action))
+
+    # Target copies are relative to the end of the previous target copy.
+    target_rel_offset = 0
+    out_pos = 0
+
+    for run_st, run_end in get_changed_runs(base, rom, extents):
+        if out_pos < run_st:
+            add_action(SOURCE_READ, run_st - out_pos)
+
+        for piece_st, piece_end, is_repeat in \
+                _split_repeats(rom_view, run_st, run_end):
+            if is_repeat:
+                # Write the first byte, then copy it forward byte by byte.
+                add_action(TARGET_READ, 1)
+                patch.append(rom_view[piece_st])
+
+                length = piece_end - piece_st - 1
+                add_action(TARGET_COPY, length)
+                offset = piece_st - target_rel_offset
+                patch.extend(
+                    _encode_bps_number((abs(offset) << 1) | (offset < 0))
+                )
+                target_rel_offset = piece_st + length
+            else:
+                add_action(TARGET_READ, piece_end - piece_st)
+                patch.extend(rom_view[piece_st:piece_end])
+
+        out_pos = run_end
+
+    if out_pos < len(rom_view):
+        add_action(SOURCE_READ, len(rom_view) - out_pos)
+
+    patch.extend(zlib.crc32(base_view).to_bytes(4, 'little'))
+    patch.extend(zlib.crc32(rom_view).to_bytes(4, 'little'))
+    patch.extend(zlib.crc32(patch).to_bytes(4, 'little'))
+
+    return bytes(patch)
+
+
+def _decode_bps_number(patch, pos: int) -> tuple[int, int]:
+    '''Returns the number at patch[pos] and the position after it.'''
+    number, shift = 0, 1
+    while True:
+        if pos >= len(patch):
+            raise PatchFormatException('BPS patch ends in a number.')
+
+        byte = patch[pos]
+        pos += 1
+        number += (byte & 0x7F) * shift
+        if byte & 0x80:
+            return number, pos
+
+        shift <<= 7
+        number += shift
+
+
+def apply_ips(base: bytes, patch: bytes) -> bytearray:
+    '''Return base with the IPS patch applied.'''
+    patch = memoryview(patch).cast('B')
+    if patch[0:5] != b'PATCH':
+        raise PatchFormatException('Missing IPS header.')
+
+    rom = bytearray(base)
+    pos = 5
+    while patch[pos:pos+3] != b'EOF':
+        if pos + 5 > len(patch):
+            raise PatchFormatException('IPS patch ends in a record.')
+
+        addr = int.from_bytes(patch[pos:pos+3], 'big')
+        size = int.from_bytes(patch[pos+3:pos+5], 'big')
+        pos += 5
+
+        if size == 0:
+            size = int.from_bytes(patch[pos:pos+2], 'big')
+            payload = bytes(patch[pos+2:pos+3]) * size
+            pos += 3
+        else:
+            payload = patch[pos:pos+size]
+            pos += size
+
+        if len(payload) != size:
+            raise PatchFormatException('IPS patch ends in a record.')
+
+        if addr + size > len(rom):
+            rom.extend(bytes(addr + size - len(rom)))
+        rom[addr:addr+size] = payload
+
+    # Some patches end with a 3 byte size to truncate to.  Only allow growing
+    # since make_ips never shrinks.
+    if len(patch) == pos + 6:
+        size = int.from_bytes(patch[pos+3:pos+6], 'big')
+        if size > len(rom):
+            rom.extend(bytes(size - len(rom)))
+
+    return rom
+
+
+def apply_bps(base: bytes, patch: bytes) -> bytearray:
+    '''Return base with the BPS patch applied.  Checks all three crcs.'''
+    base = memoryview(base).cast('B')
+    patch = memoryview(patch).cast('B')
+    if patch[0:4] != b'BPS1':
+        raise PatchFormatException('Missing BPS header.')
+    if len(patch) < 16:
+        raise PatchFormatException('BPS patch is truncated.')
+
+    patch_crc = int.from_bytes(patch[-4:], 'little')
+    if zlib.crc32(patch[:-4]) != patch_crc:
+        raise PatchFormatException('BPS patch crc mismatch.')
+
+    source_crc = int.from_bytes(patch[-12:-8], 'little')
+    if zlib.crc32(base) != source_crc:
+        raise PatchFormatException('Base rom does not match the BPS patch.')
+
+    source_size, pos = _decode_bps_number(patch, 4)
+    target_size, pos = _decode_bps_number(patch, pos)
+    metadata_size, pos = _decode_bps_number(patch, pos)
+    pos += metadata_size
+
+    if source_size != len(base):
+        raise PatchFormatException('Base rom does not match the BPS patch.')
+
+    rom = bytearray(target_size)
+    out_pos = 0
+    source_rel_offset = 0
+    target_rel_offset = 0
+
+    actions_end = len(patch) - 12
+    while pos < actions_end:
+        data, pos = _decode_bps_number(patch, pos)
+        action = data & 3
+        length = (data >> 2) + 1
+
+        if out_pos + length > target_size:
+            raise PatchFormatException('BPS patch writes past the target.')
+
+        if action == 0:  # SourceRead
+            rom[out_pos:out_pos+length] = base[out_pos:out_pos+length]
+        elif action == 1:  # TargetRead
+            rom[out_pos:out_pos+length] = patch[pos:pos+length]
+            pos += length
+        else:
+            data, pos = _decode_bps_number(patch, pos)
+            offset = -(data >> 1) if data & 1 else data >> 1
+
+            if action == 2:  # SourceCopy
+                source_rel_offset += offset
+                copy_st = source_rel_offset
+                rom[out_pos:out_pos+length] = base[copy_st:copy_st+length]
+                source_rel_offset += length
+            else:  # TargetCopy
+                target_rel_offset += offset
+                copy_st = target_rel_offset
+                distance = out_pos - copy_st
+                if distance <= 0:
+                    raise PatchFormatException('Bad BPS target copy.')
+
+                # The copy may overlap what it writes, which repeats the
+                # distance bytes before out_pos.
+                if distance >= length:
+                    rom[out_pos:out_pos+length] = \
+                        rom[copy_st:copy_st+length]
+                else:
+                    repeats = length // distance + 1
+                    rom[out_pos:out_pos+length] = \
+                        (rom[copy_st:out_pos] * repeats)[:length]
+                target_rel_offset += length
+
+        out_pos += length
+
+    target_crc = int.from_bytes(patch[-8:-4], 'little')
+    if out_pos != target_size or zlib.crc32(rom) != target_crc:
+        raise PatchFormatException('Patched rom does not match the BPS crc.')
+
+    return rom
+
+
+def make_patch(base: bytes, rom: bytes, patch_format: str,
+               extents: Optional[Iterable[tuple[int, int]]] = None) -> bytes:
+    '''Make an 'ips' or 'bps' patch from base to rom.'''
+    if patch_format == 'ips':
+        return make_ips(base, rom, extents)
+    elif patch_format == 'bps':
+        return make_bps(base, rom, extents)
+
+    raise ValueError(f'Unknown patch format \'{patch_format}\'')
+
+
+def apply_patch(base: bytes, patch: bytes) -> bytearray:
+    '''Apply an IPS or BPS patch to base, detecting the format.'''
+    if patch[0:5] == b'PATCH':
+        return apply_ips(base, patch)
+    elif patch[0:4] == b'BPS1':
+        return apply_bps(base, patch)
+
+    raise PatchFormatException('Unknown patch format.')
+
+
+def verify_patch(base: bytes, rom: bytes, patch: bytes) -> bool:
+    '''Check that applying the patch to base gives back rom.'''
+    try:
+        return apply_patch(base, patch) == rom
+    except PatchFormatException:
+        return False
@@ -0,0 +1,644 @@
+'''
+Index of what every location's event script does to memory, enemies, items,
+strings, other objects, and the party's location.
+
+Finding which scripts set or check a flag used to mean decoding scripts by
+hand with find_command.  ScriptDatabase decodes each location's script once
+and indexes every command of interest, so questions like "who sets
+0x7F01A6 & 0x04?" or "where is enemy 0x5D loaded?" are dictionary lookups.
+
+The database can be built from a rom offline and pickled, or built from a
+CTRom during generation.  update_script re-indexes one location after an
+edit, and check_script looks for edits which break a script's structure.
+
+Running this module builds the database for a rom and answers queries:
+    python scriptdb.py ct.sfc --flag 0x7F01A6 --enemy 0x5D
+It also checks the shipped .Flux files, which needs no rom:
+    python scriptdb.py --check-flux
+'''
+from __future__ import annotations
+
+import argparse
+import bisect
+from dataclasses import dataclass
+from enum import IntEnum, auto
+import pickle
+import sys
+from typing import Callable, Iterable, Optional
+
+from ctenums import LocID
+import ctevent
+import ctrom
+import fluxcache
+from eventcommand import CommandView, EventCommand as EC, decode_command
+from mapmangler import LocationTable
+
+# Version of the pickled format.  Bump when ScriptUse or the indices change.
+_DB_VERSION = 1
+
+_STORYLINE_ADDR = 0x7F0000
+_LOCAL_MEM_ST = 0x7F0000
+_SCRIPT_MEM_ST = 0x7F0200
+
+_FUNCS_PER_OBJECT = 16
+
+
+class UseKind(IntEnum):
+    MEM_READ = auto()
+    MEM_WRITE = auto()
+    ENEMY_LOAD = auto()
+    ITEM_GIVE = auto()
+    ITEM_CHECK = auto()
+    STRING = auto()
+    OBJ_CALL = auto()
+    PC_CALL = auto()
+    LOC_CHANGE = auto()
+
+
+@dataclass(frozen=True)
+class ScriptRef:
+    '''A command's place in the game's scripts.'''
+    loc_id: int
+    obj_id: int
+    func_id: int
+    pos: int
+
+    def __str__(self):
+        try:
+            loc_str = str(LocID(self.loc_id))
+        except ValueError:
+            loc_str = f'{self.loc_id:03X}'
+
+        return (f'{loc_str} obj {self.obj_id:02X} func {self.func_id:X} '
+                f'[{self.pos:04X}]')
+
+
+@dataclass(frozen=True)
+class ScriptUse:
+    '''
+    One thing a command does.  value is what the use is indexed by:
+      - MEM_READ, MEM_WRITE: the address.  detail is the mask of the bits
+        involved, or None if the whole value is used.
+      - ENEMY_LOAD: the enemy id.  detail is the slot.
+      - ITEM_GIVE, ITEM_CHECK: the item id.
+      - STRING: the index into the script's strings.
+      - OBJ_CALL, PC_CALL: the object or pc called.  detail is the function.
+      - LOC_CHANGE: the destination location.
+    '''
+    kind: UseKind
+    ref: ScriptRef
+    command: int
+    value: int
+    detail: Optional[int] = None
+
+
+# Each decoder takes a command's args and returns (kind, value, detail)
+# tuples.  Script memory args are offsets o into [0x7F0200, 0x7F0400) where
+# the address is 0x7F0200 + 2*o.  See EventCommand.assign_val_to_mem and
+# EventCommand.set_reset_bit for how the commands are formed.
+_Decoded = list[tuple[UseKind, int, Optional[int]]]
+
+_READ = UseKind.MEM_READ
+_WRITE = UseKind.MEM_WRITE
+
+
+def _script_addr(offset: int) -> int:
+    return _SCRIPT_MEM_ST + 2*offset
+
+
+def _get_op_mask(operation: int, value: int) -> Optional[int]:
+    # Only the bitwise and operation singles out some bits.
+    if operation & 0x7F == 6:
+        return value
+    return None
+
+
+def _decode_local_if(args) -> _Decoded:
+    offset, value, operation = args[0], args[1], args[2]
+    address = _LOCAL_MEM_ST + offset + 0x100*bool(operation & 0x80)
+    return [(_READ, address, _get_op_mask(operation, value))]
+
+
+def _decode_local_bit(args) -> _Decoded:
+    bit_byte, offset = args
+    address = _LOCAL_MEM_ST + offset + 0x100*bool(bit_byte & 0x80)
+    return [(_WRITE, address, 1 << (bit_byte & 0x07))]
+
+
+def _decode_location(args) -> _Decoded:
+    return [(UseKind.LOC_CHANGE, args[0] & 0x1FF, None)]
+
+
+def _decode_call(kind: UseKind) -> Callable[[list], _Decoded]:
+    # Calls give 2*object and (priority << 4) | function.
+    return lambda args: [(kind, args[0]//2, args[1] & 0x0F)]
+
+
+_decoders: dict[int, Callable[[list], _Decoded]] = {
+    # Conditionals on script memory: offset, value, op, jump
+    0x12: lambda a: [(_READ, _script_addr(a[0]), _get_op_mask(a[2], a[1]))],
+    0x13: lambda a: [(_READ, _script_addr(a[0]), _get_op_mask(a[2], a[1]))],
+    # Compare two script memory values: offset, offset, op, jump
+    0x14: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_READ, _script_addr(a[1]), None)],
+    0x15: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_READ, _script_addr(a[1]), None)],
+    # Conditional on [0x7F0000, 0x7F0200)
+    0x16: _decode_local_if,
+    0x18: lambda a: [(_READ, _STORYLINE_ADDR, None)],
+    0x19: lambda a: [(_READ, _script_addr(a[0]), None)],
+    0x20: lambda a: [(_WRITE, _script_addr(a[0]), None)],
+    # Any address <--> script memory
+    0x48: lambda a: [(_READ, a[0], None), (_WRITE, _script_addr(a[1]), None)],
+    0x49: lambda a: [(_READ, a[0], None), (_WRITE, _script_addr(a[1]), None)],
+    0x4A: lambda a: [(_WRITE, a[0], None)],
+    0x4B: lambda a: [(_WRITE, a[0], None)],
+    0x4C: lambda a: [(_READ, _script_addr(a[1]), None), (_WRITE, a[0], None)],
+    0x4D: lambda a: [(_READ, _script_addr(a[1]), None), (_WRITE, a[0], None)],
+    # Memory copy: address, bank, length, data
+    0x4E: lambda a: [(_WRITE, (a[1] << 16) | a[0], None)],
+    # Value to script memory: value, offset
+    0x4F: lambda a: [(_WRITE, _script_addr(a[1]), None)],
+    0x50: lambda a: [(_WRITE, _script_addr(a[1]), None)],
+    0x51: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x52: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x53: lambda a: [(_READ, _LOCAL_MEM_ST + a[0], None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x54: lambda a: [(_READ, _LOCAL_MEM_ST + a[0], None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x55: lambda a: [(_READ, _STORYLINE_ADDR, None),
+                     (_WRITE, _script_addr(a[0]), None)],
+    0x56: lambda a: [(_WRITE, _LOCAL_MEM_ST + a[1], None)],
+    0x58: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_WRITE, _LOCAL_MEM_ST + a[1], None)],
+    0x59: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_WRITE, _LOCAL_MEM_ST + a[1], None)],
+    0x5A: lambda a: [(_WRITE, _STORYLINE_ADDR, None)],
+    # Arithmetic on script memory.  The target is read and written.
+    0x5B: lambda a: [(_READ, _script_addr(a[1]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x5D: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_READ, _script_addr(a[1]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x5E: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_READ, _script_addr(a[1]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x5F: lambda a: [(_READ, _script_addr(a[1]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x60: lambda a: [(_READ, _script_addr(a[1]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    0x61: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_READ, _script_addr(a[1]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    # Bit operations: bit (or mask), offset
+    0x63: lambda a: [(_WRITE, _script_addr(a[1]), 1 << (a[0] & 0x07))],
+    0x64: lambda a: [(_WRITE, _script_addr(a[1]), 1 << (a[0] & 0x07))],
+    0x65: _decode_local_bit,
+    0x66: _decode_local_bit,
+    0x67: lambda a: [(_WRITE, _script_addr(a[1]), None)],
+    0x69: lambda a: [(_WRITE, _script_addr(a[1]), a[0])],
+    0x6B: lambda a: [(_READ, _script_addr(a[1]), a[0]),
+                     (_WRITE, _script_addr(a[1]), a[0])],
+    0x6F: lambda a: [(_READ, _script_addr(a[1]), None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    # Increment, decrement, set, reset, random: offset
+    0x71: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_WRITE, _script_addr(a[0]), None)],
+    0x72: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_WRITE, _script_addr(a[0]), None)],
+    0x73: lambda a: [(_READ, _script_addr(a[0]), None),
+                     (_WRITE, _script_addr(a[0]), None)],
+    0x75: lambda a: [(_WRITE, _script_addr(a[0]), None)],
+    0x76: lambda a: [(_WRITE, _script_addr(a[0]), None)],
+    0x77: lambda a: [(_WRITE, _script_addr(a[0]), None)],
+    0x7F: lambda a: [(_WRITE, _script_addr(a[0]), None)],
+    # Enemies: enemy id, slot (0x80 is the static bit)
+    0x83: lambda a: [(UseKind.ENEMY_LOAD, a[0], a[1] & 0x7F)],
+    # Items
+    0xC7: lambda a: [(_READ, _script_addr(a[0]), None)],
+    0xC9: lambda a: [(UseKind.ITEM_CHECK, a[0], None)],
+    0xCA: lambda a: [(UseKind.ITEM_GIVE, a[0], None)],
+    0xD7: lambda a: [(UseKind.ITEM_CHECK, a[0], None),
+                     (_WRITE, _script_addr(a[1]), None)],
+    # Calls to other objects and to pcs
+    0x02: _decode_call(UseKind.OBJ_CALL),
+    0x03: _decode_call(UseKind.OBJ_CALL),
+    0x04: _decode_call(UseKind.OBJ_CALL),
+    0x05: _decode_call(UseKind.PC_CALL),
+    0x06: _decode_call(UseKind.PC_CALL),
+    0x07: _decode_call(UseKind.PC_CALL),
+}
+
+for _cmd_id in range(0xDC, 0xE2):
+    _decoders[_cmd_id] = _decode_location
+
+for _cmd_id, _arg_pos in zip(EC.str_commands, EC.str_arg_pos):
+    _decoders[_cmd_id] = \
+        (lambda pos: lambda a: [(UseKind.STRING, a[pos], None)])(_arg_pos)
+
+_jump_commands = frozenset(EC.fwd_jump_commands + EC.back_jump_commands)
+_back_jump_commands = frozenset(EC.back_jump_commands)
+
+
+def get_function_bounds(script: ctevent.Event) -> list[tuple[int, int,
+                                                            int, int]]:
+    '''
+    (obj_id, func_id, start, end) of each nonempty function in the script.
+    A function ends where the next function in the data starts.  Unlike
+    Event.get_function_end, this works for functions stored out of order.
+    '''
+    num_ptrs = _FUNCS_PER_OBJECT*script.num_objects
+    starts = [
+        int.from_bytes(script.data[2*ind:2*ind+2], 'little')
+        for ind in range(num_ptrs)
+    ]
+    sorted_starts = sorted(set(starts))
+    sorted_starts.append(len(script.data))
+
+    # A function is empty if it starts where the one before it does.
+    ret = []
+    for ind, start in enumerate(starts):
+        if ind > 0 and starts[ind-1] == start:
+            continue
+
+        end = sorted_starts[bisect.bisect_right(sorted_starts, start)]
+        ret.append((ind // _FUNCS_PER_OBJECT, ind % _FUNCS_PER_OBJECT,
+                    start, end))
+
+    return ret
+
+
+def get_jump_target(view: CommandView) -> int:
+    '''Where a jump or conditional command goes when it jumps.'''
+    jump = view.buf[view.offset + view.length - 1]
+    if view.command in _back_jump_commands:
+        return view.offset + view.length - 1 - jump
+
+    return view.offset + view.length - 1 + jump
+
+
+def get_script_uses(script: ctevent.Event, loc_id: int) -> list[ScriptUse]:
+    '''Every indexed use in the script, placed at loc_id.'''
+    data = script.data
+    uses = []
+
+    for obj_id, func_id, start, end in get_function_bounds(script):
+        pos = start
+        while pos < end:
+            length, cmd_id = decode_command(data, pos)
+
+            decoder = _decoders.get(cmd_id, None)
+            if decoder is not None:
+                ref = ScriptRef(loc_id, obj_id, func_id, pos)
+                args = CommandView(data, pos).args
+                uses.extend(
+                    ScriptUse(kind, ref, cmd_id, value, detail)
+                    for kind, value, detail in decoder(args)
+                )
+
+            pos += length
+
+    return uses
+
+
+def check_script(script: ctevent.Event) -> list[str]:
+    '''
+    Look for structural problems in a script:
+      - commands running past the end of their function,
+      - jumps which land inside a command or outside of every function,
+      - text commands using strings the script doesn't have, and
+      - calls to objects the script doesn't have.
+    Returns a description of each problem found.
+
+    Jumps may leave their function.  Vanilla scripts (and .Flux files made
+    from them) sometimes share the tail of another object's function by
+    jumping into it, which the game allows as long as the jump lands on a
+    command.
+    '''
+    data = script.data
+    num_strings = len(script.strings)
+    problems = []
+
+    # Jumping to a function's end is fine.  That's the next function.
+    cmd_starts = {len(data)}
+    jumps = []
+
+    for obj_id, func_id, start, end in get_function_bounds(script):
+        where = f'obj {obj_id:02X} func {func_id:X}'
+        if not 32*script.num_objects <= start <= end <= len(data):
+            problems.append(f'{where}: bad bounds [{start:04X}, {end:04X})')
+            continue
+
+        pos = start
+        while pos < end:
+            cmd_starts.add(pos)
+            view = CommandView(data, pos)
+
+            if pos + view.length > end:
+                problems.append(
+                    f'{where} [{pos:04X}]: command {view.command:02X} runs '
+                    f'past the end of the function ({end:04X})'
+                )
+                break
+
+            if view.command in _jump_commands:
+                jumps.append((where, pos, get_jump_target(view)))
+            elif view.command in EC.str_commands:
+                str_id = view.get_arg(0)
+                if str_id >= num_strings:
+                    problems.append(
+                        f'{where} [{pos:04X}]: string {str_id:02X} of '
+                        f'{num_strings:02X}'
+                    )
+            elif view.command in (0x02, 0x03, 0x04):
+                target = view.get_arg(0)//2
+                if target >= script.num_objects:
+                    problems.append(
+                        f'{where} [{pos:04X}]: call to missing object '
+                        f'{target:02X}'
+                    )
+
+            pos += view.length
+
+        cmd_starts.add(end)
+
+    for where, pos, target in jumps:
+        if target not in cmd_starts:
+            problems.append(
+                f'{where} [{pos:04X}]: jump to {target:04X} is not a command'
+            )
+
+    return problems
+
+
+def check_flux_files(flux_dir: str = './flux') -> dict[str, list[str]]:
+    '''
+    Run check_script on every .Flux file in flux_dir.  Returns the problems
+    of each file which has any.
+    '''
+    ret = dict()
+    for filename in fluxcache.get_flux_filenames(flux_dir):
+        problems = check_script(ctevent.Event.from_flux(filename))
+        if problems:
+            ret[filename] = problems
+
+    return ret
+
+
+class ScriptDatabase:
+    '''
+    Indexed uses of every location script.  Uses are stored per location so
+    that a location can be re-indexed after its script changes.
+    '''
+
+    def __init__(self):
+        self.loc_uses: dict[int, list[ScriptUse]] = dict()
+        self.indices: dict[UseKind, dict[int, set[ScriptUse]]] = {
+            kind: dict() for kind in UseKind
+        }
+
+    def remove_location(self, loc_id: int):
+        for use in self.loc_uses.pop(loc_id, []):
+            index = self.indices[use.kind]
+            uses = index[use.value]
+            uses.discard(use)
+            if not uses:
+                del index[use.value]
+
+    def update_script(self, loc_id: int, script: ctevent.Event,
+                      check: bool = False) -> list[str]:
+        '''
+        Replace loc_id's uses with those of script.  With check set, returns
+        the problems check_script finds.  Otherwise returns [].
+        '''
+        self.remove_location(loc_id)
+
+        uses = get_script_uses(script, loc_id)
+        self.loc_uses[loc_id] = uses
+
+        for use in uses:
+            self.indices[use.kind].setdefault(use.value, set()).add(use)
+
+        if check:
+            return check_script(script)
+
+        return []
+
+    @classmethod
+    def from_rom(cls, rom) -> ScriptDatabase:
+        '''Index every location's script in rom.'''
+        loc_table = LocationTable.from_rom(rom)
+        ret = cls()
+
+        # Locations share scripts, so decompress each only once.
+        scripts: dict[int, ctevent.Event] = dict()
+        for loc_id in range(LocationTable.NUM_LOCATIONS):
+            ptr = loc_table.get_event_ptr(loc_id)
+            if ptr not in scripts:
+                scripts[ptr] = ctevent.Event.from_rom(rom, ptr)
+
+            ret.update_script(loc_id, scripts[ptr])
+
+        return ret
+
+    @classmethod
+    def from_ctrom(cls, ct_rom: ctrom.CTRom) -> ScriptDatabase:
+        '''
+        Index every location of a CTRom.  Scripts held by its ScriptManager
+        are indexed as they are now, even if not yet written to the rom.
+        '''
+        ret = cls.from_rom(ct_rom.rom_data.getview())
+
+        script_man = ct_rom.script_manager
+        for loc_id, script in script_man.script_dict.items():
+            ret.update_script(int(loc_id), script)
+
+        return ret
+
+    def save(self, filename: str):
+        with open(filename, 'wb') as outfile:
+            pickle.dump((_DB_VERSION, self.loc_uses), outfile,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename: str) -> ScriptDatabase:
+        with open(filename, 'rb') as infile:
+            version, loc_uses = pickle.load(infile)
+
+        if version != _DB_VERSION:
+            raise ValueError(f'{filename} has version {version}, '
+                             f'expected {_DB_VERSION}')
+
+        ret = cls()
+        for loc_id, uses in loc_uses.items():
+            ret.loc_uses[loc_id] = uses
+            for use in uses:
+                ret.indices[use.kind].setdefault(use.value, set()).add(use)
+
+        return ret
+
+    # Queries.  Results are sorted by location, object, function, position.
+    @staticmethod
+    def __sorted(uses: Iterable[ScriptUse]) -> list[ScriptUse]:
+        return sorted(uses, key=lambda use: (use.ref.loc_id, use.ref.obj_id,
+                                             use.ref.func_id, use.ref.pos))
+
+    def get_uses(self, kind: UseKind, value: int) -> list[ScriptUse]:
+        return self.__sorted(self.indices[kind].get(value, ()))
+
+    def __get_mem_uses(self, kind: UseKind, address: int,
+                       mask: Optional[int]) -> list[ScriptUse]:
+        uses = self.indices[kind].get(address, ())
+        if mask is not None:
+            # Uses of the whole value always match.
+            uses = (use for use in uses
+                    if use.detail is None or use.detail & mask)
+
+        return self.__sorted(uses)
+
+    def get_flag_reads(self, address: int,
+                       mask: Optional[int] = None) -> list[ScriptUse]:
+        '''Commands which read address (and any bit of mask, if given).'''
+        return self.__get_mem_uses(UseKind.MEM_READ, address, mask)
+
+    def get_flag_writes(self, address: int,
+                        mask: Optional[int] = None) -> list[ScriptUse]:
+        '''Commands which write address (and any bit of mask, if given).'''
+        return self.__get_mem_uses(UseKind.MEM_WRITE, address, mask)
+
+    def get_enemy_loads(self, enemy_id: int) -> list[ScriptUse]:
+        return self.get_uses(UseKind.ENEMY_LOAD, int(enemy_id))
+
+    def get_item_gives(self, item_id: int) -> list[ScriptUse]:
+        return self.get_uses(UseKind.ITEM_GIVE, int(item_id))
+
+    def get_item_checks(self, item_id: int) -> list[ScriptUse]:
+        return self.get_uses(UseKind.ITEM_CHECK, int(item_id))
+
+    def get_string_uses(self, loc_id: int, str_id: int) -> list[ScriptUse]:
+        return [use for use in self.get_uses(UseKind.STRING, str_id)
+                if use.ref.loc_id == loc_id]
+
+    def get_callers(self, loc_id: int, obj_id: int,
+                    func_id: Optional[int] = None) -> list[ScriptUse]:
+        '''Calls to loc_id's object obj_id (function func_id if given).'''
+        return [use for use in self.get_uses(UseKind.OBJ_CALL, obj_id)
+                if use.ref.loc_id == loc_id and
+                (func_id is None or use.detail == func_id)]
+
+    def get_location_changes(self, to_loc_id: int) -> list[ScriptUse]:
+        '''Commands which move the party to to_loc_id.'''
+        return self.get_uses(UseKind.LOC_CHANGE, int(to_loc_id))
+
+    def get_script_exits(self, loc_id: int) -> set[int]:
+        '''Locations which loc_id's script can move the party to.'''
+        return set(use.value for use in self.loc_uses.get(loc_id, [])
+                   if use.kind == UseKind.LOC_CHANGE)
+
+    def get_unwritten_reads(
+            self, start: int = _LOCAL_MEM_ST, end: int = _SCRIPT_MEM_ST
+    ) -> dict[int, list[ScriptUse]]:
+        '''
+        Reads of addresses in [start, end) which no script writes.  Flags
+        like these are either set outside of location scripts or are never
+        set, which is worth a look when hunting softlocks.
+        '''
+        writes = self.indices[UseKind.MEM_WRITE]
+        return {
+            address: self.__sorted(uses)
+            for address, uses in sorted(self.indices[UseKind.MEM_READ].items())
+            if start <= address < end and address not in writes
+        }
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Index and query the event scripts of a rom.'
+    )
+
+    def int_arg(value: str) -> int:
+        return int(value, 0)
+
+    parser.add_argument('rom', nargs='?',
+                        help='rom file, or a database from --save')
+    parser.add_argument('--save', help='pickle the database to this file')
+    parser.add_argument('--flag', type=int_arg, action='append', default=[],
+                        help='address to list reads and writes of')
+    parser.add_argument('--mask', type=int_arg, default=None,
+                        help='bits of --flag addresses to consider')
+    parser.add_argument('--enemy', type=int_arg, action='append', default=[],
+                        help='enemy id to list loads of')
+    parser.add_argument('--item', type=int_arg, action='append', default=[],
+                        help='item id to list gives and checks of')
+    parser.add_argument('--check', action='store_true',
+                        help='check every script for structural problems')
+    parser.add_argument('--check-flux', action='store_true',
+                        help='check every .Flux file in ./flux/ (no rom '
+                        'needed)')
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = get_arg_parser()
+    args = parser.parse_args(argv)
+
+    num_problems = 0
+    if args.check_flux:
+        for filename, problems in check_flux_files().items():
+            num_problems += len(problems)
+            for problem in problems:
+                print(f'{filename}: {problem}')
+
+    if args.rom is None:
+        if not args.check_flux:
+            parser.error('a rom is required unless --check-flux is given')
+        return 1 if num_problems else 0
+
+    if args.rom.endswith('.pickle'):
+        db = ScriptDatabase.load(args.rom)
+    else:
+        with open(args.rom, 'rb') as infile:
+            rom = bytearray(infile.read())
+        db = ScriptDatabase.from_rom(rom)
+
+        if args.check:
+            loc_table = LocationTable.from_rom(rom)
+            for loc_id in range(LocationTable.NUM_LOCATIONS):
+                ptr = loc_table.get_event_ptr(loc_id)
+                script = ctevent.Event.from_rom(rom, ptr)
+                for problem in check_script(script):
+                    num_problems += 1
+                    print(f'{loc_id:03X}: {problem}')
+
+    if args.save is not None:
+        db.save(args.save)
+
+    def print_uses(title: str, uses: list[ScriptUse]):
+        print(f'{title}: {len(uses)}')
+        for use in uses:
+            detail = '' if use.detail is None else f' ({use.detail:02X})'
+            print(f'    {use.ref}: {use.command:02X}{detail}')
+
+    for address in args.flag:
+        print_uses(f'Reads of {address:06X}',
+                   db.get_flag_reads(address, args.mask))
+        print_uses(f'Writes of {address:06X}',
+                   db.get_flag_writes(address, args.mask))
+
+    for enemy_id in args.enemy:
+        print_uses(f'Loads of enemy {enemy_id:02X}',
+                   db.get_enemy_loads(enemy_id))
+
+    for item_id in args.item:
+        print_uses(f'Gives of item {item_id:02X}', db.get_item_gives(item_id))
+        print_uses(f'Checks of item {item_id:02X}',
+                   db.get_item_checks(item_id))
+
+    return 1 if num_problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+'''
+Index of which locations use each block of rom holding event scripts and
+their strings.
+
+Location scripts can share one compressed script, and scripts often share a
+string table.  Without knowing every script's strings, ScriptManager could
+not tell whether it was safe to free the old strings of a rewritten script,
+so it never freed them.  The index is built once from the whole (patched)
+base rom by patchcache and kept with the cached base image, so every seed
+gets an accurate copy for free.
+'''
+from __future__ import annotations
+
+import bisect
+from typing import Iterable, Optional
+
+from byteops import get_value_from_bytes, to_file_ptr
+from ctdecompress import get_compressed_length
+import ctevent
+from mapmangler import LocationTable
+
+NUM_LOCATIONS = LocationTable.NUM_LOCATIONS
+
+Block = tuple[int, int]  # [start, end) in the rom
+
+# Owners are (loc_id, use) so that a block holding both a location's script
+# and some of its strings stays used until both are released.
+_SCRIPT_USE = 0
+_STRING_USE = 1
+
+
+class ScriptOwnerIndex:
+    '''
+    Each location's compressed script block and string blocks, along with
+    the locations using each block.  A block only becomes free when the last
+    location using it lets go.
+    '''
+
+    def __init__(self):
+        self.script_blocks: dict[int, Block] = dict()
+        self.string_blocks: dict[int, list[Block]] = dict()
+        self.owners: dict[Block, set[tuple[int, int]]] = dict()
+
+    def copy(self) -> ScriptOwnerIndex:
+        ret = ScriptOwnerIndex()
+        ret.script_blocks = dict(self.script_blocks)
+        ret.string_blocks = {
+            loc_id: blocks[:] for loc_id, blocks in self.string_blocks.items()
+        }
+        ret.owners = {
+            block: set(owners) for block, owners in self.owners.items()
+        }
+
+        return ret
+
+    def __release_blocks(self, owner: tuple[int, int],
+                         blocks: Iterable[Block]) -> list[Block]:
+        freed = []
+        for block in blocks:
+            owners = self.owners.get(block, None)
+            if owners is None:
+                continue
+
+            owners.discard(owner)
+            if not owners:
+                del self.owners[block]
+                freed.append(block)
+
+        return freed
+
+    def release_script(self, loc_id: int) -> list[Block]:
+        '''
+        Stop loc_id from using its script block.  Returns the block if no
+        other location uses it.
+        '''
+        block = self.script_blocks.pop(loc_id, None)
+        if block is None:
+            return []
+
+        return self.__release_blocks((loc_id, _SCRIPT_USE), [block])
+
+    def release_strings(self, loc_id: int) -> list[Block]:
+        '''
+        Stop loc_id from using its string blocks.  Returns the blocks that
+        no other location uses.
+        '''
+        blocks = self.string_blocks.pop(loc_id, [])
+        return self.__release_blocks((loc_id, _STRING_USE), blocks)
+
+    def has_script(self, loc_id: int) -> bool:
+        return loc_id in self.script_blocks
+
+    def matches(self, loc_id: int, script_ptr: int, script_len: int,
+                script: ctevent.Event) -> bool:
+        '''
+        Whether loc_id's entries describe script, read from script_ptr with a
+        compressed length of script_len.  Patches applied after the index was
+        built can point a location at a different script or strings.
+        '''
+        block = self.script_blocks.get(loc_id, None)
+        if block is None or block[0] != script_ptr or \
+           block[1] < script_ptr + script_len:
+            return False
+
+        string_blocks = self.string_blocks.get(loc_id, [])
+        if script.orig_str_index is None or not script.orig_str_indices:
+            return not string_blocks
+
+        table_st = to_file_ptr(script.orig_str_index)
+        return any(start <= table_st < end for start, end in string_blocks)
+
+    def forget(self, loc_id: int):
+        '''
+        Stop tracking loc_id without freeing anything.  For locations whose
+        entries no longer describe the rom.
+        '''
+        self.release_script(loc_id)
+        self.release_strings(loc_id)
+
+    def set_script(self, loc_id: int, block: Block):
+        '''Record a newly written script block used only by loc_id.'''
+        self.release_script(loc_id)
+        self.script_blocks[loc_id] = block
+        self.owners.setdefault(block, set()).add((loc_id, _SCRIPT_USE))
+
+    def set_strings(self, loc_id: int, blocks: list[Block]):
+        '''Record newly written string blocks used only by loc_id.'''
+        self.release_strings(loc_id)
+        self.string_blocks[loc_id] = blocks[:]
+        for block in blocks:
+            self.owners.setdefault(block, set()).add((loc_id, _STRING_USE))
+
+    def share_strings(self, loc_id: int,
+                      table_st: Optional[int]) -> list[Block]:
+        '''
+        Record that loc_id's unchanged strings are read from the table at
+        table_st, e.g. because it was given a copy of another location's
+        script.  loc_id takes the string blocks of every location using that
+        table.  Returns loc_id's old string blocks that no other location
+        uses.  If no location is known to use the table, loc_id's strings
+        stop being tracked (and so are never freed).
+        '''
+        old_blocks = self.string_blocks.get(loc_id, [])
+        if table_st is not None and \
+           any(start <= table_st < end for start, end in old_blocks):
+            return []
+
+        new_blocks: list[Block] = []
+        if table_st is not None:
+            for other_id, blocks in self.string_blocks.items():
+                if other_id == loc_id or not any(
+                        start <= table_st < end for start, end in blocks
+                ):
+                    continue
+                new_blocks.extend(block for block in blocks
+                                  if block not in new_blocks)
+
+        owner = (loc_id, _STRING_USE)
+        self.string_blocks.pop(loc_id, None)
+        freed = self.__release_blocks(
+            owner, [block for block in old_blocks if block not in new_blocks]
+        )
+
+        if new_blocks:
+            self.string_blocks[loc_id] = new_blocks
+            for block in new_blocks:
+                self.owners.setdefault(block, set()).add(owner)
+
+        return freed
+
+    @staticmethod
+    def _get_string_blocks(rom, script: ctevent.Event) -> list[Block]:
+        '''
+        The blocks of rom holding the used pointers of the script's string
+        table and the strings themselves.
+        '''
+        if script.orig_str_index is None or not script.orig_str_indices:
+            return []
+
+        table_st = to_file_ptr(script.orig_str_index)
+        bank = to_file_ptr((script.orig_str_index >> 16) << 16)
+
+        # The pointers are kept as a single block up to the last used one.
+        last_index = script.orig_str_indices[-1]
+        blocks = [(table_st, table_st + 2*(last_index+1))]
+
+        # __init_strings reads the strings in orig_str_indices order.
+        for str_ind, string in zip(script.orig_str_indices, script.strings):
+            ptr_st = table_st + 2*str_ind
+            str_st = get_value_from_bytes(rom[ptr_st:ptr_st+2]) + bank
+            blocks.append((str_st, str_st + len(string)))
+
+        return blocks
+
+    @classmethod
+    def from_rom(cls, rom) -> ScriptOwnerIndex:
+        '''
+        Read every location's script from the rom and build the index.
+        Overlapping blocks are merged and keep the owners of both.
+        '''
+        # Locations sharing a script share its blocks, so read each only once.
+        ptr_blocks: dict[int, tuple[Block, list[Block]]] = dict()
+        loc_ptrs: dict[int, int] = dict()
+        loc_table = LocationTable.from_rom(rom)
+
+        for loc_id in range(NUM_LOCATIONS):
+            ptr = loc_table.get_event_ptr(loc_id)
+            loc_ptrs[loc_id] = ptr
+
+            if ptr not in ptr_blocks:
+                script = ctevent.Event.from_rom(rom, ptr)
+                script_block = (ptr, ptr + get_compressed_length(rom, ptr))
+                ptr_blocks[ptr] = (script_block,
+                                   cls._get_string_blocks(rom, script))
+
+        # Merge overlapping blocks.  Strings which are suffixes of other
+        # strings or tables which overlap would otherwise be freed while
+        # something still uses part of them.
+        all_blocks = sorted(set(
+            block
+            for script_block, string_blocks in ptr_blocks.values()
+            for block in [script_block] + string_blocks
+        ))
+
+        merged: list[list[int]] = []
+        for start, end in all_blocks:
+            if merged and start < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        merged_starts = [block[0] for block in merged]
+
+        def get_merged_block(block: Block) -> Block:
+            ind = bisect.bisect_right(merged_starts, block[0]) - 1
+            return tuple(merged[ind])
+
+        ret = cls()
+        for loc_id, ptr in loc_ptrs.items():
+            script_block, string_blocks = ptr_blocks[ptr]
+
+            script_block = get_merged_block(script_block)
+            ret.script_blocks[loc_id] = script_block
+            ret.owners.setdefault(script_block, set()).add(
+                (loc_id, _SCRIPT_USE)
+            )
+
+            # A merged block can hold more than one of the strings.
+            loc_string_blocks = []
+            for block in string_blocks:
+                block = get_merged_block(block)
+                if block not in loc_string_blocks:
+                    loc_string_blocks.append(block)
+
+            ret.string_blocks[loc_id] = loc_string_blocks
+            for block in loc_string_blocks:
+                ret.owners.setdefault(block, set()).add(
+                    (loc_id, _STRING_USE)
+                )
+
+        return ret
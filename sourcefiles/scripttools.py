@@ -0,0 +1,170 @@
+'''
+Script pieces shared by the game modes which are rebuilt for every seed.
+The pieces are compiled into eventfunction.FunctionTemplates once and then
+filled in per use.
+'''
+from __future__ import annotations
+
+import functools
+from typing import Iterable, Optional
+
+import ctenums
+import ctevent
+import ctstrings
+from eventcommand import EventCommand as EC
+from eventfunction import EventFunction as EF, FunctionTemplate
+
+# Character lock bits are kept in 0x7F01DF.
+_CHAR_LOCK_ADDR = 0x7F01DF
+
+_char_lock_templates: Optional[
+    tuple[FunctionTemplate, FunctionTemplate, FunctionTemplate]
+] = None
+_party_check_template: Optional[FunctionTemplate] = None
+
+
+def _get_char_lock_templates() -> tuple[FunctionTemplate,
+                                        FunctionTemplate,
+                                        FunctionTemplate]:
+    '''
+    The start of a char lock function, the check for one character, and the
+    end of the function.
+    '''
+    global _char_lock_templates
+
+    if _char_lock_templates is None:
+        start = EF()
+        start.add(EC.assign_val_to_mem(0x0, _CHAR_LOCK_ADDR, 1))
+        start.add(EC.replace_characters())
+
+        # The jump back to the replace characters command is left as a slot
+        # because its target is outside of the check.
+        check = EF()
+        check.add_if(
+            EC.check_recruited_pc(0, 0),
+            EF.if_else(
+                EC.check_active_pc(0, 0),
+                EF(),
+                (
+                    EF()
+                    .add(EC.text_box(0))
+                    .add(EC.jump_back(0), register_jump=False)
+                )
+            )
+        )
+
+        # Commands: recruited check, active check, jump over the else block,
+        # text box, jump back to replace characters.
+        recruited_pos, active_pos, _, text_pos, replace_pos = check.offsets
+
+        end = EF()
+        end.add(EC.assign_val_to_mem(0x0, _CHAR_LOCK_ADDR, 1))
+
+        _char_lock_templates = (
+            FunctionTemplate(start),
+            (
+                FunctionTemplate(check)
+                .add_arg_slot('char_id', recruited_pos, 0)
+                .add_arg_slot('char_id', active_pos, 0)
+                .add_arg_slot('string_id', text_pos, 0)
+                .add_jump_slot('replace', replace_pos)
+            ),
+            FunctionTemplate(end).add_arg_slot('lock_bytes', 0, 0)
+        )
+
+    return _char_lock_templates
+
+
+def get_char_lock_bytes(script: ctevent.Event,
+                        chars: Iterable[ctenums.CharID]) -> bytearray:
+    '''
+    Generate a function which forces chars to be in the active party.
+
+    The function does the following:
+      1) Unset any character locks
+      2) Allow the party shuffle (Y menu)
+      3) Kick the user back to party shuffle if required characters
+         are missing
+      4) Set the character locks
+    An error string for each character is added to script's strings.
+    '''
+    chars = list(chars)
+    char_lock_bytes = functools.reduce(
+        lambda a, b: a | b,
+        [0x80 >> int(x) for x in chars]
+    )
+
+    start, check, end = _get_char_lock_templates()
+
+    # The replace characters command is the last command of start.
+    replace_pos = len(start) - len(EC.replace_characters())
+
+    func = bytearray(start.data)
+    for char in chars:
+        char_str = str(char).lower()
+        error_string = f"Must include {{{char_str}}}!{{null}}"
+        script.strings.append(ctstrings.CTString.from_str(error_string))
+        error_string_index = len(script.strings) - 1
+
+        func += check.instantiate(char_id=int(char),
+                                  string_id=error_string_index,
+                                  replace=replace_pos - len(func))
+
+    func += end.instantiate(lock_bytes=char_lock_bytes)
+
+    return func
+
+
+def _get_party_check_template() -> FunctionTemplate:
+    '''
+    A check that one character is in the active party which otherwise shows
+    a text box and jumps out of the check.
+    '''
+    global _party_check_template
+
+    if _party_check_template is None:
+        # The jump out is left as a slot because its target is outside of
+        # the check.
+        check = EF.if_else(
+            EC.check_active_pc(0, 0),
+            EF(),
+            (
+                EF()
+                .add(EC.text_box(0))
+                .add(EC.jump_forward(0), register_jump=False)
+            )
+        )
+
+        # Commands: active check, jump over the else block, text box,
+        # jump out.
+        active_pos, _, text_pos, fail_pos = check.offsets
+
+        _party_check_template = (
+            FunctionTemplate(check)
+            .add_arg_slot('char_id', active_pos, 0)
+            .add_arg_slot('string_id', text_pos, 0)
+            .add_jump_slot('fail', fail_pos)
+        )
+
+    return _party_check_template
+
+
+def get_party_check_bytes(chars: Iterable[ctenums.CharID],
+                          string_id: int,
+                          fail_offset: int) -> bytearray:
+    '''
+    Generate checks that each of chars is in the active party, for the
+    start of a dungeon lock.  If a character is missing, the string_id text
+    box is shown and execution jumps fail_offset bytes past the end of the
+    checks.
+    '''
+    chars = list(chars)
+    check = _get_party_check_template()
+    checks_len = len(check)*len(chars)
+
+    func = bytearray()
+    for char in chars:
+        func += check.instantiate(char_id=int(char), string_id=string_id,
+                                  fail=checks_len + fail_offset - len(func))
+
+    return func